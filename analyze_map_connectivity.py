@@ -1,182 +1,178 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import sys
-import io
-
-# 设置标准输出编码为UTF-8
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 """
 天京城地图连通性分析脚本
 分析所有房间的连接情况、检查孤岛房间、连接对称性等
 """
 
+import argparse
+import io
 import json
 import sys
-from collections import defaultdict, deque
-from typing import Dict, List, Set, Tuple, Any
-
-def load_map_data(file_paths: List[str]) -> Dict:
-    """加载地图数据"""
-    all_rooms = {}
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple, Any, Optional
+
+from check_coordinates import coordinate_point, room_point
+from map_analysis_cache import IncrementalAnalyzer
+from map_components import describe_strong_components, group_by_label, weak_components
+from map_graph import RoomGraph, bfs_reachable
+from map_jsonl import JsonlWriter
+from map_loader import discover_map_files, load_world
+from map_profiling import NULL_RECORDER, PhaseRecorder, cprofile_to
+from map_rules import (EXPECTED_ROOM_COUNT, ExitStatistics, Issue, Rule, RuleEngine, default_rules,
+                       issues_by_rule, missing_reverse_connections)
+from map_snapshot import load_or_compile
+
+def load_map_data(file_paths: List[str], workers: Optional[int] = 1) -> Tuple[Dict, Dict, Dict]:
+    """流式加载地图数据
+
+    返回 (all_rooms, room_exits, room_info)，all_rooms 为 room_id -> RoomRecord，
+    三者共享同一份字符串，不再保留完整的 JSON 树。
+    workers 大于 1（或为 None 表示按 CPU 核数）时使用进程池并行解析各文件。
+    """
     room_exits = {}
     room_info = {}
 
-    for file_path in file_paths:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-            # 遍历所有区域和位置
-            for district in data.get('districts', []):
-                for location in district.get('locations', []):
-                    for room in location.get('rooms', []):
-                        room_id = room['id']
-                        room_name = room['name']
-
-                        # 收集房间信息
-                        all_rooms[room_id] = room
-                        room_info[room_id] = {
-                            'name': room_name,
-                            'type': room.get('type', 'unknown'),
-                            'district': district.get('name', 'unknown'),
-                            'location': location.get('name', 'unknown'),
-                            'coordinates': room.get('coordinates', {}),
-                            'description': room.get('description', '')
-                        }
-
-                        # 收集出口信息
-                        exits = []
-                        for exit_info in room.get('exits', []):
-                            direction = exit_info['direction']
-                            target = exit_info['targetRoomId']
-                            description = exit_info.get('description', '')
-
-                            exits.append({
-                                'direction': direction,
-                                'target': target,
-                                'description': description
-                            })
-
-                        room_exits[room_id] = exits
-
-        except Exception as e:
-            print(f"错误：无法加载文件 {file_path}: {e}")
-            continue
+    world = load_world(file_paths, workers)
+    for file_path, error in world.errors:
+        print(f"错误：无法加载文件 {file_path}: {error}")
+    for room_id, kept, duplicate in world.conflicts:
+        print(f"警告：房间ID冲突 {room_id}，保留 {kept}，忽略 {duplicate}")
+
+    all_rooms = world.rooms
+    for room_id, record in all_rooms.items():
+
+        # 收集房间信息
+        room_info[room_id] = {
+            'name': record.name,
+            'type': record.type,
+            'district': record.district,
+            'location': record.location,
+            'coordinates': record.coordinates,
+            'description': record.description
+        }
+
+        # 收集出口信息
+        room_exits[room_id] = [
+            {'direction': direction, 'target': target, 'description': description}
+            for direction, target, description in record.exits
+        ]
 
     return all_rooms, room_exits, room_info
 
-def analyze_connectivity(room_exits: Dict[str, List[Dict]], room_info: Dict[str, Dict]) -> Dict:
-    """分析地图连通性"""
+
+def load_snapshot_data(file_paths: List[str], snapshot_path: str,
+                       workers: Optional[int] = 1) -> Tuple[RoomGraph, Dict, Dict]:
+    """从二进制快照加载 (graph, room_exits, room_info)，快照缺失或过期时先重新编译"""
+    with load_or_compile(file_paths, snapshot_path, workers) as snapshot:
+        graph = snapshot.graph()
+        room_exits = {}
+        room_info = {}
+        for node in range(graph.room_count):
+            room = snapshot.room(node)
+            room_exits[room['id']] = [
+                {'direction': e['direction'], 'target': e['targetRoomId'], 'description': e['description']}
+                for e in room.pop('exits')
+            ]
+            room_info[room.pop('id')] = room
+    return graph, room_exits, room_info
+
+def analyze_connectivity(room_exits: Dict[str, List[Dict]], room_info: Dict[str, Dict],
+                         graph: Optional[RoomGraph] = None, rules: Optional[List[Rule]] = None,
+                         profiler: Optional[PhaseRecorder] = None) -> Dict:
+    """分析地图连通性
+
+    graph 为预先构建的整数索引房间图（可选），rules 为要运行的校验规则（默认 map_rules.default_rules()），
+    profiler 不为空时记录每个阶段的耗时、内存与处理数量。
+    """
+    profiler = profiler or NULL_RECORDER
 
     # 1. 总房间数
     total_rooms = len(room_exits)
 
-    # 2. 构建连接图
-    connection_graph = defaultdict(set)
-    exit_details = defaultdict(list)
-
-    for room_id, exits in room_exits.items():
-        for exit_info in exits:
-            target = exit_info['target']
-            direction = exit_info['direction']
-            description = exit_info['description']
-
-            connection_graph[room_id].add(target)
-            exit_details[(room_id, target)].append({
-                'direction': direction,
-                'description': description
-            })
-
-    # 3. 检查连接对称性
-    asymmetric_connections = []
-    missing_reverse_connections = []
-
-    for room_id, targets in connection_graph.items():
-        for target in targets:
-            if target not in room_exits:
-                # 目标房间不存在
-                missing_reverse_connections.append({
-                    'from': room_id,
-                    'to': target,
-                    'type': 'missing_target'
-                })
-            elif room_id not in connection_graph[target]:
-                # 没有反向连接
-                missing_reverse_connections.append({
-                    'from': room_id,
-                    'to': target,
-                    'type': 'no_reverse',
-                    'from_exit': exit_details[(room_id, target)][0] if (room_id, target) in exit_details else None
-                })
+    # 2. 构建整数索引的 CSR 房间图
+    with profiler.phase('build_graph') as phase:
+        if graph is None:
+            graph = RoomGraph.from_room_exits(room_exits)
+        phase.update(rooms=graph.room_count, edges=graph.edge_count)
+    ids = graph.ids
+
+    # 3. 一次融合遍历运行全部校验规则，同时统计每个房间的不同目标数与方向使用次数
+    with profiler.phase('rules', rooms=graph.room_count, edges=graph.edge_count) as phase:
+        statistics = ExitStatistics()
+        engine = RuleEngine([*(default_rules() if rules is None else rules), statistics])
+        points = [coordinate_point(room_info.get(room_id, {}).get('coordinates'))
+                  for room_id in ids[:graph.room_count]]
+        issues = engine.run(
+            graph,
+            exits_of=lambda room_id: ((e['direction'], e['target'], e['description']) for e in room_exits[room_id]),
+            points=points
+        )
+        phase['issues'] = len(issues)
+    room_connections = statistics.room_connections
 
     # 4. 找出核心枢纽房间（连接最多的房间）
-    room_connections = {room_id: len(targets) for room_id, targets in connection_graph.items()}
     top_hub_rooms = sorted(room_connections.items(), key=lambda x: x[1], reverse=True)[:10]
 
-    # 5. 检查连通性（使用BFS）
-    if room_exits:
-        start_room = next(iter(room_exits.keys()))
-        reachable_rooms = bfs_connected_rooms(connection_graph, start_room)
-        isolated_rooms = set(room_exits.keys()) - reachable_rooms
-
-        # 如果有孤立房间，检查每个连通分量
-        connected_components = []
-        if isolated_rooms:
-            visited = set()
-            for room in room_exits:
-                if room not in visited:
-                    component = bfs_connected_rooms(connection_graph, room)
-                    connected_components.append(component)
-                    visited.update(component)
-        else:
-            connected_components = [reachable_rooms]
+    # 5. 检查连通性：一次线性扫描标注弱连通与强连通分量
+    with profiler.phase('weak_components', rooms=graph.room_count, edges=graph.edge_count) as phase:
+        weak_labels, weak_count = weak_components(graph)
+        connected_components = [
+            {ids[node] for node in members} for members in group_by_label(weak_labels, weak_count)
+        ]
+        phase['components'] = weak_count
+
+    # 强连通分量与无法回到主强连通分量的陷阱分量（单向出口造成）
+    with profiler.phase('strong_components', rooms=graph.room_count, edges=graph.edge_count) as phase:
+        strongly_connected_components, trap_components = describe_strong_components(graph)
+        phase['components'] = len(strongly_connected_components)
+
+    # 不与起点房间（第一个房间）弱连通的房间视为孤立房间
+    isolated_rooms = []
+    if graph.room_count:
+        main_label = weak_labels[0]
+        isolated_rooms = [ids[node] for node in range(graph.room_count) if weak_labels[node] != main_label]
 
     # 6. 房间类型统计
-    room_types = defaultdict(int)
-    district_stats = defaultdict(int)
+    with profiler.phase('room_stats', rooms=len(room_info)):
+        room_types = defaultdict(int)
+        district_stats = defaultdict(int)
 
-    for room_id, info in room_info.items():
-        room_types[info['type']] += 1
-        district_stats[info['district']] += 1
-
-    # 7. 方向统计
-    direction_stats = defaultdict(int)
-    for room_id, exits in room_exits.items():
-        for exit_info in exits:
-            direction_stats[exit_info['direction']] += 1
+        for room_id, info in room_info.items():
+            room_types[info['type']] += 1
+            district_stats[info['district']] += 1
 
     return {
         'total_rooms': total_rooms,
-        'connection_graph': dict(connection_graph),
-        'asymmetric_connections': asymmetric_connections,
-        'missing_reverse_connections': missing_reverse_connections,
+        'graph': graph,
+        'issues': issues,
+        'asymmetric_connections': [],
+        'missing_reverse_connections': missing_reverse_connections(issues),
         'top_hub_rooms': top_hub_rooms,
-        'isolated_rooms': list(isolated_rooms) if 'isolated_rooms' in locals() else [],
-        'connected_components': connected_components if 'connected_components' in locals() else [],
+        'isolated_rooms': isolated_rooms,
+        'connected_components': connected_components,
+        'strongly_connected_components': strongly_connected_components,
+        'trap_components': trap_components,
         'room_types': dict(room_types),
         'district_stats': dict(district_stats),
-        'direction_stats': dict(direction_stats),
+        'direction_stats': statistics.direction_stats,
         'room_connections': room_connections
     }
 
-def bfs_connected_rooms(graph: Dict[str, Set[str]], start: str) -> Set[str]:
+def bfs_connected_rooms(graph: RoomGraph, start: str) -> Set[str]:
     """使用BFS找出所有连通的房间"""
-    visited = set()
-    queue = deque([start])
-
-    while queue:
-        current = queue.popleft()
-        if current not in visited:
-            visited.add(current)
-            # 只添加实际存在的房间
-            for neighbor in graph.get(current, set()):
-                if neighbor in graph:  # 确保目标房间存在
-                    queue.append(neighbor)
+    if start not in graph.index:
+        return set()
+    return {graph.ids[node] for node in bfs_reachable(graph, graph.index[start])}
 
-    return visited
+def _print_overflow(items: List, limit: Optional[int]):
+    """列表被截断时提示剩余数量"""
+    if limit and len(items) > limit:
+        print(f"    ... 还有 {len(items) - limit} 个")
 
-def print_connectivity_report(analysis: Dict, room_info: Dict[str, Dict]):
-    """打印连通性分析报告"""
+def print_connectivity_report(analysis: Dict, room_info: Dict[str, Dict], limit: Optional[int] = 10):
+    """打印连通性分析报告，每类问题最多显示 limit 条，limit 为 None 时完整输出"""
+    grouped = issues_by_rule(analysis['issues'])
 
     print("=" * 80)
     print("天京城地图连通性分析报告")
@@ -186,11 +182,11 @@ def print_connectivity_report(analysis: Dict, room_info: Dict[str, Dict]):
     print(f"\n1. 基本统计")
     print("-" * 40)
     print(f"总房间数: {analysis['total_rooms']}")
-    print(f"预期房间数: 140")
-    if analysis['total_rooms'] == 140:
+    print(f"预期房间数: {EXPECTED_ROOM_COUNT}")
+    if 'room_count' not in grouped:
         print("房间数量检查: [OK] 正确")
     else:
-        print(f"房间数量检查: [ERROR] 错误 (相差 {140 - analysis['total_rooms']})")
+        print(f"房间数量检查: [ERROR] 错误 (相差 {EXPECTED_ROOM_COUNT - analysis['total_rooms']})")
 
     # 2. 连通性分析
     print(f"\n2. 连通性分析")
@@ -199,11 +195,23 @@ def print_connectivity_report(analysis: Dict, room_info: Dict[str, Dict]):
         print(f"连通分量数量: {len(analysis['connected_components'])}")
         for i, component in enumerate(analysis['connected_components'], 1):
             print(f"  连通分量 {i}: {len(component)} 个房间")
-            if len(component) <= 10:
+            if limit is None or len(component) <= limit:
                 for room_id in component:
                     room_name = room_info.get(room_id, {}).get('name', room_id)
                     print(f"    - {room_name} ({room_id})")
 
+    print(f"强连通分量数量: {len(analysis['strongly_connected_components'])}")
+
+    traps = [t for t in analysis['trap_components'] if t['entered_from_main']]
+    if traps:
+        print(f"\n[WARNING] 发现 {len(traps)} 个陷阱区域（可以进入但无法返回主区域）:")
+        for i, trap in enumerate(traps, 1):
+            print(f"  陷阱区域 {i}: {len(trap['rooms'])} 个房间")
+            for room_id in trap['rooms'][:limit]:
+                room_name = room_info.get(room_id, {}).get('name', room_id)
+                print(f"    - {room_name} ({room_id})")
+            _print_overflow(trap['rooms'], limit)
+
     if analysis['isolated_rooms']:
         print(f"\n[WARNING] 发现 {len(analysis['isolated_rooms'])} 个孤立房间:")
         for room_id in analysis['isolated_rooms']:
@@ -215,36 +223,46 @@ def print_connectivity_report(analysis: Dict, room_info: Dict[str, Dict]):
     # 3. 连接对称性检查
     print(f"\n3. 连接对称性检查")
     print("-" * 40)
-    missing_reverses = analysis['missing_reverse_connections']
+    missing_targets = grouped.get('missing_target', [])
+    no_reverse = grouped.get('no_reverse', [])
 
-    if missing_reverses:
-        print(f"[WARNING] 发现 {len(missing_reverses)} 个不对称连接:")
-
-        missing_targets = [c for c in missing_reverses if c['type'] == 'missing_target']
-        no_reverse = [c for c in missing_reverses if c['type'] == 'no_reverse']
+    if missing_targets or no_reverse:
+        print(f"[WARNING] 发现 {len(missing_targets) + len(no_reverse)} 个不对称连接:")
 
         if missing_targets:
             print(f"\n  指向不存在房间的连接 ({len(missing_targets)} 个):")
-            for conn in missing_targets[:10]:  # 只显示前10个
-                from_name = room_info.get(conn['from'], {}).get('name', conn['from'])
-                print(f"    {from_name} -> {conn['to']} (目标不存在)")
-            if len(missing_targets) > 10:
-                print(f"    ... 还有 {len(missing_targets) - 10} 个")
+            for issue in missing_targets[:limit]:
+                from_name = room_info.get(issue.room, {}).get('name', issue.room)
+                print(f"    {from_name} -> {issue.target} (目标不存在)")
+            _print_overflow(missing_targets, limit)
 
         if no_reverse:
             print(f"\n  缺少反向连接的房间 ({len(no_reverse)} 个):")
-            for conn in no_reverse[:10]:  # 只显示前10个
-                from_name = room_info.get(conn['from'], {}).get('name', conn['from'])
-                to_name = room_info.get(conn['to'], {}).get('name', conn['to'])
-                exit_info = conn.get('from_exit', {})
-                direction = exit_info.get('direction', 'unknown') if exit_info else 'unknown'
-                print(f"    {from_name} ({direction}->) {to_name}")
+            for issue in no_reverse[:limit]:
+                from_name = room_info.get(issue.room, {}).get('name', issue.room)
+                to_name = room_info.get(issue.target, {}).get('name', issue.target)
+                print(f"    {from_name} ({issue.direction}->) {to_name}")
                 print(f"    但 {to_name} 没有返回 {from_name} 的连接")
-            if len(no_reverse) > 10:
-                print(f"    ... 还有 {len(no_reverse) - 10} 个")
+            _print_overflow(no_reverse, limit)
     else:
         print("[OK] 所有连接都是对称的")
 
+    exit_checks = [
+        ('direction_mismatch', '方向与坐标不符的出口'),
+        ('self_loop', '指向自身的出口'),
+        ('duplicate_direction', '同一房间内重复方向的出口')
+    ]
+    for rule, title in exit_checks:
+        found = grouped.get(rule, [])
+        if not found:
+            continue
+        print(f"\n  {title} ({len(found)} 个):")
+        for issue in found[:limit]:
+            from_name = room_info.get(issue.room, {}).get('name', issue.room)
+            to_name = room_info.get(issue.target, {}).get('name', issue.target)
+            print(f"    {from_name} ({issue.direction}->) {to_name}")
+        _print_overflow(found, limit)
+
     # 4. 核心枢纽房间
     print(f"\n4. 核心枢纽房间 (连接最多的房间)")
     print("-" * 40)
@@ -290,19 +308,25 @@ def print_connectivity_report(analysis: Dict, room_info: Dict[str, Dict]):
     print("-" * 40)
 
     issues = []
-    if analysis['total_rooms'] != 140:
-        issues.append(f"房间数量不匹配 (实际: {analysis['total_rooms']}, 预期: 140)")
+    if 'room_count' in grouped:
+        issues.append(f"房间数量不匹配 (实际: {analysis['total_rooms']}, 预期: {EXPECTED_ROOM_COUNT})")
 
     if analysis['isolated_rooms']:
         issues.append(f"存在 {len(analysis['isolated_rooms'])} 个孤立房间")
 
-    missing_count = len([c for c in analysis['missing_reverse_connections'] if c['type'] == 'missing_target'])
-    if missing_count > 0:
-        issues.append(f"存在 {missing_count} 个指向不存在房间的连接")
+    if missing_targets:
+        issues.append(f"存在 {len(missing_targets)} 个指向不存在房间的连接")
 
-    no_reverse_count = len([c for c in analysis['missing_reverse_connections'] if c['type'] == 'no_reverse'])
-    if no_reverse_count > 0:
-        issues.append(f"存在 {no_reverse_count} 个不对称连接")
+    if no_reverse:
+        issues.append(f"存在 {len(no_reverse)} 个不对称连接")
+
+    for rule, title in exit_checks:
+        if rule in grouped:
+            issues.append(f"存在 {len(grouped[rule])} 个{title}")
+
+    trap_count = len([t for t in analysis['trap_components'] if t['entered_from_main']])
+    if trap_count > 0:
+        issues.append(f"存在 {trap_count} 个进入后无法返回的陷阱区域")
 
     if len(analysis['connected_components']) > 1:
         issues.append(f"地图不连通，有 {len(analysis['connected_components'])} 个连通分量")
@@ -316,46 +340,223 @@ def print_connectivity_report(analysis: Dict, room_info: Dict[str, Dict]):
 
     print("\n" + "=" * 80)
 
-def main():
-    """主函数"""
-    map_files = [
-        "D:\\mud\\ceshi3\\packages\\server\\data\\maps\\dazhou\\tianjing_fu\\tianjing_cheng_part1.json",
-        "D:\\mud\\ceshi3\\packages\\server\\data\\maps\\dazhou\\tianjing_fu\\tianjing_cheng_part2.json",
-        "D:\\mud\\ceshi3\\packages\\server\\data\\maps\\dazhou\\tianjing_fu\\tianjing_cheng_part3.json"
-    ]
+def stream_connectivity(map_files: List[str], writer: JsonlWriter, workers: Optional[int] = 1,
+                        rules: Optional[List[Rule]] = None) -> Dict:
+    """流式分析：问题与指标一产生就写成 JSONL 记录，不在内存中保留问题列表
+
+    记录类型依次为 load_error / conflict、start、issue（规则问题，随后是 isolated 与 trap）、
+    room（每个房间的出口指标）、component（弱连通分量）、stats 与最后的 summary。
+    返回 summary 记录的内容。
+    """
+    world = load_world(map_files, workers)
+    for file_path, error in world.errors:
+        writer.write('load_error', file=file_path, error=error)
+    for room_id, kept, duplicate in world.conflicts:
+        writer.write('conflict', room=room_id, kept=kept, ignored=duplicate)
+
+    records = world.rooms
+    graph = RoomGraph.from_records(records.values())
+    ids = graph.ids
+    writer.write('start', files=len(map_files), rooms=graph.room_count, exits=graph.edge_count)
+
+    statistics = ExitStatistics()
+    engine = RuleEngine([*(default_rules() if rules is None else rules), statistics])
+    engine.run(graph, exits_of=lambda room_id: records[room_id].exits,
+               points=[room_point(record) for record in records.values()],
+               sink=writer.issue, keep=False)
+    counts = dict(engine.counts)
+
+    weak_labels, weak_count = weak_components(graph)
+    if graph.room_count:
+        main_label = weak_labels[0]
+        for node in range(graph.room_count):
+            if weak_labels[node] != main_label:
+                writer.issue(Issue('isolated', 'warning', ids[node], None, None, {}))
+                counts['isolated'] = counts.get('isolated', 0) + 1
+
+    strongly_connected_components, trap_components = describe_strong_components(graph)
+    for trap in trap_components:
+        if trap['entered_from_main']:
+            writer.issue(Issue('trap', 'warning', None, None, None, {'rooms': trap['rooms']}))
+            counts['trap'] = counts.get('trap', 0) + 1
+
+    for room_id, record in records.items():
+        writer.write('room', room=room_id, type=record.type, district=record.district,
+                     exits=len(record.exits), connections=statistics.room_connections[room_id])
+
+    for index, members in enumerate(group_by_label(weak_labels, weak_count)):
+        writer.write('component', index=index, size=len(members), rooms=[ids[node] for node in members])
 
-    print("正在加载地图数据...")
-    all_rooms, room_exits, room_info = load_map_data(map_files)
+    room_types = defaultdict(int)
+    district_stats = defaultdict(int)
+    for record in records.values():
+        room_types[record.type] += 1
+        district_stats[record.district] += 1
+    writer.write('stats', room_types=dict(room_types), district_stats=dict(district_stats),
+                 direction_stats=statistics.direction_stats)
+
+    summary = {
+        'total_rooms': graph.room_count,
+        'total_exits': graph.edge_count,
+        'issue_counts': counts,
+        'connected_components_count': weak_count,
+        'strongly_connected_components_count': len(strongly_connected_components)
+    }
+    writer.write('summary', **summary)
+    return summary
 
-    if not room_exits:
-        print("错误：未能加载任何房间数据")
+def analyze_incrementally(map_files: List[str], cache_path: str) -> Tuple[Dict, Any]:
+    """基于内容哈希缓存的增量分析，返回 (analysis, room_info)"""
+    analyzer = IncrementalAnalyzer(cache_path)
+    analysis, room_info = analyzer.update(map_files)
+
+    for file_path, error in analyzer.errors:
+        print(f"错误：无法加载文件 {file_path}: {error}")
+    for room_id, kept, duplicate in analyzer.conflicts:
+        print(f"警告：房间ID冲突 {room_id}，保留 {kept}，忽略 {duplicate}")
+    print(f"重新分析了 {len(analyzer.reparsed)}/{len(map_files)} 个文件")
+
+    try:
+        analyzer.save()
+    except Exception as e:
+        print(f"保存分析缓存时出错: {e}")
+    return analysis, room_info
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='天京城地图连通性分析')
+    parser.add_argument('--maps-root',
+                        help='递归加载该目录下的所有地图 JSON（如 packages/server/data/maps），默认只加载天京城三个分卷')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='并行解析地图文件的进程数，0 表示使用全部 CPU 核（默认 1）')
+    parser.add_argument('--cache',
+                        help='增量分析缓存文件路径，只重新分析内容有变化的地图文件')
+    parser.add_argument('--snapshot', metavar='PATH',
+                        help='从二进制地图快照加载房间，快照不存在或源文件变化时自动重新编译')
+    parser.add_argument('--centrality', action='store_true',
+                        help='额外计算介数中心性、割点与桥出口（需要 numpy/scipy）')
+    parser.add_argument('--output', default='connectivity_analysis_result.json',
+                        help='分析结果 JSON 的保存路径（默认 connectivity_analysis_result.json）')
+    parser.add_argument('--jsonl', metavar='PATH',
+                        help='流式模式：把全部问题与指标逐条写成 JSONL（- 表示标准输出），不打印报告')
+    parser.add_argument('--limit', type=int, default=10,
+                        help='报告中每类问题显示的条目数，0 表示完整输出（默认 10）')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='用 tracemalloc 统计每个阶段的峰值内存（会明显拖慢分析）')
+    parser.add_argument('--cprofile', metavar='PATH',
+                        help='用 cProfile 剖析整个运行并把统计数据写入 PATH')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    profiler = PhaseRecorder(args.trace_memory)
+    try:
+        with cprofile_to(args.cprofile):
+            run(args, profiler)
+    finally:
+        profiler.stop()
+    if args.cprofile:
+        print(f"cProfile 统计已保存到: {args.cprofile}", file=sys.stderr if args.jsonl == '-' else sys.stdout)
+
+def run(args, profiler: PhaseRecorder):
+    """按命令行参数执行分析，各阶段的耗时与内存记录到 profiler"""
+
+    if args.maps_root:
+        map_files = discover_map_files(args.maps_root)
+    else:
+        map_files = [
+            "D:\\mud\\ceshi3\\packages\\server\\data\\maps\\dazhou\\tianjing_fu\\tianjing_cheng_part1.json",
+            "D:\\mud\\ceshi3\\packages\\server\\data\\maps\\dazhou\\tianjing_fu\\tianjing_cheng_part2.json",
+            "D:\\mud\\ceshi3\\packages\\server\\data\\maps\\dazhou\\tianjing_fu\\tianjing_cheng_part3.json"
+        ]
+
+    if args.jsonl:
+        with JsonlWriter(args.jsonl) as writer:
+            with profiler.phase('stream', files=len(map_files)) as phase:
+                summary = stream_connectivity(map_files, writer, args.workers or None)
+                phase.update(rooms=summary['total_rooms'], edges=summary['total_exits'])
+            writer.write('profile', **profiler.to_dict())
+        log = sys.stderr if args.jsonl == '-' else sys.stdout
+        print(f"已写出 {writer.count} 条记录，共 {summary['total_rooms']} 个房间，"
+              f"{sum(summary['issue_counts'].values())} 个问题", file=log)
         return
 
-    print("正在分析连通性...")
-    analysis = analyze_connectivity(room_exits, room_info)
+    if args.cache:
+        print("正在增量分析地图数据...")
+        with profiler.phase('incremental', files=len(map_files)) as phase:
+            analysis, room_info = analyze_incrementally(map_files, args.cache)
+            phase['rooms'] = analysis['total_rooms']
+    else:
+        print("正在加载地图数据...")
+        graph = None
+        with profiler.phase('load', files=len(map_files)) as phase:
+            if args.snapshot:
+                graph, room_exits, room_info = load_snapshot_data(map_files, args.snapshot, args.workers or None)
+            else:
+                _, room_exits, room_info = load_map_data(map_files, args.workers or None)
+            phase['rooms'] = len(room_exits)
+
+        print("正在分析连通性...")
+        with profiler.phase('analyze', rooms=len(room_exits)):
+            analysis = analyze_connectivity(room_exits, room_info, graph=graph, profiler=profiler)
+
+    if not analysis['total_rooms']:
+        print("错误：未能加载任何房间数据")
+        return
 
     print("\n生成分析报告...")
-    print_connectivity_report(analysis, room_info)
+    with profiler.phase('report', rooms=analysis['total_rooms']):
+        print_connectivity_report(analysis, room_info, args.limit or None)
+
+    metrics = None
+    if args.centrality:
+        from map_metrics import compute_metrics, print_metrics_report
+        graph = analysis['graph']
+        if graph is None:
+            # 增量模式不构建整个世界的房间图，中心性需要时才用缓存的房间记录构建
+            graph = RoomGraph.from_records(room_info.records.values())
+        with profiler.phase('centrality', rooms=graph.room_count, edges=graph.edge_count):
+            metrics = compute_metrics(graph)
+        print_metrics_report(metrics, room_info)
+
+    # 分阶段统计始终写入结果文件，只在显式开启剖析时打印到报告中
+    if args.trace_memory or args.cprofile:
+        profiler.print_summary()
 
     # 可选：保存分析结果到文件
     try:
-        with open("D:\\mud\\ceshi3\\connectivity_analysis_result.json", 'w', encoding='utf-8') as f:
+        with open(args.output, 'w', encoding='utf-8') as f:
             # 准备可序列化的数据
             serializable_analysis = {
                 'total_rooms': analysis['total_rooms'],
                 'isolated_rooms': analysis['isolated_rooms'],
                 'connected_components_count': len(analysis['connected_components']),
+                'strongly_connected_components_count': len(analysis['strongly_connected_components']),
+                'trap_components': analysis['trap_components'],
                 'missing_reverse_connections': analysis['missing_reverse_connections'],
-                'top_hub_rooms': analysis['top_hub_rooms'][:20],  # 只保存前20个
+                'issues': [issue._asdict() for issue in analysis['issues']],
+                'top_hub_rooms': analysis['top_hub_rooms'],
+                'room_connections': analysis['room_connections'],
                 'room_types': analysis['room_types'],
                 'district_stats': analysis['district_stats'],
                 'direction_stats': analysis['direction_stats']
             }
+            if metrics is not None:
+                serializable_analysis['chokepoints'] = {
+                    'top_betweenness': metrics['top_betweenness'],
+                    'articulation_points': metrics['articulation_points'],
+                    'bridge_exits': metrics['bridge_exits'],
+                    'betweenness_sampled': metrics['betweenness_sampled']
+                }
+            serializable_analysis['profile'] = profiler.to_dict()
 
             json.dump(serializable_analysis, f, ensure_ascii=False, indent=2)
-            print(f"\n分析结果已保存到: D:\\mud\\ceshi3\\connectivity_analysis_result.json")
+            print(f"\n分析结果已保存到: {args.output}")
     except Exception as e:
         print(f"保存分析结果时出错: {e}")
 
 if __name__ == "__main__":
+    # 设置标准输出编码为UTF-8
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     main()
\ No newline at end of file
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+地图工具性能基准
+用合成地图生成器在不同规模与拓扑下生成地图，分别计时加载、连通性分析、BFS 与不对称连接检查，
+结果追加写入 JSONL 文件，并与同一配置的上一次结果比较，超过阈值的变慢标记为回退
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List, Optional, Tuple
+
+import analyze_map_connectivity
+import check_asymmetric_connections
+from generate_synthetic_map import TOPOLOGIES, Defects, generate_world
+from map_jsonl import read_jsonl
+from map_loader import discover_map_files
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+# 结果固定追加到脚本所在目录，与运行时的当前目录无关，历史对比才连贯
+DEFAULT_RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_results.jsonl')
+# 比上一次同配置结果慢这么多视为性能回退
+REGRESSION_THRESHOLD = 0.2
+
+
+def _best_of(repeat: int, func: Callable) -> Tuple[float, object]:
+    """重复执行取最短耗时，返回 (秒数, 最后一次的返回值)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchmark_world(map_files: List[str], repeat: int = 1) -> Dict[str, float]:
+    """对一组地图文件依次计时各阶段，返回 {阶段: 秒数}"""
+    timings = {}
+
+    timings['load'], (all_rooms, room_exits, room_info) = _best_of(
+        repeat, lambda: analyze_map_connectivity.load_map_data(map_files))
+    timings['analyze'], analysis = _best_of(
+        repeat, lambda: analyze_map_connectivity.analyze_connectivity(room_exits, room_info))
+
+    rooms = check_asymmetric_connections.load_room_data(map_files)
+    timings['validate_connections'], _ = _best_of(
+        repeat, lambda: check_asymmetric_connections.validate_connections(rooms))
+
+    # 从第一个房间出发的阶段在空世界中没有起点，不计时
+    start = next(iter(room_exits), None)
+    if start is not None:
+        graph = analysis['graph']
+        timings['bfs'], _ = _best_of(repeat, lambda: analyze_map_connectivity.bfs_connected_rooms(graph, start))
+        timings['check_connection'], _ = _best_of(
+            repeat, lambda: check_asymmetric_connections.check_connection(start, rooms))
+    return timings
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _previous_results(results_path: str) -> Dict[Tuple, float]:
+    """读取历史结果，返回每个 (拓扑, 房间数, 缺陷, 阶段) 最近一次的耗时"""
+    previous = {}
+    if os.path.exists(results_path):
+        for item in read_jsonl(results_path, 'benchmark'):
+            key = (item['topology'], item['rooms'], tuple(item['defects']), item['phase'])
+            previous[key] = item['seconds']
+    return previous
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='在合成地图上对地图工具做性能基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='房间数列表（默认 1000 10000 100000）')
+    parser.add_argument('--topologies', nargs='+', choices=TOPOLOGIES, default=list(TOPOLOGIES),
+                        help='拓扑列表（默认全部）')
+    parser.add_argument('--one-way', type=float, default=0.02, help='单向出口比例（默认 0.02）')
+    parser.add_argument('--dangling', type=float, default=0.005, help='悬空出口房间比例（默认 0.005）')
+    parser.add_argument('--islands', type=float, default=0.01, help='孤岛位置比例（默认 0.01）')
+    parser.add_argument('--repeat', type=int, default=1, help='每个阶段重复次数，取最短耗时（默认 1）')
+    parser.add_argument('--seed', type=int, default=0, help='生成地图的随机种子')
+    parser.add_argument('--work-dir', help='合成地图的保存目录，已存在的同配置地图会被复用（默认使用临时目录）')
+    parser.add_argument('--results', default=DEFAULT_RESULTS, help=f'结果 JSONL 文件（默认 {DEFAULT_RESULTS}）')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    defects = Defects(args.one_way, args.dangling, args.islands)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='map_bench_')
+    previous = _previous_results(args.results)
+    run_info = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': _git_commit(),
+        'python': platform.python_version()
+    }
+
+    regressions = 0
+    print(f"{'拓扑':8s} {'房间数':>9s} {'阶段':22s} {'耗时(s)':>10s} {'上次(s)':>10s} {'变化':>8s}")
+    print("-" * 72)
+    try:
+        with open(args.results, 'a', encoding='utf-8') as results:
+            for topology in args.topologies:
+                for size in args.sizes:
+                    world_dir = os.path.join(
+                        work_dir, f"{topology}_{size}_{args.seed}_{args.one_way}_{args.dangling}_{args.islands}")
+                    if not os.path.isdir(world_dir):
+                        generate_world(world_dir, size, topology, defects, args.seed)
+                    timings = benchmark_world(discover_map_files(world_dir), args.repeat)
+
+                    for phase, seconds in timings.items():
+                        key = (topology, size, tuple(defects), phase)
+                        last = previous.get(key)
+                        change = ''
+                        if last:
+                            ratio = seconds / last - 1.0
+                            change = f"{ratio:+.0%}"
+                            if ratio > REGRESSION_THRESHOLD:
+                                change += ' [WARNING]'
+                                regressions += 1
+                        last_text = f"{last:.4f}" if last else '-'
+                        print(f"{topology:8s} {size:9d} {phase:22s} {seconds:10.4f} {last_text:>10s} {change:>8s}")
+                        results.write(json.dumps({
+                            'record': 'benchmark', **run_info, 'topology': topology, 'rooms': size,
+                            'defects': list(defects), 'phase': phase, 'seconds': seconds
+                        }, ensure_ascii=False) + '\n')
+                    results.flush()
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n结果已追加到: {args.results}")
+    if regressions:
+        print(f"[WARNING] {regressions} 项比上一次慢 {REGRESSION_THRESHOLD:.0%} 以上")
+    else:
+        print("[OK] 没有发现性能回退")
+
+
+if __name__ == "__main__":
+    # 设置标准输出编码为UTF-8
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    main()
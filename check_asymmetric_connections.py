@@ -2,75 +2,119 @@
 # -*- coding: utf-8 -*-
 import sys
 import io
-import json
 
-# 设置标准输出编码为UTF-8
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+from map_graph import RoomGraph
+from map_loader import iter_rooms
 
 def load_room_data(file_paths):
-    """加载所有房间数据"""
+    """流式加载所有房间数据，返回 room_id -> 房间字典"""
     rooms = {}
-    for file_path in file_paths:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-            for district in data.get('districts', []):
-                for location in district.get('locations', []):
-                    for room in location.get('rooms', []):
-                        room_id = room['id']
-                        rooms[room_id] = room
-        except Exception as e:
-            print(f"Error loading {file_path}: {e}")
 
-    return rooms
-
-def check_connection(room_id, rooms, visited=None, path=None):
-    """递归检查房间连通性"""
-    if visited is None:
-        visited = set()
-    if path is None:
-        path = []
-
-    if room_id in visited:
-        return False, []
+    def report_error(file_path, e, count):
+        print(f"Error loading {file_path}: {e}")
+        if count:
+            print(f"  出错前已读取的 {count} 个房间仍参与校验")
+
+    for record in iter_rooms(file_paths, on_error=report_error):
+        rooms[record.id] = {
+            'id': record.id,
+            'name': record.name,
+            'type': record.type,
+            'district': record.district,
+            'exits': [
+                {'direction': direction, 'targetRoomId': target, 'description': description}
+                for direction, target, description in record.exits
+            ]
+        }
 
-    visited.add(room_id)
-    path.append(room_id)
+    return rooms
 
+def build_graph(rooms):
+    """根据房间字典构建 RoomGraph，用于 O(log d) 的反向出口查找"""
+    return RoomGraph.from_edges(
+        (room_id, ((exit_info['targetRoomId'], exit_info['direction']) for exit_info in room.get('exits', [])))
+        for room_id, room in rooms.items()
+    )
+
+def first_exit(rooms, from_id, to_id):
+    """from_id 指向 to_id 的第一个出口，不存在时返回 None"""
+    for exit_info in rooms[from_id].get('exits', []):
+        if exit_info['targetRoomId'] == to_id:
+            return exit_info
+    return None
+
+def validate_connections(rooms, start_room_id=None, graph=None):
+    """一次遍历校验所有房间连接的对称性与可达性
+
+    使用显式工作栈代替递归，每个房间、每个出口只处理一次，复杂度 O(V+E)。
+    从 start_room_id（默认第一个房间）出发沿出口遍历，未到达的房间记为不可达，
+    随后从剩余房间继续遍历，保证所有问题一次性返回。
+    graph 为预先构建的 RoomGraph（见 build_graph），未提供时根据 rooms 构建。
+
+    返回:
+        {
+            'asymmetric': [(from, to, direction), ...],       # 缺少反向连接
+            'missing_targets': [(from, to, direction), ...],  # 目标房间不存在
+            'unreachable': [room_id, ...]                     # 起点无法到达的房间
+        }
+    """
+    problems = {'asymmetric': [], 'missing_targets': [], 'unreachable': []}
+    if not rooms:
+        return problems
+
+    # 反向检查在 RoomGraph 按目标排序的出边行上二分查找
+    if graph is None:
+        graph = build_graph(rooms)
+    node_of = graph.index
+
+    if start_room_id is None or start_room_id not in rooms:
+        start_room_id = next(iter(rooms))
+
+    visited = set()
+    reached_from_start = None
+
+    for seed in [start_room_id, *rooms]:
+        if seed in visited:
+            continue
+        visited.add(seed)
+        stack = [seed]
+
+        while stack:
+            room_id = stack.pop()
+            for exit_info in rooms[room_id].get('exits', []):
+                target = exit_info['targetRoomId']
+                direction = exit_info['direction']
+
+                if target not in rooms:
+                    problems['missing_targets'].append((room_id, target, direction))
+                    continue
+
+                if not graph.has_edge(node_of[target], node_of[room_id]):
+                    problems['asymmetric'].append((room_id, target, direction))
+
+                if target not in visited:
+                    visited.add(target)
+                    stack.append(target)
+
+        if reached_from_start is None:
+            reached_from_start = set(visited)
+
+    problems['unreachable'] = [room_id for room_id in rooms if room_id not in reached_from_start]
+    return problems
+
+def check_connection(room_id, rooms, graph=None):
+    """检查从 room_id 出发可达范围内的连接对称性
+
+    保留旧接口：返回 (True, []) 或 (False, [from, to, direction])。
+    """
     if room_id not in rooms:
-        return False, path
-
-    room = rooms[room_id]
-    exits = room.get('exits', [])
-
-    for exit_info in exits:
-        target = exit_info['targetRoomId']
-        direction = exit_info['direction']
-
-        # 检查这个连接是否对称
-        if target in rooms:
-            target_room = rooms[target]
-            has_reverse = False
-            reverse_direction = None
-
-            for target_exit in target_room.get('exits', []):
-                if target_exit['targetRoomId'] == room_id:
-                    has_reverse = True
-                    reverse_direction = target_exit['direction']
-                    break
-
-            if not has_reverse:
-                return False, [room_id, target, direction]
-
-    # 递归检查所有连接
-    for exit_info in exits:
-        target = exit_info['targetRoomId']
-        if target != room_id:  # 避免自循环
-            is_symmetric, problematic_path = check_connection(target, rooms, visited.copy(), path.copy())
-            if not is_symmetric:
-                return False, problematic_path
+        return False, [room_id]
 
+    problems = validate_connections(rooms, room_id, graph)
+    unreachable = set(problems['unreachable'])
+    for from_id, to_id, direction in problems['asymmetric']:
+        if from_id not in unreachable:
+            return False, [from_id, to_id, direction]
     return True, []
 
 def main():
@@ -85,49 +129,35 @@ def main():
     rooms = load_room_data(map_files)
     print(f"加载了 {len(rooms)} 个房间")
 
+    validation = validate_connections(rooms, graph=build_graph(rooms))
     asymmetric_connections = []
 
-    # 检查所有连接
-    for room_id, room in rooms.items():
-        room_name = room.get('name', room_id)
-        exits = room.get('exits', [])
-
-        for exit_info in exits:
-            direction = exit_info['direction']
-            target_id = exit_info['targetRoomId']
-            target_desc = exit_info.get('description', '')
-
-            if target_id not in rooms:
-                continue  # 跳过不存在的目标
-
-            target_room = rooms[target_id]
-            target_name = target_room.get('name', target_id)
-
-            # 检查是否有反向连接
-            has_reverse = False
-            reverse_direction = None
-            reverse_desc = None
-
-            for target_exit in target_room.get('exits', []):
-                if target_exit['targetRoomId'] == room_id:
-                    has_reverse = True
-                    reverse_direction = target_exit['direction']
-                    reverse_desc = target_exit.get('description', '')
-                    break
-
-            if not has_reverse:
-                asymmetric_connections.append({
-                    'from_id': room_id,
-                    'from_name': room_name,
-                    'from_type': room.get('type', 'unknown'),
-                    'from_district': room.get('district', 'unknown'),
-                    'direction': direction,
-                    'description': target_desc,
-                    'to_id': target_id,
-                    'to_name': target_name,
-                    'to_type': target_room.get('type', 'unknown'),
-                    'to_district': target_room.get('district', 'unknown')
-                })
+    for room_id, target_id, direction in validation['asymmetric']:
+        room = rooms[room_id]
+        target_room = rooms[target_id]
+        target_desc = ''
+        for exit_info in room.get('exits', []):
+            if exit_info['targetRoomId'] == target_id and exit_info['direction'] == direction:
+                target_desc = exit_info['description']
+                break
+
+        asymmetric_connections.append({
+            'from_id': room_id,
+            'from_name': room.get('name', room_id),
+            'from_type': room.get('type', 'unknown'),
+            'from_district': room.get('district', 'unknown'),
+            'direction': direction,
+            'description': target_desc,
+            'to_id': target_id,
+            'to_name': target_room.get('name', target_id),
+            'to_type': target_room.get('type', 'unknown'),
+            'to_district': target_room.get('district', 'unknown')
+        })
+
+    if validation['missing_targets']:
+        print(f"发现 {len(validation['missing_targets'])} 个指向不存在房间的连接")
+    if validation['unreachable']:
+        print(f"发现 {len(validation['unreachable'])} 个从起点无法到达的房间")
 
     print(f"\n发现 {len(asymmetric_connections)} 个不对称连接:\n")
 
@@ -159,25 +189,15 @@ def main():
             print(f"\n检查连接: {from_room['name']} -> {to_room['name']}")
 
             # 找到具体的出口
-            from_exit = None
-            for exit_info in from_room.get('exits', []):
-                if exit_info['targetRoomId'] == to_id:
-                    from_exit = exit_info
-                    break
+            from_exit = first_exit(rooms, from_id, to_id)
 
             if from_exit:
                 print(f"  出口信息: {from_exit['direction']} - {from_exit['description']}")
 
             # 检查反向
-            has_reverse = False
-            reverse_exit = None
-            for exit_info in to_room.get('exits', []):
-                if exit_info['targetRoomId'] == from_id:
-                    has_reverse = True
-                    reverse_exit = exit_info
-                    break
-
-            if has_reverse:
+            reverse_exit = first_exit(rooms, to_id, from_id)
+
+            if reverse_exit:
                 print(f"  反向连接: {reverse_exit['direction']} - {reverse_exit['description']}")
             else:
                 print(f"  [ERROR] 缺少反向连接!")
@@ -186,4 +206,6 @@ def main():
     print("\n" + "=" * 80)
 
 if __name__ == "__main__":
+    # 设置标准输出编码为UTF-8
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     main()
\ No newline at end of file
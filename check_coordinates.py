@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+房间坐标与出口方向一致性检查
+用网格哈希为房间坐标建立空间索引，一次线性遍历找出坐标重叠或过近的房间、
+方向与坐标差不符的出口，以及反向出口没有使用相反方向的连接
+"""
+
+import argparse
+import io
+import json
+import math
+import sys
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from map_graph import OPPOSITE_DIRECTIONS, RoomGraph
+from map_loader import RoomRecord, discover_map_files, load_world
+
+# 方向对应的坐标变化符号 (dx, dy, dz)，北为 y 增大，上为 z 增大；in/out 没有空间含义
+DIRECTION_VECTORS = {
+    'north': (0, 1, 0), 'south': (0, -1, 0),
+    'east': (1, 0, 0), 'west': (-1, 0, 0),
+    'northeast': (1, 1, 0), 'northwest': (-1, 1, 0),
+    'southeast': (1, -1, 0), 'southwest': (-1, -1, 0),
+    'up': (0, 0, 1), 'down': (0, 0, -1)
+}
+
+Point = Tuple[float, float, float]
+
+
+def room_point(record: RoomRecord) -> Optional[Point]:
+    """房间坐标，缺少 x 或 y 时返回 None（z 默认为 0）"""
+    return coordinate_point(record.coordinates)
+
+
+def coordinate_point(coordinates: Dict) -> Optional[Point]:
+    """把 {'x', 'y', 'z'} 坐标字典转换为 (x, y, z)，无效时返回 None"""
+    if not isinstance(coordinates, dict):
+        return None
+    try:
+        return (float(coordinates['x']), float(coordinates['y']), float(coordinates.get('z', 0)))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _sign(value: float) -> int:
+    return (value > 0) - (value < 0)
+
+
+def direction_matches(direction: str, delta: Point) -> bool:
+    """出口方向与坐标差是否一致
+
+    期望方向上的各轴必须同号；正方向（东西南北）还要求主轴位移不小于侧向位移，
+    上下出口只看 z 轴，水平出口不允许只有 z 轴变化。未知方向一律视为一致。
+    """
+    vector = DIRECTION_VECTORS.get(direction)
+    if vector is None:
+        return True
+    dx, dy, dz = delta
+    if vector[2]:
+        return _sign(dz) == vector[2]
+    if vector[0] and _sign(dx) != vector[0]:
+        return False
+    if vector[1] and _sign(dy) != vector[1]:
+        return False
+    if not vector[0]:
+        return abs(dy) >= abs(dx)
+    if not vector[1]:
+        return abs(dx) >= abs(dy)
+    return True
+
+
+def exit_mismatch(points: Sequence[Optional[Point]], node: int, target: int, direction: str) -> Optional[Point]:
+    """出口方向与两个房间的坐标差不符时返回坐标差，一致或缺少坐标时返回 None
+
+    check_coordinates 与规则引擎的 DirectionMismatchRule 共用这一判断。
+    """
+    here, there = points[node], points[target]
+    if here is None or there is None:
+        return None
+    delta = (there[0] - here[0], there[1] - here[1], there[2] - here[2])
+    return None if direction_matches(direction, delta) else delta
+
+
+class SpatialIndex:
+    """网格哈希空间索引
+
+    每个房间按坐标落入边长为 cell_size 的网格单元，单元格到房间列表存放在字典中，
+    按坐标查房间与按半径查附近房间都只访问常数个单元格。
+    """
+
+    def __init__(self, cell_size: float = 10.0):
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int, int], List[int]] = {}
+        self.points: Dict[int, Point] = {}
+
+    def _cell(self, point: Point) -> Tuple[int, int, int]:
+        size = self.cell_size
+        return (int(point[0] // size), int(point[1] // size), int(point[2] // size))
+
+    def add(self, node: int, point: Point):
+        self.points[node] = point
+        self.cells.setdefault(self._cell(point), []).append(node)
+
+    def at(self, point: Point) -> List[int]:
+        """与 point 坐标完全相同的房间"""
+        return [node for node in self.cells.get(self._cell(point), ()) if self.points[node] == point]
+
+    def near(self, point: Point, radius: float) -> List[int]:
+        """与 point 水平距离不超过 radius 且 z 相同的房间"""
+        reach = int(radius // self.cell_size) + 1
+        cx, cy, cz = self._cell(point)
+        found = []
+        for x in range(cx - reach, cx + reach + 1):
+            for y in range(cy - reach, cy + reach + 1):
+                for node in self.cells.get((x, y, cz), ()):
+                    other = self.points[node]
+                    if other[2] == point[2] and \
+                            (other[0] - point[0]) ** 2 + (other[1] - point[1]) ** 2 <= radius * radius:
+                        found.append(node)
+        return found
+
+
+def _unmatched_exit(directions: List[str], codes: List[int], back_codes: List[int]) -> Optional[Tuple[str, List[str]]]:
+    """codes 中第一个在 back_codes 里找不到相反方向的出口，返回 (方向, 反向出口方向)"""
+    back = [directions[code] for code in back_codes]
+    for code in codes:
+        opposite = OPPOSITE_DIRECTIONS.get(directions[code])
+        if opposite is not None and opposite not in back:
+            return directions[code], back
+    return None
+
+
+def check_coordinates(graph: RoomGraph, points: List[Optional[Point]],
+                      min_distance: float = 0.0) -> Dict[str, List]:
+    """一次遍历完成全部坐标检查，复杂度 O(V+E)（反向出口在有序出边行上二分查找）
+
+    points[node] 为每个真实房间的坐标（可以为 None）。min_distance 大于 0 时，
+    还通过空间索引找出同一层上距离小于该值、坐标不同的房间对。返回:
+        {
+            'duplicate_coordinates': [(point, [room_id, ...]), ...],     # 多个房间坐标相同
+            'close_rooms': [(room_id, room_id, distance), ...],         # 坐标不同但距离过近
+            'direction_mismatch': [(from, to, direction, delta), ...],   # 方向与坐标差不符
+            'reverse_mismatch': [(from, to, direction, [reverse_directions]), ...],  # 反向出口方向不相反，每对房间一条
+            'missing_coordinates': [room_id, ...]
+        }
+    """
+    ids = graph.ids
+    room_count = graph.room_count
+    directions = graph.directions
+    result = {'duplicate_coordinates': [], 'close_rooms': [], 'direction_mismatch': [],
+              'reverse_mismatch': [], 'missing_coordinates': []}
+
+    index = SpatialIndex(min_distance if min_distance > 0 else 10.0)
+    duplicates: Dict[Point, List[int]] = {}
+    for node in range(room_count):
+        point = points[node]
+        if point is None:
+            result['missing_coordinates'].append(ids[node])
+            continue
+        # 只与已加入索引的房间比较，每对房间只报告一次
+        same = index.at(point)
+        if same:
+            duplicates.setdefault(point, same).append(node)
+        if min_distance > 0:
+            for other in index.near(point, min_distance):
+                distance = math.dist(point, index.points[other])
+                if 0 < distance < min_distance:
+                    result['close_rooms'].append((ids[other], ids[node], distance))
+        index.add(node, point)
+
+        previous = None
+        for target, code in graph.edges(node):
+            if target >= room_count or target == node:
+                continue
+            direction = directions[code]
+            delta = exit_mismatch(points, node, target, direction)
+            if delta is not None:
+                result['direction_mismatch'].append((ids[node], ids[target], direction, delta))
+
+            # 每对房间只在编号较小的一侧检查一次，两个方向的出口一起比较
+            if target < node or target == previous:
+                continue
+            previous = target
+            codes = graph.edge_codes(node, target)
+            back_codes = graph.edge_codes(target, node)
+            if not back_codes:
+                continue
+            unmatched = _unmatched_exit(directions, codes, back_codes)
+            if unmatched is not None:
+                result['reverse_mismatch'].append((ids[node], ids[target]) + unmatched)
+                continue
+            unmatched = _unmatched_exit(directions, back_codes, codes)
+            if unmatched is not None:
+                result['reverse_mismatch'].append((ids[target], ids[node]) + unmatched)
+
+    result['duplicate_coordinates'] = [(point, [ids[node] for node in nodes])
+                                       for point, nodes in duplicates.items()]
+    return result
+
+
+def _print_section(title: str, lines: Iterable[str], count: int, limit: int):
+    print(f"\n{title} ({count} 个)")
+    print("-" * 40)
+    for line in lines:
+        print(f"  {line}")
+    if count > limit:
+        print(f"  ... 还有 {count - limit} 个")
+
+
+def print_coordinate_report(result: Dict[str, List], names: Dict[str, str], limit: int = 20):
+    """打印坐标检查报告"""
+    def label(room_id):
+        return f"{names.get(room_id, room_id)} ({room_id})"
+
+    def fmt(point):
+        return ', '.join(f"{v:g}" for v in point)
+
+    duplicates = result['duplicate_coordinates']
+    _print_section("坐标重叠的房间", (f"({fmt(point)}): {', '.join(label(r) for r in rooms)}"
+                                      for point, rooms in duplicates[:limit]), len(duplicates), limit)
+
+    close = result['close_rooms']
+    if close:
+        _print_section("坐标过近的房间", (f"{label(a)} 与 {label(b)} 相距 {distance:g}"
+                                          for a, b, distance in close[:limit]), len(close), limit)
+
+    mismatches = result['direction_mismatch']
+    _print_section("方向与坐标不符的出口", (f"{label(a)} --{d}--> {label(b)}，坐标差 ({fmt(delta)})"
+                                             for a, b, d, delta in mismatches[:limit]), len(mismatches), limit)
+
+    reverses = result['reverse_mismatch']
+    _print_section("反向出口方向不相反的连接",
+                   (f"{label(a)} --{d}--> {label(b)}，反向出口为 {'/'.join(back)}，应为 {OPPOSITE_DIRECTIONS[d]}"
+                    for a, b, d, back in reverses[:limit]), len(reverses), limit)
+
+    if result['missing_coordinates']:
+        print(f"\n[WARNING] {len(result['missing_coordinates'])} 个房间没有坐标，已跳过方向检查")
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='检查房间坐标与出口方向是否一致')
+    parser.add_argument('maps_root', help='地图根目录，如 packages/server/data/maps')
+    parser.add_argument('--limit', type=int, default=20, help='每类问题显示的条目数（默认 20）')
+    parser.add_argument('--min-distance', type=float, default=0.0,
+                        help='同一层上坐标不同的房间距离小于该值时报告（默认 0，不检查）')
+    parser.add_argument('--output', help='可选，把全部问题保存为 JSON 文件')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='并行解析地图文件的进程数，0 表示使用全部 CPU 核（默认 1）')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    world = load_world(discover_map_files(args.maps_root), args.workers or None)
+    for file_path, error in world.errors:
+        print(f"[ERROR] 无法加载文件 {file_path}: {error}")
+    for room_id, kept, duplicate in world.conflicts:
+        print(f"[WARNING] 房间ID冲突 {room_id}，保留 {kept}，忽略 {duplicate}")
+    records = list(world.rooms.values())
+    graph = RoomGraph.from_records(records)
+    print(f"加载了 {graph.room_count} 个房间，{graph.edge_count} 个出口")
+
+    result = check_coordinates(graph, [room_point(record) for record in records], args.min_distance)
+    print_coordinate_report(result, {record.id: record.name for record in records}, args.limit)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n检查结果已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    # 设置标准输出编码为UTF-8
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    main()
@@ -2,39 +2,11 @@
 # -*- coding: utf-8 -*-
 """
 修复欢迎界面对齐问题
-使用 wcwidth 库精确计算字符显示宽度
+使用 text_width 的预计算宽度表计算字符显示宽度，整棵源码树的检查见 text_width.py
 """
 
-import unicodedata
-
-def get_char_width(char):
-    """获取字符的显示宽度"""
-    # 获取字符的 East Asian Width 属性
-    ea = unicodedata.east_asian_width(char)
-
-    # F (Fullwidth) 和 W (Wide) 占2个宽度
-    if ea in ('F', 'W'):
-        return 2
-    # A (Ambiguous) 根据情况，在等宽字体中通常是2
-    elif ea == 'A':
-        # 检查是否是某些特殊字符
-        code = ord(char)
-        # 边框字符
-        if code in [0x2500, 0x2501, 0x2503, 0x250F, 0x2513, 0x2517, 0x251B,
-                    0x2523, 0x252B, 0x253B, 0x254B, 0x2550, 0x2551, 0x2554,
-                    0x2557, 0x255A, 0x255D, 0x2560, 0x2563, 0x2566, 0x2569,
-                    0x256C, 0x250C, 0x2510, 0x2514, 0x2518, 0x251C, 0x2524,
-                    0x252C, 0x2534, 0x253C]:
-            return 1
-        # 其他 Ambiguous 字符在等宽字体中占2
-        return 2
-    # N (Neutral), Na (Narrow), H (Halfwidth) 占1个宽度
-    else:
-        return 1
-
-def get_string_width(s):
-    """计算字符串的显示宽度"""
-    return sum(get_char_width(c) for c in s)
+from text_width import char_width as get_char_width
+from text_width import string_width as get_string_width
 
 def test_line(line, line_num):
     """测试一行的宽度"""
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成地图生成器
+按指定规模（1k ~ 1M 房间）、拓扑（网格城市、枢纽辐射、城镇链）和缺陷比例（单向出口、
+悬空目标、孤岛）生成与正式地图相同结构的 districts/locations/rooms/exits JSON，
+用于压测连通性分析工具。房间按位置连续生成并直接流式写出，不在内存中保存整张地图
+"""
+
+import abc
+import argparse
+import io
+import json
+import math
+import os
+import sys
+from typing import Iterator, List, NamedTuple, Tuple
+
+TOPOLOGIES = ('grid', 'hub', 'chain')
+ROOM_TYPES = ('street', 'street', 'street', 'shop', 'inn', 'teahouse', 'residence', 'temple')
+SPACING = 10
+
+_MASK64 = (1 << 64) - 1
+
+
+def _chance(seed: int, *keys: int) -> float:
+    """由种子与整数键确定的 [0, 1) 伪随机数（splitmix64 混合），同一条边两端得到相同结果"""
+    value = seed & _MASK64
+    for key in keys:
+        value = (value + 0x9E3779B97F4A7C15 + key) & _MASK64
+        value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+        value ^= value >> 31
+    return value / 2.0 ** 64
+
+
+class SyntheticRoom(NamedTuple):
+    index: int
+    district: int
+    location: int
+    x: int
+    y: int
+    exits: List[Tuple[str, int]]
+
+
+class Defects(NamedTuple):
+    one_way: float = 0.0
+    dangling: float = 0.0
+    islands: float = 0.0
+
+
+class _Topology(abc.ABC):
+    """拓扑基类：子类按位置连续的顺序产出房间，邻居以房间编号表示"""
+
+    def __init__(self, rooms: int):
+        self.rooms = rooms
+
+    @abc.abstractmethod
+    def iter_rooms(self) -> Iterator[SyntheticRoom]:
+        """按位置连续的顺序产出全部房间"""
+
+    @abc.abstractmethod
+    def block_of(self, index: int) -> int:
+        """房间所属的孤岛判定单元（位置），跨越孤岛单元边界的出口会被删除"""
+
+
+class GridCity(_Topology):
+    """正方形网格城市：10x10 房间为一个位置，50x50 房间为一个区域，四向连通"""
+    block = 10
+    district_blocks = 5
+
+    def __init__(self, rooms: int):
+        super().__init__(rooms)
+        self.side = max(1, math.ceil(math.sqrt(rooms)))
+
+    def _xy(self, index: int) -> Tuple[int, int]:
+        return index % self.side, index // self.side
+
+    def block_of(self, index: int) -> int:
+        x, y = self._xy(index)
+        blocks_per_row = math.ceil(self.side / self.block)
+        return (y // self.block) * blocks_per_row + x // self.block
+
+    def iter_rooms(self) -> Iterator[SyntheticRoom]:
+        side, block = self.side, self.block
+        blocks_per_row = math.ceil(side / block)
+        district_side = block * self.district_blocks
+        districts_per_row = math.ceil(side / district_side)
+        for by in range(0, side, block):
+            for bx in range(0, side, block):
+                location = (by // block) * blocks_per_row + bx // block
+                district = (by // district_side) * districts_per_row + bx // district_side
+                for y in range(by, min(by + block, side)):
+                    for x in range(bx, min(bx + block, side)):
+                        index = y * side + x
+                        if index >= self.rooms:
+                            continue
+                        exits = []
+                        for direction, nx, ny in (('north', x, y + 1), ('south', x, y - 1),
+                                                  ('east', x + 1, y), ('west', x - 1, y)):
+                            neighbor = ny * side + nx
+                            if 0 <= nx < side and 0 <= ny < side and neighbor < self.rooms:
+                                exits.append((direction, neighbor))
+                        yield SyntheticRoom(index, district, location, x * SPACING, y * SPACING, exits)
+
+
+class HubAndSpoke(_Topology):
+    """枢纽辐射：枢纽沿东西向连成一线，每个枢纽向六个方向伸出长度固定的支路，每条支路是一个位置"""
+    arm_length = 10
+    arm_directions = (('north', 0, 1), ('south', 0, -1), ('northeast', 1, 1),
+                      ('northwest', -1, 1), ('southeast', 1, -1), ('southwest', -1, -1))
+    opposite = {'north': 'south', 'south': 'north', 'northeast': 'southwest',
+                'southwest': 'northeast', 'northwest': 'southeast', 'southeast': 'northwest'}
+
+    def __init__(self, rooms: int):
+        super().__init__(rooms)
+        self.per_hub = 1 + len(self.arm_directions) * self.arm_length
+        self.hubs = max(1, math.ceil(rooms / self.per_hub))
+
+    def block_of(self, index: int) -> int:
+        hub, offset = divmod(index, self.per_hub)
+        # 枢纽自身属于 0 号单元，支路各自成单元
+        return hub * 8 + (0 if offset == 0 else 1 + (offset - 1) // self.arm_length)
+
+    def iter_rooms(self) -> Iterator[SyntheticRoom]:
+        per_hub, length = self.per_hub, self.arm_length
+        spacing = (2 * length + 2) * SPACING
+        for hub in range(self.hubs):
+            base = hub * per_hub
+            if base >= self.rooms:
+                return
+            hub_x = hub * spacing
+            exits = []
+            if hub > 0:
+                exits.append(('west', base - per_hub))
+            if base + per_hub < self.rooms:
+                exits.append(('east', base + per_hub))
+            for arm, (direction, _, _) in enumerate(self.arm_directions):
+                first = base + 1 + arm * length
+                if first < self.rooms:
+                    exits.append((direction, first))
+            yield SyntheticRoom(base, hub // 10, hub * 7, hub_x, 0, exits)
+
+            for arm, (direction, dx, dy) in enumerate(self.arm_directions):
+                for step in range(length):
+                    index = base + 1 + arm * length + step
+                    if index >= self.rooms:
+                        return
+                    back = base if step == 0 else index - 1
+                    exits = [(self.opposite[direction], back)]
+                    if step + 1 < length and index + 1 < self.rooms:
+                        exits.append((direction, index + 1))
+                    yield SyntheticRoom(index, hub // 10, hub * 7 + 1 + arm,
+                                        hub_x + dx * (step + 1) * SPACING, dy * (step + 1) * SPACING, exits)
+
+
+class TownChain(_Topology):
+    """城镇链：8x8 的小镇之间由 6 个房间的东西向道路相连，每个小镇和每段道路各是一个位置"""
+    town_side = 8
+    road_length = 6
+
+    def __init__(self, rooms: int):
+        super().__init__(rooms)
+        self.town_rooms = self.town_side * self.town_side
+        self.per_segment = self.town_rooms + self.road_length
+
+    def block_of(self, index: int) -> int:
+        segment, offset = divmod(index, self.per_segment)
+        return segment * 2 + (0 if offset < self.town_rooms else 1)
+
+    def iter_rooms(self) -> Iterator[SyntheticRoom]:
+        side, road = self.town_side, self.road_length
+        per_segment = self.per_segment
+        segments = math.ceil(self.rooms / per_segment)
+        for segment in range(segments):
+            base = segment * per_segment
+            origin = segment * (side + road) * SPACING
+            # 道路接在小镇最南一排，按行填充的不完整小镇也能与道路连通
+            middle = 0
+            for offset in range(self.town_rooms):
+                index = base + offset
+                if index >= self.rooms:
+                    return
+                x, y = offset % side, offset // side
+                exits = []
+                for direction, nx, ny in (('north', x, y + 1), ('south', x, y - 1),
+                                          ('east', x + 1, y), ('west', x - 1, y)):
+                    if 0 <= nx < side and 0 <= ny < side and base + ny * side + nx < self.rooms:
+                        exits.append((direction, base + ny * side + nx))
+                # 小镇西南角连接上一段道路，东南角连接本段道路
+                if x == 0 and y == middle and segment > 0:
+                    exits.append(('west', base - 1))
+                if x == side - 1 and y == middle and base + self.town_rooms < self.rooms:
+                    exits.append(('east', base + self.town_rooms))
+                yield SyntheticRoom(index, segment // 10, segment * 2, origin + x * SPACING, y * SPACING, exits)
+
+            for step in range(road):
+                index = base + self.town_rooms + step
+                if index >= self.rooms:
+                    return
+                west = base + middle * side + side - 1 if step == 0 else index - 1
+                exits = [('west', west)]
+                if step + 1 < road:
+                    if index + 1 < self.rooms:
+                        exits.append(('east', index + 1))
+                elif index + 1 + middle * side < self.rooms:
+                    exits.append(('east', index + 1 + middle * side))
+                yield SyntheticRoom(index, segment // 10, segment * 2 + 1,
+                                    origin + (side + step) * SPACING, middle * SPACING, exits)
+
+
+def make_topology(name: str, rooms: int) -> _Topology:
+    if name == 'grid':
+        return GridCity(rooms)
+    if name == 'hub':
+        return HubAndSpoke(rooms)
+    if name == 'chain':
+        return TownChain(rooms)
+    raise ValueError(f"未知的拓扑: {name}")
+
+
+def room_id(index: int) -> str:
+    return f"syn_{index}"
+
+
+def _room_json(room: SyntheticRoom, topology: _Topology, defects: Defects, seed: int,
+               island_blocks: set) -> dict:
+    exits = []
+    own_block = topology.block_of(room.index)
+    for direction, neighbor in room.exits:
+        neighbor_block = topology.block_of(neighbor)
+        if own_block != neighbor_block and (own_block in island_blocks or neighbor_block in island_blocks):
+            continue
+        # 单向出口：按无序边抽签，删除编号较大一端的出口
+        low, high = min(room.index, neighbor), max(room.index, neighbor)
+        if room.index == high and _chance(seed, 1, low, high) < defects.one_way:
+            continue
+        exits.append({
+            'direction': direction,
+            'targetRoomId': room_id(neighbor),
+            'description': f"通往{room_id(neighbor)}"
+        })
+    if _chance(seed, 2, room.index) < defects.dangling:
+        exits.append({'direction': 'down', 'targetRoomId': f"missing_{room.index}", 'description': "坍塌的地道"})
+
+    return {
+        'id': room_id(room.index),
+        'name': f"合成房间{room.index}",
+        'type': ROOM_TYPES[int(_chance(seed, 3, room.index) * len(ROOM_TYPES))],
+        'district': f"合成区{room.district}",
+        'description': "由合成地图生成器创建的测试房间。",
+        'coordinates': {'x': room.x, 'y': room.y, 'z': 0},
+        'exits': exits
+    }
+
+
+def generate_world(output_dir: str, rooms: int, topology_name: str = 'grid', defects: Defects = Defects(),
+                   seed: int = 0, rooms_per_file: int = 20000) -> List[str]:
+    """生成合成地图并写入 output_dir，返回生成的文件路径列表
+
+    房间按位置连续产出，每满 rooms_per_file 个房间在下一个位置开始处换一个文件，位置不会被拆到两个文件中。
+    孤岛比例按位置抽签：被选中的位置删除所有跨越位置边界的出口。
+    """
+    topology = make_topology(topology_name, rooms)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # 孤岛单元在流式写出前确定；第 0 个单元（起点所在）永远不是孤岛
+    blocks = set(topology.block_of(index) for index in range(rooms)) if defects.islands else set()
+    island_blocks = {block for block in blocks if block != topology.block_of(0)
+                     and _chance(seed, 4, block) < defects.islands}
+
+    paths = []
+    out = None
+    written = 0
+    current_district = current_location = None
+
+    def close_file():
+        if out is not None:
+            out.write(']}]}' if current_location is not None else '')
+            out.write(']}\n')
+            out.close()
+
+    for room in topology.iter_rooms():
+        if out is None or written >= rooms_per_file and room.location != current_location:
+            close_file()
+            path = os.path.join(output_dir, f"synthetic_{topology_name}_{len(paths):04d}.json")
+            paths.append(path)
+            out = open(path, 'w', encoding='utf-8')
+            out.write('{"districts": [')
+            written = 0
+            current_district = current_location = None
+
+        if room.district != current_district:
+            if current_district is not None:
+                out.write(']}]},')
+            out.write(f'{{"id": "syn_district_{room.district}", "name": "合成区{room.district}", "locations": [')
+            current_district = room.district
+            current_location = None
+        if room.location != current_location:
+            if current_location is not None:
+                out.write(']},')
+            out.write(f'{{"id": "syn_location_{room.location}", "name": "合成地点{room.location}", "rooms": [')
+            current_location = room.location
+        else:
+            out.write(',')
+        out.write(json.dumps(_room_json(room, topology, defects, seed, island_blocks), ensure_ascii=False))
+        written += 1
+
+    close_file()
+    return paths
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='生成用于压测的合成地图')
+    parser.add_argument('output_dir', help='输出目录')
+    parser.add_argument('--rooms', type=int, default=10000, help='房间数（默认 10000）')
+    parser.add_argument('--topology', choices=TOPOLOGIES, default='grid', help='拓扑结构（默认 grid）')
+    parser.add_argument('--one-way', type=float, default=0.0, help='单向出口比例（按连接计）')
+    parser.add_argument('--dangling', type=float, default=0.0, help='带悬空出口的房间比例')
+    parser.add_argument('--islands', type=float, default=0.0, help='成为孤岛的位置比例')
+    parser.add_argument('--rooms-per-file', type=int, default=20000, help='每个文件的房间数（默认 20000）')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    defects = Defects(args.one_way, args.dangling, args.islands)
+    paths = generate_world(args.output_dir, args.rooms, args.topology, defects, args.seed, args.rooms_per_file)
+    print(f"[OK] 已生成 {args.rooms} 个房间（{args.topology}），共 {len(paths)} 个文件: {args.output_dir}")
+
+
+if __name__ == "__main__":
+    # 设置标准输出编码为UTF-8
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    main()
@@ -0,0 +1,724 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量连通性分析缓存
+按文件内容哈希缓存每个地图文件的房间记录，并在缓存中常驻全局房间表、反向出口索引、
+统计计数、每个房间的校验问题以及弱/强连通分量。文件变化时只重新解析该文件，
+把变化落实到具体房间：统计按房间增减，校验规则只对变化房间及指向它们的房间重新运行，
+连通分量按增删的出口局部拆分或合并，代价与受影响的部分成正比。
+"""
+
+import hashlib
+import heapq
+import os
+import pickle
+from bisect import insort
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+from check_coordinates import room_point
+from map_components import strong_components
+from map_graph import RoomGraph
+from map_loader import RoomRecord, iter_file_rooms
+from map_rules import EXPECTED_ROOM_COUNT, Issue, RuleEngine, default_rules, missing_reverse_connections
+
+# 房间总数是全局规则，在合并结果时单独检查，其余规则的问题都归属于出口所在的房间
+GLOBAL_RULES = ('room_count',)
+
+CACHE_VERSION = 2
+
+# 持久化到缓存文件的分析状态
+_STATE = ('files', 'holders', 'records', 'referrers', 'room_types', 'district_stats', 'direction_stats',
+          'room_connections', 'room_issues', 'components', '_connection_buckets',
+          '_dirty_rooms', '_structure_base')
+
+Position = Tuple[str, int]
+
+
+def file_digest(file_path: str) -> str:
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def room_issues(world: Mapping[str, RoomRecord], sources: Iterable[str]) -> List[Issue]:
+    """只对 sources 中的房间运行逐房间校验规则
+
+    子图包含 sources 及其出口目标，目标房间的出口用于判断反向连接；只保留来源在 sources 中的问题，
+    因此结果与在整个世界上运行规则后筛选这些房间一致，代价与 sources 的出口数成正比。
+    """
+    sources = set(sources)
+    rows = {room_id: world[room_id] for room_id in sorted(sources) if room_id in world}
+    for record in list(rows.values()):
+        for _, target, _ in record.exits:
+            if target not in rows and target in world:
+                rows[target] = world[target]
+    records = list(rows.values())
+    graph = RoomGraph.from_records(records)
+    rules = [rule for rule in default_rules() if rule.name not in GLOBAL_RULES]
+    issues = RuleEngine(rules).run(graph, exits_of=lambda room_id: rows[room_id].exits,
+                                   points=[room_point(record) for record in records])
+    return [issue for issue in issues if issue.room in sources]
+
+
+def _targets(record: RoomRecord) -> Set[str]:
+    return {target for _, target, _ in record.exits}
+
+
+class RoomInfoView(Mapping):
+    """按需从房间记录生成 room_info 条目，避免为整个世界构建信息字典"""
+
+    def __init__(self, records: Dict[str, RoomRecord]):
+        self._records = records
+
+    @property
+    def records(self) -> Dict[str, RoomRecord]:
+        return self._records
+
+    def __getitem__(self, room_id: str) -> Dict:
+        record = self._records[room_id]
+        return {
+            'name': record.name,
+            'type': record.type,
+            'district': record.district,
+            'location': record.location,
+            'coordinates': record.coordinates,
+            'description': record.description
+        }
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+class _Components:
+    """常驻的弱/强连通分量标注，按出口结构的变化局部修补
+
+    分量用自增编号标识。删除出口或房间只可能拆分其所在的分量：弱连通分量从断开处的各端点
+    同时交替搜索，先走完的一侧即分离出的小分量，代价与较小的一侧成正比；强连通分量取一个端点
+    为枢纽，正反两次搜索找到全部端点即说明仍然强连通，否则只对该分量重跑 Tarjan。
+    新增出口或房间只可能合并分量：弱连通分量把较小的一个并入较大的一个；强连通分量在新出口
+    形成回路时（双向搜索相遇）对所在的弱连通分量重跑 Tarjan。
+    """
+
+    def __init__(self):
+        self.weak_of: Dict[str, int] = {}
+        self.weak_members: Dict[int, Set[str]] = {}
+        self.strong_of: Dict[str, int] = {}
+        self.strong_members: Dict[int, Set[str]] = {}
+        self.strong_sizes: Dict[int, Set[int]] = {}
+        self.next_label = 0
+
+    def _label(self) -> int:
+        self.next_label += 1
+        return self.next_label
+
+    def _size_changed(self, strong: int, old_size: int):
+        if old_size:
+            bucket = self.strong_sizes[old_size]
+            bucket.discard(strong)
+            if not bucket:
+                del self.strong_sizes[old_size]
+        members = self.strong_members.get(strong)
+        if members:
+            self.strong_sizes.setdefault(len(members), set()).add(strong)
+        elif strong in self.strong_members:
+            del self.strong_members[strong]
+
+    def _new_strong(self, members: Set[str]):
+        strong = self._label()
+        self.strong_members[strong] = members
+        for room_id in members:
+            self.strong_of[room_id] = strong
+        self._size_changed(strong, 0)
+
+    def _drop_strong(self, strong: int) -> Set[str]:
+        members = self.strong_members[strong]
+        size = len(members)
+        self.strong_members[strong] = set()
+        self._size_changed(strong, size)
+        return members
+
+    def _tarjan(self, records: Mapping[str, RoomRecord], members: Iterable[str]):
+        """在 members 导出的子图上计算强连通分量并登记（子图外的目标视为不存在）"""
+        graph = RoomGraph.from_records(records[room_id] for room_id in sorted(members))
+        labels, count = strong_components(graph)
+        groups = [set() for _ in range(count)]
+        for node, label in enumerate(labels):
+            groups[label].add(graph.ids[node])
+        for group in groups:
+            self._new_strong(group)
+
+    def rebuild(self, records: Mapping[str, RoomRecord], referrers: Mapping[str, Set[str]]):
+        """从头标注全部分量"""
+        self.__init__()
+        for seed in records:
+            if seed in self.weak_of:
+                continue
+            label = self._label()
+            members = {seed}
+            self.weak_of[seed] = label
+            stack = [seed]
+            while stack:
+                room_id = stack.pop()
+                for neighbor in _neighbors(records, referrers, room_id):
+                    if neighbor not in self.weak_of:
+                        self.weak_of[neighbor] = label
+                        members.add(neighbor)
+                        stack.append(neighbor)
+            self.weak_members[label] = members
+            self._tarjan(records, members)
+
+    def update(self, records: Mapping[str, RoomRecord], referrers: Mapping[str, Set[str]],
+               bases: Dict[str, Optional[FrozenSet[str]]]):
+        """bases 为出口结构变化的房间在上次标注时的出口目标（当时不存在为 None）"""
+
+        def existed(room_id: str) -> bool:
+            return bases[room_id] is not None if room_id in bases else room_id in records
+
+        def old_active(room_id: str) -> Set[str]:
+            if not existed(room_id):
+                return set()
+            targets = bases[room_id] if room_id in bases else _targets(records[room_id])
+            return {target for target in targets if existed(target)}
+
+        def new_active(room_id: str) -> Set[str]:
+            if room_id not in records:
+                return set()
+            return {target for target in _targets(records[room_id]) if target in records}
+
+        # 出口变化的房间，以及指向存在性发生变化的房间的其他房间
+        sources = set(bases)
+        for room_id, base in bases.items():
+            if (base is None) != (room_id not in records):
+                sources.update(referrers.get(room_id, ()))
+        removed_edges = []
+        added_edges = []
+        for room_id in sorted(sources):
+            before, after = old_active(room_id), new_active(room_id)
+            removed_edges.extend((room_id, target) for target in sorted(before - after))
+            added_edges.extend((room_id, target) for target in sorted(after - before))
+        removed_rooms = sorted(room_id for room_id, base in bases.items() if base is not None and room_id not in records)
+        added_rooms = sorted(room_id for room_id, base in bases.items() if base is None and room_id in records)
+
+        removed_strong = {}
+        for room_id in removed_rooms:
+            label = self.weak_of.pop(room_id)
+            self.weak_members[label].discard(room_id)
+            if not self.weak_members[label]:
+                del self.weak_members[label]
+            strong = removed_strong[room_id] = self.strong_of.pop(room_id)
+            self.strong_members[strong].discard(room_id)
+            self._size_changed(strong, len(self.strong_members[strong]) + 1)
+
+        # 可能被拆分的分量及其断开处的端点
+        weak_ends: Dict[int, Set[str]] = {}
+        strong_ends: Dict[int, Set[str]] = {}
+        for source, target in removed_edges:
+            if source in records and target in records:
+                if self.strong_of[source] == self.strong_of[target]:
+                    strong_ends.setdefault(self.strong_of[source], set()).update((source, target))
+                if source not in _targets(records[target]):
+                    weak_ends.setdefault(self.weak_of[source], set()).update((source, target))
+                continue
+            kept, gone = (source, target) if source in records else (target, source)
+            if kept not in records:
+                continue
+            weak_ends.setdefault(self.weak_of[kept], set()).add(kept)
+            if self.strong_of[kept] == removed_strong[gone]:
+                strong_ends.setdefault(removed_strong[gone], set()).add(kept)
+
+        for label, ends in sorted(weak_ends.items()):
+            if len(ends) > 1:
+                self._split_weak(records, referrers, label, ends)
+        for strong, ends in sorted(strong_ends.items()):
+            if self.strong_members.get(strong) and not self._strongly_connected(records, referrers, strong, ends):
+                self._tarjan(records, self._drop_strong(strong))
+
+        for room_id in added_rooms:
+            label = self._label()
+            self.weak_of[room_id] = label
+            self.weak_members[label] = {room_id}
+            self._new_strong({room_id})
+        for source, target in added_edges:
+            self._merge_weak(self.weak_of[source], self.weak_of[target])
+
+        rebuilt = set()
+        for source, target in added_edges:
+            label = self.weak_of[source]
+            if label in rebuilt or self.strong_of[source] == self.strong_of[target]:
+                continue
+            if _reaches(records, referrers, target, source):
+                # 新出口形成回路，回路上的强连通分量合并：在所在的弱连通分量上重算
+                members = self.weak_members[label]
+                for strong in {self.strong_of[room_id] for room_id in members}:
+                    self._drop_strong(strong)
+                self._tarjan(records, members)
+                rebuilt.add(label)
+
+    def _merge_weak(self, a: int, b: int):
+        if a == b:
+            return
+        if len(self.weak_members[a]) < len(self.weak_members[b]):
+            a, b = b, a
+        moved = self.weak_members.pop(b)
+        for room_id in moved:
+            self.weak_of[room_id] = a
+        self.weak_members[a] |= moved
+
+    def _split_weak(self, records: Mapping[str, RoomRecord], referrers: Mapping[str, Set[str]],
+                    label: int, ends: Set[str]):
+        """从各端点交替搜索同一分量内的房间，相遇的搜索合并；只剩一组仍未走完时，
+        已走完的各组就是拆分出的分量，其余房间留在原分量中"""
+        weak_of = self.weak_of
+        ends = sorted(ends)
+        parent = list(range(len(ends)))
+
+        def find(search: int) -> int:
+            while parent[search] != search:
+                parent[search] = parent[parent[search]]
+                search = parent[search]
+            return search
+
+        owner = {room_id: search for search, room_id in enumerate(ends)}
+        stacks = [[room_id] for room_id in ends]
+        live = list(range(len(ends)))
+        group_count = len(ends)
+        while group_count > 1:
+            live = [search for search in live if stacks[search]]
+            if len({find(search) for search in live}) <= 1:
+                break
+            for search in live:
+                if not stacks[search]:
+                    continue
+                room_id = stacks[search].pop()
+                for neighbor in _neighbors(records, referrers, room_id):
+                    if weak_of.get(neighbor) != label:
+                        continue
+                    other = owner.get(neighbor)
+                    if other is None:
+                        owner[neighbor] = search
+                        stacks[search].append(neighbor)
+                    elif find(other) != find(search):
+                        parent[find(other)] = find(search)
+                        group_count -= 1
+
+        if group_count == 1:
+            return
+        active = {find(search) for search in live if stacks[search]}
+        finished = sorted({find(search) for search in range(len(ends))} - active)
+        if not active:
+            # 所有搜索都已走完：最大的一组保留原编号
+            sizes = Counter(find(search) for search in owner.values())
+            finished.remove(max(finished, key=lambda group: (sizes[group], -group)))
+        split = {group: set() for group in finished}
+        for room_id, search in owner.items():
+            group = find(search)
+            if group in split:
+                split[group].add(room_id)
+        for members in split.values():
+            new_label = self._label()
+            self.weak_members[label] -= members
+            self.weak_members[new_label] = members
+            for room_id in members:
+                weak_of[room_id] = new_label
+
+    def _strongly_connected(self, records: Mapping[str, RoomRecord], referrers: Mapping[str, Set[str]],
+                            strong: int, ends: Set[str]) -> bool:
+        """分量内任取一个端点为枢纽，它能到达全部端点且全部端点都能到达它，即仍然强连通"""
+        strong_of = self.strong_of
+        pivot = min(ends)
+        for forward in (True, False):
+            missing = set(ends)
+            missing.discard(pivot)
+            seen = {pivot}
+            stack = [pivot]
+            while stack and missing:
+                room_id = stack.pop()
+                if forward:
+                    neighbors = (target for _, target, _ in records[room_id].exits)
+                else:
+                    neighbors = referrers.get(room_id, ())
+                for neighbor in neighbors:
+                    if neighbor not in seen and strong_of.get(neighbor) == strong and neighbor in records:
+                        seen.add(neighbor)
+                        missing.discard(neighbor)
+                        stack.append(neighbor)
+            if missing:
+                return False
+        return True
+
+    def trap_components(self, records: Mapping[str, RoomRecord], referrers: Mapping[str, Set[str]],
+                        position) -> List[Dict]:
+        """陷阱区域，定义与 map_components.find_trap_components 一致
+
+        不含主强连通分量的弱连通分量整体是一个（无法从主分量进入的）陷阱区域；主强连通分量所在的
+        弱连通分量只需检查其中主分量以外的房间，代价与这部分房间数成正比。
+        """
+        if not self.strong_sizes:
+            return []
+        # 房间最多的强连通分量，数量相同时取包含世界顺序最靠前房间的分量
+        candidates = self.strong_sizes[max(self.strong_sizes)]
+        main_strong = next(iter(candidates)) if len(candidates) == 1 else \
+            min(candidates, key=lambda strong: min(map(position, self.strong_members[strong])))
+        main_weak = self.weak_of[next(iter(self.strong_members[main_strong]))]
+        strong_of = self.strong_of
+
+        rest = [strong for strong, members in self.strong_members.items()
+                if strong != main_strong and self.weak_of[next(iter(members))] == main_weak]
+        successors: Dict[int, Set[int]] = {}
+        entered: Set[int] = set()
+        for strong in rest:
+            following = successors[strong] = set()
+            for room_id in self.strong_members[strong]:
+                for _, target, _ in records[room_id].exits:
+                    if target in records and strong_of[target] != strong:
+                        following.add(strong_of[target])
+                if any(strong_of.get(source) == main_strong for source in referrers.get(room_id, ())):
+                    entered.add(strong)
+
+        # 缩点图无环：迭代后序遍历确定每个分量能否到达主分量
+        reaches = {main_strong: True}
+        for strong in rest:
+            stack = [strong]
+            while stack:
+                current = stack[-1]
+                if current in reaches:
+                    stack.pop()
+                    continue
+                pending = [following for following in successors[current] if following not in reaches]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                reaches[current] = any(reaches[following] for following in successors[current])
+                stack.pop()
+
+        stack = list(entered)
+        while stack:
+            for following in successors.get(stack.pop(), ()):
+                if following != main_strong and following not in entered:
+                    entered.add(following)
+                    stack.append(following)
+
+        traps = []
+        neighbors: Dict[int, List[int]] = {}
+        for strong in rest:
+            if reaches[strong]:
+                continue
+            for following in successors[strong]:
+                neighbors.setdefault(strong, []).append(following)
+                neighbors.setdefault(following, []).append(strong)
+        grouped = set()
+        for strong in rest:
+            if reaches[strong] or strong in grouped:
+                continue
+            grouped.add(strong)
+            region = [strong]
+            stack = [strong]
+            while stack:
+                for neighbor in neighbors.get(stack.pop(), ()):
+                    if neighbor not in grouped:
+                        grouped.add(neighbor)
+                        region.append(neighbor)
+                        stack.append(neighbor)
+            rooms = sorted((room_id for member in region for room_id in self.strong_members[member]), key=position)
+            traps.append((rooms, any(member in entered for member in region)))
+
+        traps.extend((sorted(members, key=position), False)
+                     for label, members in self.weak_members.items() if label != main_weak)
+        traps.sort(key=lambda trap: position(trap[0][0]))
+        return [{'rooms': rooms, 'entered_from_main': entered_region} for rooms, entered_region in traps]
+
+
+
+class IncrementalAnalyzer:
+    """带持久化缓存的增量连通性分析
+
+    缓存以 pickle 保存在 cache_path（为 None 时只保留在内存中）。重复的房间 ID 与 load_world 一样
+    按 (文件路径, 文件内顺序) 保留第一次出现的版本，holders 记录每个 ID 的全部出现位置，
+    records 为生效的房间。refresh 只更新房间表、反向出口索引与统计；校验问题与连通分量
+    在 assemble 时按累积的变化房间补算。
+    """
+
+    def __init__(self, cache_path: Optional[str] = None):
+        self.cache_path = cache_path
+        self.files: Dict[str, Dict] = {}
+        self.holders: Dict[str, List[Position]] = {}
+        self.records: Dict[str, RoomRecord] = {}
+        self.referrers: Dict[str, Set[str]] = {}
+        self.room_types = Counter()
+        self.district_stats = Counter()
+        self.direction_stats = Counter()
+        self.room_connections: Dict[str, int] = {}
+        self.room_issues: Dict[str, List[Issue]] = {}
+        self.components = _Components()
+        self._connection_buckets: Dict[int, Set[str]] = {}
+        self._dirty_rooms: Set[str] = set()
+        # 出口结构变化的房间 -> 上次计算分量时的出口目标（当时不存在为 None）
+        self._structure_base: Dict[str, Optional[FrozenSet[str]]] = {}
+
+        self.reparsed: List[str] = []
+        self.dropped: List[Tuple[str, int]] = []
+        self.errors: List[Tuple[str, str]] = []
+        self._load_cache()
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cache = pickle.load(f)
+        except Exception as e:
+            print(f"警告：无法读取分析缓存 {self.cache_path}: {e}，将重新分析")
+            return
+        if cache.get('version') == CACHE_VERSION:
+            for name in _STATE:
+                setattr(self, name, cache['state'][name])
+
+    def save(self):
+        if not self.cache_path:
+            return
+        tmp_path = self.cache_path + '.tmp'
+        state = {name: getattr(self, name) for name in _STATE}
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': CACHE_VERSION, 'state': state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.cache_path)
+
+    @property
+    def conflicts(self) -> List[Tuple[str, str, str]]:
+        """(room_id, 保留的文件, 重复的文件)，与 load_world 的冲突记录一致"""
+        duplicates = sorted(
+            (duplicate, room_id, holders[0][0])
+            for room_id, holders in self.holders.items() if len(holders) > 1
+            for duplicate in holders[1:]
+        )
+        return [(room_id, kept, duplicate[0]) for duplicate, room_id, kept in duplicates]
+
+    def position(self, room_id: str) -> Position:
+        """房间在世界加载顺序中的位置"""
+        return self.holders[room_id][0]
+
+    def refresh(self, file_paths: List[str], changed: Optional[List[str]] = None) -> List[str]:
+        """根据内容哈希更新缓存，返回本次重新解析的文件
+
+        changed 给出已知发生变化的文件时只检查这些文件，其余文件直接沿用缓存。
+        被删除或无法解析的已缓存文件记入 dropped (文件, 移除的房间数)，其房间不再参与分析。
+        """
+        file_paths = sorted(file_paths)
+        self.reparsed = []
+        self.dropped = []
+        self.errors = []
+
+        for stale in sorted(set(self.files) - set(file_paths)):
+            self.dropped.append((stale, len(self.files[stale]['records'])))
+            self._replace_file(stale, None)
+
+        candidates = file_paths if changed is None else sorted(set(changed) & set(file_paths))
+        for file_path in candidates:
+            cached = self.files.get(file_path)
+            try:
+                digest = file_digest(file_path)
+                if cached is not None and cached['digest'] == digest:
+                    continue
+                records = list(iter_file_rooms(file_path))
+            except Exception as e:
+                self.errors.append((file_path, str(e)))
+                if cached is not None:
+                    self.dropped.append((file_path, len(cached['records'])))
+                    self._replace_file(file_path, None)
+                continue
+            self._replace_file(file_path, {'digest': digest, 'records': records})
+            self.reparsed.append(file_path)
+
+        return self.reparsed
+
+    def _replace_file(self, file_path: str, entry: Optional[Dict]):
+        touched = set()
+        old = self.files.pop(file_path, None)
+        if old is not None:
+            for index, record in enumerate(old['records']):
+                holders = self.holders[record.id]
+                holders.remove((file_path, index))
+                if not holders:
+                    del self.holders[record.id]
+                touched.add(record.id)
+        if entry is not None:
+            self.files[file_path] = entry
+            for index, record in enumerate(entry['records']):
+                insort(self.holders.setdefault(record.id, []), (file_path, index))
+                touched.add(record.id)
+        for room_id in touched:
+            self._update_room(room_id)
+
+    def _update_room(self, room_id: str):
+        holders = self.holders.get(room_id)
+        new = self.files[holders[0][0]]['records'][holders[0][1]] if holders else None
+        old = self.records.get(room_id)
+        if new == old:
+            return
+        if old is None or new is None or _targets(old) != _targets(new):
+            self._structure_base.setdefault(room_id, None if old is None else frozenset(_targets(old)))
+        if old is not None:
+            self._remove_contribution(old)
+        if new is not None:
+            self._add_contribution(new)
+        self._dirty_rooms.add(room_id)
+
+    def _add_contribution(self, record: RoomRecord):
+        self.records[record.id] = record
+        self.room_types[record.type] += 1
+        self.district_stats[record.district] += 1
+        for direction, _, _ in record.exits:
+            self.direction_stats[direction] += 1
+        targets = _targets(record)
+        for target in targets:
+            self.referrers.setdefault(target, set()).add(record.id)
+        self.room_connections[record.id] = len(targets)
+        self._connection_buckets.setdefault(len(targets), set()).add(record.id)
+
+    def _remove_contribution(self, record: RoomRecord):
+        del self.records[record.id]
+        _decrement(self.room_types, record.type)
+        _decrement(self.district_stats, record.district)
+        for direction, _, _ in record.exits:
+            _decrement(self.direction_stats, direction)
+        for target in _targets(record):
+            sources = self.referrers[target]
+            sources.discard(record.id)
+            if not sources:
+                del self.referrers[target]
+        connections = self.room_connections.pop(record.id)
+        bucket = self._connection_buckets[connections]
+        bucket.discard(record.id)
+        if not bucket:
+            del self._connection_buckets[connections]
+
+    def _update_issues(self, dirty: Set[str]):
+        """重新校验变化房间及指向它们的房间（其反向连接、目标存在性与坐标方向可能随之变化）"""
+        sources = set(dirty)
+        for room_id in dirty:
+            sources.update(self.referrers.get(room_id, ()))
+        for room_id in sources:
+            self.room_issues.pop(room_id, None)
+        for issue in room_issues(self.records, sources):
+            self.room_issues.setdefault(issue.room, []).append(issue)
+
+    def _first_room(self) -> str:
+        """世界顺序中的第一个房间"""
+        for file_path in sorted(self.files):
+            for index, record in enumerate(self.files[file_path]['records']):
+                if self.holders[record.id][0] == (file_path, index):
+                    return record.id
+        raise KeyError('世界中没有房间')
+
+    def _top_hub_rooms(self, count: int = 10) -> List[Tuple[str, int]]:
+        top = []
+        for connections in sorted(self._connection_buckets, reverse=True):
+            bucket = heapq.nsmallest(count - len(top), self._connection_buckets[connections], key=self.position)
+            top.extend((room_id, connections) for room_id in bucket)
+            if len(top) == count:
+                break
+        return top
+
+    def update(self, file_paths: List[str], main_room: Optional[str] = None) -> Tuple[Dict, Mapping]:
+        """刷新缓存并返回 (analysis, room_info)，格式与 analyze_connectivity 一致"""
+        self.refresh(file_paths)
+        return self.assemble(main_room)
+
+    def assemble(self, main_room: Optional[str] = None) -> Tuple[Dict, Mapping]:
+        """补算累积变化涉及的问题与分量，再汇总为全局分析结果
+
+        analysis['graph'] 为 None：增量模式不构建整个世界的房间图，需要时用 room_info.records 构建。
+        """
+        if self._structure_base:
+            # 变化的房间较多时逐条修补不如整体重算
+            if not self.components.weak_of or len(self._structure_base) > len(self.records) // 4:
+                self.components.rebuild(self.records, self.referrers)
+            else:
+                self.components.update(self.records, self.referrers, self._structure_base)
+            self._structure_base = {}
+        if self._dirty_rooms:
+            self._update_issues(self._dirty_rooms)
+            self._dirty_rooms = set()
+
+        position = self.position
+        issues = [issue for room_id in sorted(self.room_issues, key=position) for issue in self.room_issues[room_id]]
+        if len(self.records) != EXPECTED_ROOM_COUNT:
+            issues.append(Issue('room_count', 'error', None, None, None,
+                                {'actual': len(self.records), 'expected': EXPECTED_ROOM_COUNT}))
+
+        # 不与起点房间（默认世界顺序中的第一个房间）弱连通的房间视为孤立房间
+        connected_components = []
+        isolated_rooms = []
+        if self.records:
+            if main_room not in self.records:
+                main_room = self._first_room()
+            weak_members = self.components.weak_members
+            main_weak = self.components.weak_of[main_room]
+            others = sorted(
+                (sorted(members, key=position) for label, members in weak_members.items() if label != main_weak),
+                key=lambda members: position(members[0])
+            )
+            connected_components = [weak_members[main_weak]] + [set(members) for members in others]
+            isolated_rooms = sorted((room_id for members in others for room_id in members), key=position)
+
+        analysis = {
+            'total_rooms': len(self.records),
+            'graph': None,
+            'issues': issues,
+            'asymmetric_connections': [],
+            'missing_reverse_connections': missing_reverse_connections(issues),
+            'top_hub_rooms': self._top_hub_rooms(),
+            'isolated_rooms': isolated_rooms,
+            'connected_components': connected_components,
+            'strongly_connected_components': list(self.components.strong_members.values()),
+            'trap_components': self.components.trap_components(self.records, self.referrers, position),
+            'room_types': dict(self.room_types),
+            'district_stats': dict(self.district_stats),
+            'direction_stats': dict(self.direction_stats),
+            'room_connections': self.room_connections
+        }
+        return analysis, RoomInfoView(self.records)
+
+
+def _decrement(counter: Counter, key):
+    counter[key] -= 1
+    if not counter[key]:
+        del counter[key]
+
+
+def _neighbors(records: Mapping[str, RoomRecord], referrers: Mapping[str, Set[str]], room_id: str) -> Iterator[str]:
+    """房间的出口目标与指向它的房间（只含存在的房间），即弱连通意义下的邻居"""
+    for _, target, _ in records[room_id].exits:
+        if target in records:
+            yield target
+    yield from referrers.get(room_id, ())
+
+
+def _reaches(records: Mapping[str, RoomRecord], referrers: Mapping[str, Set[str]], source: str, goal: str) -> bool:
+    """source 能否沿出口到达 goal：从两端交替正向与反向搜索，任一侧走完即可判定"""
+    forward, backward = {source}, {goal}
+    forward_stack, backward_stack = [source], [goal]
+    if source == goal:
+        return True
+    while forward_stack and backward_stack:
+        room_id = forward_stack.pop()
+        for _, target, _ in records[room_id].exits:
+            if target in backward:
+                return True
+            if target in records and target not in forward:
+                forward.add(target)
+                forward_stack.append(target)
+        room_id = backward_stack.pop()
+        for referrer in referrers.get(room_id, ()):
+            if referrer in forward:
+                return True
+            if referrer not in backward:
+                backward.add(referrer)
+                backward_stack.append(referrer)
+    return False
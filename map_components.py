@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+房间图连通分量计算
+在 RoomGraph 上一次线性扫描完成全部房间的分量标注：
+弱连通分量把出口视为无向边（地图上的“孤岛”），
+强连通分量保留出口方向（玩家能否走进去再走出来）
+"""
+
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+
+from map_graph import RoomGraph
+
+
+def weak_components(graph: RoomGraph) -> Tuple[array, int]:
+    """标注弱连通分量，返回 (labels, count)
+
+    labels[node] 为真实房间所属分量编号，分量按最小房间序号依次编号。
+    指向不存在房间的出口不参与连通。
+    """
+    room_count = graph.room_count
+    offsets = graph.offsets
+    targets = graph.targets
+    in_offsets, in_sources = graph.reverse()
+
+    labels = array('i', [-1]) * room_count
+    count = 0
+    queue = []
+    for seed in range(room_count):
+        if labels[seed] != -1:
+            continue
+        labels[seed] = count
+        queue.append(seed)
+        while queue:
+            node = queue.pop()
+            for pos in range(offsets[node], offsets[node + 1]):
+                neighbor = targets[pos]
+                if neighbor < room_count and labels[neighbor] == -1:
+                    labels[neighbor] = count
+                    queue.append(neighbor)
+            for pos in range(in_offsets[node], in_offsets[node + 1]):
+                neighbor = in_sources[pos]
+                if labels[neighbor] == -1:
+                    labels[neighbor] = count
+                    queue.append(neighbor)
+        count += 1
+    return labels, count
+
+
+def strong_components(graph: RoomGraph) -> Tuple[array, int]:
+    """迭代版 Tarjan 算法标注强连通分量，返回 (labels, count)
+
+    分量编号为逆拓扑序：编号小的分量不会有出口指向编号大的分量。
+    """
+    room_count = graph.room_count
+    offsets = graph.offsets
+    targets = graph.targets
+
+    index_of = array('i', [-1]) * room_count
+    lowlink = array('i', [0]) * room_count
+    labels = array('i', [-1]) * room_count
+    on_stack = bytearray(room_count)
+    scc_stack = []
+    next_index = 0
+    count = 0
+
+    for root in range(room_count):
+        if index_of[root] != -1:
+            continue
+        index_of[root] = lowlink[root] = next_index
+        next_index += 1
+        scc_stack.append(root)
+        on_stack[root] = 1
+        # 工作栈保存 (节点, 下一条待处理出边的位置)
+        work = [(root, offsets[root])]
+
+        while work:
+            node, pos = work[-1]
+            end = offsets[node + 1]
+            descended = False
+            while pos < end:
+                neighbor = targets[pos]
+                pos += 1
+                if neighbor >= room_count:
+                    continue
+                if index_of[neighbor] == -1:
+                    work[-1] = (node, pos)
+                    index_of[neighbor] = lowlink[neighbor] = next_index
+                    next_index += 1
+                    scc_stack.append(neighbor)
+                    on_stack[neighbor] = 1
+                    work.append((neighbor, offsets[neighbor]))
+                    descended = True
+                    break
+                if on_stack[neighbor] and index_of[neighbor] < lowlink[node]:
+                    lowlink[node] = index_of[neighbor]
+            if descended:
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if lowlink[node] < lowlink[parent]:
+                    lowlink[parent] = lowlink[node]
+
+            if lowlink[node] == index_of[node]:
+                while True:
+                    member = scc_stack.pop()
+                    on_stack[member] = 0
+                    labels[member] = count
+                    if member == node:
+                        break
+                count += 1
+
+    return labels, count
+
+
+def group_by_label(labels: array, count: int) -> List[List[int]]:
+    """把分量标注转换为每个分量的节点列表"""
+    groups = [[] for _ in range(count)]
+    for node, label in enumerate(labels):
+        groups[label].append(node)
+    return groups
+
+
+def find_trap_components(graph: RoomGraph, labels: array, count: int,
+                         main_node: Optional[int] = None) -> List[Dict]:
+    """找出无法回到主强连通分量的“陷阱”区域
+
+    主分量默认取房间数最多的强连通分量，也可以通过 main_node 指定其中的一个房间。
+    利用 Tarjan 编号的逆拓扑序在缩点图上做一次动态规划，整体为 O(V+E)。
+    无法回到主分量的强连通分量在缩点图中只会指向同类分量，这些分量之间按缩点边连成的
+    每一片即一个陷阱区域（例如单向死胡同 A→B→C 是一个区域而不是三个）。
+    返回按区域中最小房间序号排序的 {'labels', 'rooms', 'entered_from_main'} 列表，
+    entered_from_main 表示玩家能从主分量走进该区域（真正会被困住）。
+    """
+    room_count = graph.room_count
+    if not room_count:
+        return []
+
+    offsets = graph.offsets
+    targets = graph.targets
+    groups = group_by_label(labels, count)
+
+    if main_node is None:
+        # 房间数相同时取包含序号最小房间的分量，与 Tarjan 的遍历顺序无关
+        main_label = max(range(count), key=lambda label: (len(groups[label]), -groups[label][0]))
+    else:
+        main_label = labels[main_node]
+
+    # 出边只会指向编号不大于自身的分量，按编号升序即可完成传播
+    reaches_main = bytearray(count)
+    reaches_main[main_label] = 1
+    for label in range(count):
+        if reaches_main[label]:
+            continue
+        for node in groups[label]:
+            for pos in range(offsets[node], offsets[node + 1]):
+                target = targets[pos]
+                if target < room_count and reaches_main[labels[target]]:
+                    reaches_main[label] = 1
+                    break
+            if reaches_main[label]:
+                break
+
+    # 从主分量出发能进入的分量
+    entered = bytearray(count)
+    entered[main_label] = 1
+    stack = [main_label]
+    while stack:
+        label = stack.pop()
+        for node in groups[label]:
+            for pos in range(offsets[node], offsets[node + 1]):
+                target = targets[pos]
+                if target < room_count and not entered[labels[target]]:
+                    entered[labels[target]] = 1
+                    stack.append(labels[target])
+
+    # 陷阱分量之间的缩点边（视为无向）把它们合并为区域
+    neighbors: Dict[int, List[int]] = {}
+    for label in range(count):
+        if reaches_main[label]:
+            continue
+        for node in groups[label]:
+            for pos in range(offsets[node], offsets[node + 1]):
+                target = targets[pos]
+                if target < room_count and labels[target] != label:
+                    neighbors.setdefault(label, []).append(labels[target])
+                    neighbors.setdefault(labels[target], []).append(label)
+
+    regions = []
+    region_of = array('i', [-1]) * count
+    for seed in range(count):
+        if reaches_main[seed] or region_of[seed] != -1:
+            continue
+        region_of[seed] = len(regions)
+        members = [seed]
+        stack = [seed]
+        while stack:
+            label = stack.pop()
+            for neighbor in neighbors.get(label, ()):
+                if region_of[neighbor] == -1:
+                    region_of[neighbor] = len(regions)
+                    members.append(neighbor)
+                    stack.append(neighbor)
+        members.sort()
+        regions.append({
+            'labels': members,
+            'rooms': sorted(node for label in members for node in groups[label]),
+            'entered_from_main': any(entered[label] for label in members)
+        })
+    regions.sort(key=lambda region: region['rooms'][0])
+    return regions
+
+
+def describe_strong_components(graph: RoomGraph) -> Tuple[List[Set[str]], List[Dict]]:
+    """计算强连通分量与陷阱分量，并映射回房间 ID
+
+    返回 (strongly_connected_components, trap_components)，格式与连通性分析结果一致。
+    """
+    ids = graph.ids
+    labels, count = strong_components(graph)
+    components = [{ids[node] for node in members} for members in group_by_label(labels, count)]
+    traps = [
+        {
+            'rooms': [ids[node] for node in trap['rooms']],
+            'entered_from_main': trap['entered_from_main']
+        }
+        for trap in find_trap_components(graph, labels, count)
+    ]
+    return components, traps
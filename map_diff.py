@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+两个地图版本的结构化差异
+新版本通过增量分析缓存（map_analysis_cache，按同一文件内容哈希）加载，配合 --cache 持久化后
+只重新解析内容有变化的文件；旧版本只解析与新版本内容不同的文件，其余房间直接取自缓存。
+指向变化房间的出口通过缓存中的反向出口索引查找，除逐文件计算哈希外，代价与变化的文件及其
+相邻房间成正比。每个房间按内容与位置分别计算指纹，报告新增、删除、移动、改名与内容变化的房间，
+出口的增删改，以及校验规则在变化房间及其相邻房间上新出现和已解决的问题。
+
+问题记录与 connectivity_analysis_result.json 的 issues 格式一致；分量、孤立房间等全局指标
+需要对整个世界运行连通性分析，不在差异范围内。
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+from functools import lru_cache
+from typing import Dict, Iterator, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from map_analysis_cache import IncrementalAnalyzer, Position, file_digest, room_issues
+from map_jsonl import JsonlWriter
+from map_loader import RoomRecord, discover_map_files, iter_file_rooms
+from map_rules import Issue
+
+
+class RoomFingerprint(NamedTuple):
+    """房间指纹：body 覆盖名称、类型、描述与出口，placement 覆盖区域、位置、坐标与所在文件"""
+    body: str
+    placement: str
+
+
+def _hash(value) -> str:
+    payload = json.dumps(value, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+@lru_cache(maxsize=4096)
+def _relpath(path: str, root: str) -> str:
+    return os.path.relpath(path, root).replace(os.sep, '/')
+
+
+def _placement(record: RoomRecord, root: str) -> Dict:
+    return {
+        'district': record.district,
+        'location': record.location,
+        'coordinates': record.coordinates,
+        'file': _relpath(record.source, root)
+    }
+
+
+def fingerprint(record: RoomRecord, root: str) -> RoomFingerprint:
+    return RoomFingerprint(
+        _hash([record.name, record.type, record.description, sorted(record.exits)]),
+        _hash(_placement(record, root))
+    )
+
+
+class _OldWorld(Mapping):
+    """旧版本的房间表：只有 overlay 中的房间与新版本不同（值为 None 表示旧版本中不存在）"""
+
+    def __init__(self, base: Mapping[str, RoomRecord], overlay: Dict[str, Optional[RoomRecord]]):
+        self._base = base
+        self._overlay = overlay
+        self._size = len(base) + sum(
+            (record is not None) - (room_id in base) for room_id, record in overlay.items()
+        )
+
+    def __getitem__(self, room_id: str) -> RoomRecord:
+        if room_id in self._overlay:
+            record = self._overlay[room_id]
+            if record is None:
+                raise KeyError(room_id)
+            return record
+        return self._base[room_id]
+
+    def __iter__(self) -> Iterator[str]:
+        for room_id in self._base:
+            if room_id not in self._overlay:
+                yield room_id
+        for room_id, record in self._overlay.items():
+            if record is not None:
+                yield room_id
+
+    def __len__(self) -> int:
+        return self._size
+
+
+def _old_records(old_root: str, new_root: str, new_paths: Dict[str, str], old_files: List[str],
+                 new_files: List[str], analyzer: IncrementalAnalyzer, unchanged: Set[str],
+                 errors: List[Tuple[str, str]]) -> Tuple[Dict[str, Optional[RoomRecord]], Set[str]]:
+    """旧版本中与新版本可能不同的房间，返回 (房间 ID -> 旧版本生效的记录, 生效记录来自旧版本目录的房间)
+
+    这些房间出现在 old_files（旧版本独有内容的文件）或 new_files（新版本独有内容的文件）中，
+    其余房间在两个版本中都只出现在未变化的文件里，记录相同。与 load_world 一样按
+    (文件路径, 文件内顺序) 保留第一次出现的版本，同一 ID 在未变化文件中的出现位置取自缓存的
+    holders；出错的文件整体不贡献房间。new_paths 为新版本中相对路径到缓存所用路径的映射。
+    """
+    parsed: Dict[str, Tuple[Position, RoomRecord]] = {}
+    for relpath in old_files:
+        try:
+            records = list(iter_file_rooms(os.path.join(old_root, relpath)))
+        except Exception as e:
+            errors.append((os.path.join(old_root, relpath), str(e)))
+            continue
+        # 文件在两个版本中按相同的相对路径排序，用新版本下的路径作为位置，便于与缓存比较
+        position_path = new_paths.get(relpath) or os.path.join(new_root, relpath)
+        for index, record in enumerate(records):
+            position = (position_path, index)
+            if record.id not in parsed or position < parsed[record.id][0]:
+                parsed[record.id] = (position, record)
+
+    touched = set(parsed)
+    for relpath in new_files:
+        entry = analyzer.files.get(new_paths[relpath])
+        if entry is not None:
+            touched.update(record.id for record in entry['records'])
+
+    unchanged_paths = {new_paths[relpath] for relpath in unchanged}
+    overlay = {}
+    from_old_root = set()
+    for room_id in touched:
+        best = parsed.get(room_id)
+        for file_path, index in analyzer.holders.get(room_id, ()):
+            if file_path in unchanged_paths:
+                if best is None or (file_path, index) < best[0]:
+                    best = ((file_path, index), analyzer.files[file_path]['records'][index])
+                break
+        overlay[room_id] = None if best is None else best[1]
+        if best is not None and best is parsed.get(room_id):
+            from_old_root.add(room_id)
+    return overlay, from_old_root
+
+
+def _exit_changes(room_id: str, old: RoomRecord, new: RoomRecord) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+    """同一房间新旧出口的差异，返回 (新增, 删除, 变化)；同一方向的删除与新增合并为变化"""
+    old_exits = set(old.exits)
+    new_exits = set(new.exits)
+    removed = [exit_info for exit_info in old.exits if exit_info not in new_exits]
+    added = [exit_info for exit_info in new.exits if exit_info not in old_exits]
+
+    changed = []
+    by_direction = {}
+    for exit_info in removed:
+        by_direction.setdefault(exit_info[0], []).append(exit_info)
+    unmatched_added = []
+    for exit_info in added:
+        candidates = by_direction.get(exit_info[0])
+        if candidates:
+            before = candidates.pop(0)
+            changed.append({'room': room_id, 'direction': exit_info[0],
+                            'old_target': before[1], 'new_target': exit_info[1],
+                            'old_description': before[2], 'new_description': exit_info[2]})
+        else:
+            unmatched_added.append(exit_info)
+    unmatched_removed = [exit_info for candidates in by_direction.values() for exit_info in candidates]
+
+    def as_dicts(exits):
+        return [{'room': room_id, 'direction': direction, 'target': target, 'description': description}
+                for direction, target, description in exits]
+    return as_dicts(unmatched_added), as_dicts(unmatched_removed), changed
+
+
+def diff_versions(old_root: str, new_root: str, analyzer: Optional[IncrementalAnalyzer] = None) -> Dict:
+    """比较两个地图根目录，返回差异结果
+
+    analyzer 为新版本的增量分析缓存（None 时新建只在内存中的缓存），调用后其中为新版本的房间。
+    """
+    if analyzer is None:
+        analyzer = IncrementalAnalyzer()
+    new_paths = {_relpath(path, new_root): path for path in discover_map_files(new_root)}
+    analyzer.refresh(list(new_paths.values()))
+    errors = list(analyzer.errors)
+    new_digests = {relpath: analyzer.files[path]['digest']
+                   for relpath, path in new_paths.items() if path in analyzer.files}
+    old_digests = {_relpath(path, old_root): file_digest(path) for path in discover_map_files(old_root)}
+
+    unchanged = sorted(path for path, digest in old_digests.items() if new_digests.get(path) == digest)
+    changed = sorted(path for path in old_digests.keys() & new_paths.keys() if path not in new_digests
+                     or new_digests[path] != old_digests[path])
+    added_files = sorted(new_paths.keys() - old_digests.keys())
+    removed_files = sorted(old_digests.keys() - new_paths.keys())
+
+    new_world = analyzer.records
+    old_records, from_old_root = _old_records(old_root, new_root, new_paths, changed + removed_files,
+                                              changed + added_files, analyzer, set(unchanged), errors)
+    old_world = _OldWorld(new_world, old_records)
+
+    def old_root_of(room_id: str) -> str:
+        # 旧版本中来自未变化文件的房间取自缓存，文件路径位于新版本目录下
+        return old_root if room_id in from_old_root else new_root
+
+    rooms = {'added': [], 'removed': [], 'moved': [], 'renamed': [], 'changed': []}
+    exits = {'added': [], 'removed': [], 'changed': []}
+    affected = set()
+    removed_ids, added_ids = [], []
+
+    for room_id in sorted(old_records):
+        before, after = old_records[room_id], new_world.get(room_id)
+        if before is None or after is None:
+            if before is not None:
+                removed_ids.append(room_id)
+            elif after is not None:
+                added_ids.append(room_id)
+            else:
+                continue
+            affected.add(room_id)
+            continue
+        old_print, new_print = fingerprint(before, old_root_of(room_id)), fingerprint(after, new_root)
+        if old_print == new_print:
+            continue
+        affected.add(room_id)
+        if old_print.placement != new_print.placement:
+            rooms['moved'].append({'room': room_id, 'from': _placement(before, old_root_of(room_id)),
+                                   'to': _placement(after, new_root)})
+        if old_print.body != new_print.body:
+            fields = [field for field in ('name', 'type', 'description')
+                      if getattr(before, field) != getattr(after, field)]
+            added, removed, modified = _exit_changes(room_id, before, after)
+            if added or removed or modified:
+                fields.append('exits')
+            exits['added'].extend(added)
+            exits['removed'].extend(removed)
+            exits['changed'].extend(modified)
+            rooms['changed'].append({'room': room_id, 'fields': fields})
+
+    # 内容完全相同、只是 ID 变化的房间视为改名
+    removed_by_body: Dict[str, List[str]] = {}
+    for room_id in removed_ids:
+        removed_by_body.setdefault(fingerprint(old_records[room_id], old_root_of(room_id)).body, []).append(room_id)
+    renamed_to = {}
+    for room_id in added_ids:
+        candidates = removed_by_body.get(fingerprint(new_world[room_id], new_root).body)
+        if candidates:
+            renamed_to[candidates.pop(0)] = room_id
+    rooms['renamed'] = [{'from': old_id, 'to': new_id} for old_id, new_id in sorted(renamed_to.items())]
+    renamed_new = set(renamed_to.values())
+    rooms['removed'] = [room_id for room_id in removed_ids if room_id not in renamed_to]
+    rooms['added'] = [room_id for room_id in added_ids if room_id not in renamed_new]
+
+    # 受影响的问题：变化房间自身的出口，以及其他房间指向变化房间的出口。
+    # 新版本的来源直接查反向出口索引；旧版本中不在 old_records 里的房间与新版本相同，
+    # 只需补上旧记录指向变化房间的那些房间
+    sources = set(affected)
+    for room_id in affected:
+        sources.update(analyzer.referrers.get(room_id, ()))
+    for room_id, record in old_records.items():
+        if record is not None and any(target in affected for _, target, _ in record.exits):
+            sources.add(room_id)
+    old_issues = _issue_index(room_issues(old_world, sources))
+    new_issues = _issue_index(room_issues(new_world, sources))
+
+    return {
+        'old': old_root,
+        'new': new_root,
+        'files': {'changed': changed, 'added': added_files, 'removed': removed_files, 'unchanged': len(unchanged)},
+        'total_rooms': {'old': len(old_world), 'new': len(new_world)},
+        'rooms': rooms,
+        'exits': exits,
+        'issues': {
+            'new': [new_issues[key]._asdict() for key in sorted(new_issues.keys() - old_issues.keys(), key=str)],
+            'resolved': [old_issues[key]._asdict() for key in sorted(old_issues.keys() - new_issues.keys(), key=str)]
+        },
+        'errors': errors
+    }
+
+
+def _issue_index(issues: List[Issue]) -> Dict[Tuple, Issue]:
+    return {(issue.rule, issue.room, issue.target, issue.direction): issue for issue in issues}
+
+
+def extract_revision(revision: str, maps_root: str) -> Tuple[str, str]:
+    """用 git archive 把 maps_root 在 revision 中的版本解压到临时目录，返回 (临时目录, 旧版本根目录)"""
+    maps_root = os.path.abspath(maps_root)
+    # 两次调用都以字节形式捕获输出，出错时由 main 统一解码 stderr
+    top = os.fsdecode(subprocess.run(['git', 'rev-parse', '--show-toplevel'], cwd=maps_root, capture_output=True,
+                                     check=True).stdout.strip())
+    relpath = os.path.relpath(maps_root, top).replace(os.sep, '/')
+    archive = subprocess.run(['git', 'archive', '--format=tar', revision, '--', relpath], cwd=top,
+                             capture_output=True, check=True).stdout
+    temp_dir = tempfile.mkdtemp(prefix='map_diff_')
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(temp_dir)
+    return temp_dir, os.path.join(temp_dir, relpath)
+
+
+def _print_section(title: str, lines: List[str], limit: Optional[int]):
+    if not lines:
+        return
+    print(f"\n{title} ({len(lines)}):")
+    for line in lines[:limit]:
+        print(f"  {line}")
+    if limit is not None and len(lines) > limit:
+        print(f"  ... 还有 {len(lines) - limit} 个")
+
+
+def _issue_line(issue: Dict) -> str:
+    return f"[{issue['severity']}] {issue['rule']}: {issue['room']} --{issue['direction']}--> {issue['target']}"
+
+
+def _placement_text(placement: Dict) -> str:
+    coordinates = placement['coordinates'] or {}
+    point = ','.join(str(coordinates.get(axis, '?')) for axis in ('x', 'y', 'z'))
+    return f"{placement['district']}/{placement['location']} ({point}) {placement['file']}"
+
+
+def print_diff_report(result: Dict, limit: Optional[int] = 10):
+    """打印差异报告"""
+    files = result['files']
+    print(f"文件: {len(files['changed'])} 个变化，{len(files['added'])} 个新增，"
+          f"{len(files['removed'])} 个删除，{files['unchanged']} 个未变化")
+    print(f"房间数: {result['total_rooms']['old']} -> {result['total_rooms']['new']}")
+    for path, error in result['errors']:
+        print(f"[ERROR] 无法加载文件 {path}: {error}")
+
+    rooms, exits, issues = result['rooms'], result['exits'], result['issues']
+    _print_section("新增房间", rooms['added'], limit)
+    _print_section("删除房间", rooms['removed'], limit)
+    _print_section("改名房间", [f"{item['from']} -> {item['to']}" for item in rooms['renamed']], limit)
+    _print_section("移动房间", [f"{item['room']}: {_placement_text(item['from'])} -> {_placement_text(item['to'])}"
+                              for item in rooms['moved']], limit)
+    _print_section("内容变化的房间", [f"{item['room']}: {', '.join(item['fields'])}" for item in rooms['changed']], limit)
+    _print_section("新增出口", [f"{e['room']} --{e['direction']}--> {e['target']}" for e in exits['added']], limit)
+    _print_section("删除出口", [f"{e['room']} --{e['direction']}--> {e['target']}" for e in exits['removed']], limit)
+    _print_section("变化出口", [
+        f"{e['room']} --{e['direction']}--> {e['old_target']} => {e['new_target']}"
+        + (f"（描述: {e['old_description']} => {e['new_description']}）"
+           if e['old_description'] != e['new_description'] else '')
+        for e in exits['changed']], limit)
+    _print_section("[WARNING] 新出现的问题", [_issue_line(issue) for issue in issues['new']], limit)
+    _print_section("[OK] 已解决的问题", [_issue_line(issue) for issue in issues['resolved']], limit)
+    if not any(rooms.values()) and not any(exits.values()):
+        print("\n[OK] 两个版本的房间与出口没有差异")
+
+
+def write_jsonl(result: Dict, writer: JsonlWriter):
+    """把差异逐条写成 JSONL：room / exit / issue 记录带 change 字段，最后是 summary"""
+    for change in ('added', 'removed'):
+        for room_id in result['rooms'][change]:
+            writer.write('room', change=change, room=room_id)
+    for item in result['rooms']['renamed']:
+        writer.write('room', change='renamed', room=item['to'], previous=item['from'])
+    for item in result['rooms']['moved']:
+        writer.write('room', change='moved', **item)
+    for item in result['rooms']['changed']:
+        writer.write('room', change='changed', **item)
+    for change, items in result['exits'].items():
+        for item in items:
+            writer.write('exit', change=change, **item)
+    for change, items in result['issues'].items():
+        for item in items:
+            writer.write('issue', change=change, **item)
+    writer.write('summary', files=result['files'], total_rooms=result['total_rooms'],
+                 counts={
+                     'rooms': {key: len(value) for key, value in result['rooms'].items()},
+                     'exits': {key: len(value) for key, value in result['exits'].items()},
+                     'issues': {key: len(value) for key, value in result['issues'].items()}
+                 })
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='比较两个版本的地图，报告房间、出口与校验问题的变化')
+    parser.add_argument('roots', nargs='+', metavar='ROOT',
+                        help='旧版本与新版本的地图根目录；使用 --base 时只需给出新版本（工作区中的）目录')
+    parser.add_argument('--base', metavar='REV', help='从 git 提交 REV 中取出旧版本，如 origin/main')
+    parser.add_argument('--cache',
+                        help='新版本的增量分析缓存文件（可与 analyze_map_connectivity.py --cache 共用），'
+                             '只重新解析内容有变化的文件')
+    parser.add_argument('--output', default='map_diff_result.json', help='差异结果 JSON（默认 map_diff_result.json）')
+    parser.add_argument('--jsonl', metavar='PATH', help='把差异逐条写成 JSONL（- 表示标准输出），不打印报告')
+    parser.add_argument('--limit', type=int, default=10, help='每类差异显示的条目数，0 表示完整输出（默认 10）')
+    args = parser.parse_args(argv)
+    if len(args.roots) != (1 if args.base else 2):
+        parser.error('需要 OLD NEW 两个目录，或者 --base REV 加一个目录')
+    return args
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    temp_dir = None
+    try:
+        if args.base:
+            temp_dir, old_root = extract_revision(args.base, args.roots[0])
+            new_root = args.roots[0]
+        else:
+            old_root, new_root = args.roots
+        analyzer = IncrementalAnalyzer(args.cache)
+        result = diff_versions(old_root, new_root, analyzer)
+    except subprocess.CalledProcessError as e:
+        print(f"[ERROR] 无法从 git 取出 {args.base}: {(e.stderr or b'').decode('utf-8', 'replace').strip()}")
+        return 1
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    if args.base:
+        result['old'] = args.base
+    try:
+        if analyzer.reparsed or analyzer.dropped:
+            analyzer.save()
+    except Exception as e:
+        print(f"保存分析缓存时出错: {e}", file=sys.stderr if args.jsonl == '-' else sys.stdout)
+
+    if args.jsonl:
+        with JsonlWriter(args.jsonl) as writer:
+            write_jsonl(result, writer)
+        return 0
+
+    print_diff_report(result, args.limit or None)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n差异结果已保存到: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    # 设置标准输出编码为UTF-8
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.exit(main())
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+房间图导出到 PostgreSQL 与 Redis
+校验通过后把房间、出口、区域与预计算指标批量写入数据库，游戏服务器启动时可直接从 Redis 预热世界缓存。
+每个房间带内容哈希，重复导出只写入新增、变化和删除的房间，没有变化时不产生任何写入。
+
+PostgreSQL（单个事务，COPY 批量写入）:
+    map_districts (name, room_count)
+    map_rooms     房间字段、坐标、out_degree/in_degree/connections/component/is_trap 与 content_hash，
+                  component 为所在弱连通分量中最小的房间 ID，不受其他分量增删的影响
+    map_exits     (room_id, ordinal, direction, target_room_id, description)
+
+Redis（WATCH 后以 MULTI/EXEC 管道提交，前缀默认 map:）:
+    map:rooms             全部房间 ID 集合
+    map:room:<id>         房间字段与指标哈希，hash 字段为内容哈希
+    map:exits:<id>        邻接哈希 方向 -> 目标房间 ID
+    map:district:<name>   区域内房间 ID 集合
+    map:districts         区域名称 -> 房间数
+    map:meta              房间数与导出时间
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from check_coordinates import room_point
+from map_components import describe_strong_components, weak_components
+from map_graph import RoomGraph
+from map_loader import RoomRecord, discover_map_files, load_world
+from map_rules import ExitStatistics, Issue, RuleEngine, default_rules
+
+# 出现这些问题时导出的数据本身不完整（出口指向不存在的房间、邻接哈希中方向冲突），默认拒绝导出
+BLOCKING_RULES = ('missing_target', 'duplicate_direction')
+
+
+class ExportRoom(NamedTuple):
+    """导出的一行房间数据，content_hash 覆盖除自身外的全部字段（含指标与出口）"""
+    id: str
+    name: str
+    type: str
+    district: str
+    location: str
+    x: Optional[float]
+    y: Optional[float]
+    z: Optional[float]
+    description: str
+    source: str
+    out_degree: int
+    in_degree: int
+    connections: int
+    component: str
+    is_trap: bool
+    exits: Tuple[Tuple[str, str, str], ...]
+    content_hash: str
+
+
+class ExportDiff(NamedTuple):
+    """与目标库已有数据比较的结果（房间 ID 列表）"""
+    added: List[str]
+    changed: List[str]
+    removed: List[str]
+
+    @property
+    def unchanged(self) -> bool:
+        return not (self.added or self.changed or self.removed)
+
+
+def _content_hash(fields: Tuple) -> str:
+    payload = json.dumps(fields, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def build_export(records: Dict[str, RoomRecord],
+                 maps_root: Optional[str] = None) -> Tuple[List[ExportRoom], Dict[str, int], List[Issue]]:
+    """校验房间并计算指标，返回 (导出房间行, 区域房间数, 校验问题)
+
+    maps_root 不为空时 source 保存为相对该目录的路径，换一台机器导出不会让所有房间都被视为变化。
+    """
+    graph = RoomGraph.from_records(records.values())
+    statistics = ExitStatistics()
+    engine = RuleEngine([*default_rules(), statistics])
+    issues = engine.run(graph, exits_of=lambda room_id: records[room_id].exits,
+                        points=[room_point(record) for record in records.values()])
+
+    # 分量以其中最小的房间 ID 标识：按序号编号时，任何分量的增删都会让其后所有房间的编号与内容哈希变化
+    labels, count = weak_components(graph)
+    component_ids: List[Optional[str]] = [None] * count
+    for node, record in enumerate(records.values()):
+        label = labels[node]
+        if component_ids[label] is None or record.id < component_ids[label]:
+            component_ids[label] = record.id
+    _, traps = describe_strong_components(graph)
+    trap_rooms = {room_id for trap in traps if trap['entered_from_main'] for room_id in trap['rooms']}
+
+    rooms = []
+    districts: Dict[str, int] = {}
+    for node, record in enumerate(records.values()):
+        point = room_point(record) or (None, None, None)
+        source = record.source
+        if maps_root:
+            source = os.path.relpath(source, maps_root).replace(os.sep, '/')
+        fields = (
+            record.id, record.name, record.type, record.district, record.location,
+            point[0], point[1], point[2], record.description, source,
+            graph.out_degree(node), graph.in_degree(node), statistics.room_connections[record.id],
+            component_ids[labels[node]], record.id in trap_rooms, record.exits
+        )
+        rooms.append(ExportRoom(*fields, _content_hash(fields)))
+        districts[record.district] = districts.get(record.district, 0) + 1
+    return rooms, districts, issues
+
+
+def diff_rooms(rooms: Iterable[ExportRoom], stored: Dict[str, str]) -> ExportDiff:
+    """比较当前房间与目标库中已有的 {room_id: content_hash}"""
+    added, changed = [], []
+    current = set()
+    for room in rooms:
+        current.add(room.id)
+        known = stored.get(room.id)
+        if known is None:
+            added.append(room.id)
+        elif known != room.content_hash:
+            changed.append(room.id)
+    removed = sorted(room_id for room_id in stored if room_id not in current)
+    return ExportDiff(added, changed, removed)
+
+
+# ---------------------------------------------------------------- PostgreSQL
+
+POSTGRES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS map_districts (
+    name text PRIMARY KEY,
+    room_count integer NOT NULL
+);
+CREATE TABLE IF NOT EXISTS map_rooms (
+    id text PRIMARY KEY,
+    name text NOT NULL,
+    type text NOT NULL,
+    district text NOT NULL,
+    location text NOT NULL,
+    x double precision,
+    y double precision,
+    z double precision,
+    description text NOT NULL,
+    source text NOT NULL,
+    out_degree integer NOT NULL,
+    in_degree integer NOT NULL,
+    connections integer NOT NULL,
+    component text NOT NULL,
+    is_trap boolean NOT NULL,
+    content_hash text NOT NULL
+);
+DO $$ BEGIN
+    -- 早期版本的 component 为分量序号
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_name = 'map_rooms' AND column_name = 'component' AND data_type = 'integer') THEN
+        ALTER TABLE map_rooms ALTER COLUMN component TYPE text;
+    END IF;
+END $$;
+CREATE INDEX IF NOT EXISTS map_rooms_district_idx ON map_rooms (district);
+CREATE TABLE IF NOT EXISTS map_exits (
+    room_id text NOT NULL REFERENCES map_rooms (id) ON DELETE CASCADE,
+    ordinal integer NOT NULL,
+    direction text NOT NULL,
+    target_room_id text NOT NULL,
+    description text NOT NULL,
+    PRIMARY KEY (room_id, ordinal)
+);
+CREATE INDEX IF NOT EXISTS map_exits_target_idx ON map_exits (target_room_id);
+"""
+
+ROOM_COLUMNS = ('id', 'name', 'type', 'district', 'location', 'x', 'y', 'z', 'description', 'source',
+                'out_degree', 'in_degree', 'connections', 'component', 'is_trap', 'content_hash')
+
+
+def _csv_buffer(rows: Iterable[Tuple]) -> io.StringIO:
+    """COPY ... FORMAT csv 的输入：字符串加引号，None 写成不加引号的空值（即 NULL）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC, lineterminator='\n')
+    writer.writerows(rows)
+    buffer.seek(0)
+    return buffer
+
+
+def _copy(cursor, table: str, columns: Iterable[str], rows: List[Tuple]):
+    if rows:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", _csv_buffer(rows))
+
+
+def export_postgres(connection, rooms: List[ExportRoom], districts: Dict[str, int]) -> ExportDiff:
+    """在一个事务中把变化的房间写入 PostgreSQL（psycopg2 连接），返回差异
+
+    变化和删除的房间先整行删除（出口随外键级联删除），新增和变化的房间再用 COPY 写入，
+    任何一步失败都会整体回滚。读取已有哈希前先锁表，并发的导出进程依次执行，不会基于过期的
+    读取结果写入；游戏服务器的读取不受影响。
+    """
+    by_id = {room.id: room for room in rooms}
+    with connection:
+        with connection.cursor() as cursor:
+            cursor.execute(POSTGRES_SCHEMA)
+            cursor.execute("LOCK TABLE map_rooms, map_districts IN SHARE ROW EXCLUSIVE MODE")
+            cursor.execute("SELECT id, content_hash FROM map_rooms")
+            diff = diff_rooms(rooms, dict(cursor.fetchall()))
+
+            stale = diff.changed + diff.removed
+            if stale:
+                cursor.execute("DELETE FROM map_rooms WHERE id = ANY(%s)", (stale,))
+            written = [by_id[room_id] for room_id in diff.added + diff.changed]
+            _copy(cursor, 'map_rooms', ROOM_COLUMNS,
+                  [tuple(getattr(room, column) for column in ROOM_COLUMNS) for room in written])
+            _copy(cursor, 'map_exits', ('room_id', 'ordinal', 'direction', 'target_room_id', 'description'),
+                  [(room.id, ordinal, direction, target, description)
+                   for room in written for ordinal, (direction, target, description) in enumerate(room.exits)])
+
+            cursor.execute("SELECT name, room_count FROM map_districts")
+            if dict(cursor.fetchall()) != districts:
+                cursor.execute("DELETE FROM map_districts")
+                _copy(cursor, 'map_districts', ('name', 'room_count'), sorted(districts.items()))
+    return diff
+
+
+def connect_postgres(dsn: str):
+    """按需导入 psycopg2 并连接"""
+    try:
+        import psycopg2
+    except ImportError:
+        raise RuntimeError("导出到 PostgreSQL 需要 psycopg2（pip install psycopg2-binary）")
+    return psycopg2.connect(dsn)
+
+
+def default_postgres_dsn() -> str:
+    """由服务器 .env 使用的 DB_* 环境变量组成连接串，缺省值与 docker-compose.yml 一致"""
+    parts = [
+        f"host={os.environ.get('DB_HOST', 'localhost')}",
+        f"port={os.environ.get('DB_PORT', '5432')}",
+        f"user={os.environ.get('DB_USERNAME', 'mudgame')}",
+        f"dbname={os.environ.get('DB_DATABASE', 'mudgame')}"
+    ]
+    if os.environ.get('DB_PASSWORD'):
+        parts.append(f"password={os.environ['DB_PASSWORD']}")
+    return ' '.join(parts)
+
+
+# ---------------------------------------------------------------- Redis
+
+def _text(value) -> Optional[str]:
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def _room_fields(room: ExportRoom) -> Dict[str, object]:
+    fields = {
+        'name': room.name, 'type': room.type, 'district': room.district, 'location': room.location,
+        'description': room.description, 'source': room.source,
+        'out_degree': room.out_degree, 'in_degree': room.in_degree, 'connections': room.connections,
+        'component': room.component, 'is_trap': int(room.is_trap), 'hash': room.content_hash
+    }
+    for axis in ('x', 'y', 'z'):
+        value = getattr(room, axis)
+        if value is not None:
+            fields[axis] = value
+    return fields
+
+
+def export_redis(client, rooms: List[ExportRoom], districts: Dict[str, int], prefix: str = 'map:') -> ExportDiff:
+    """把变化的房间写入 Redis（redis-py 客户端），返回差异
+
+    先 WATCH 房间集合与 meta 键（每次有变化的导出都会改写 meta），再用一个非事务管道批量读取
+    已有房间的内容哈希与所属区域，最后把全部写入放进 MULTI/EXEC 一次提交。读取之后若有其他
+    导出进程提交，EXEC 失败并由 client.transaction 重新读取、比较，服务器读到的永远是完整的一版地图。
+    """
+    rooms_key = f"{prefix}rooms"
+    by_id = {room.id: room for room in rooms}
+
+    def write(pipe) -> ExportDiff:
+        stored_ids = sorted(_text(room_id) for room_id in client.smembers(rooms_key))
+        reader = client.pipeline(transaction=False)
+        for room_id in stored_ids:
+            reader.hmget(f"{prefix}room:{room_id}", 'hash', 'district')
+        stored, old_district = {}, {}
+        for room_id, (content_hash, district) in zip(stored_ids, reader.execute()):
+            stored[room_id] = _text(content_hash) or ''
+            old_district[room_id] = _text(district)
+
+        diff = diff_rooms(rooms, stored)
+        if not diff.unchanged:
+            pipe.multi()
+            _queue_writes(pipe, by_id, diff, old_district, districts, prefix)
+        return diff
+
+    return client.transaction(write, rooms_key, f"{prefix}meta", value_from_callable=True)
+
+
+def _queue_writes(pipe, by_id: Dict[str, ExportRoom], diff: ExportDiff, old_district: Dict[str, Optional[str]],
+                  districts: Dict[str, int], prefix: str):
+    rooms_key = f"{prefix}rooms"
+    for room_id in diff.changed + diff.removed:
+        pipe.delete(f"{prefix}room:{room_id}", f"{prefix}exits:{room_id}")
+        if old_district.get(room_id) is not None:
+            pipe.srem(f"{prefix}district:{old_district[room_id]}", room_id)
+    if diff.removed:
+        pipe.srem(rooms_key, *diff.removed)
+
+    for room_id in diff.added + diff.changed:
+        room = by_id[room_id]
+        pipe.hset(f"{prefix}room:{room_id}", mapping=_room_fields(room))
+        if room.exits:
+            pipe.hset(f"{prefix}exits:{room_id}", mapping={direction: target for direction, target, _ in room.exits})
+        pipe.sadd(f"{prefix}district:{room.district}", room_id)
+    if diff.added:
+        pipe.sadd(rooms_key, *diff.added)
+
+    pipe.delete(f"{prefix}districts")
+    if districts:
+        pipe.hset(f"{prefix}districts", mapping=districts)
+    pipe.hset(f"{prefix}meta", mapping={'rooms': len(by_id), 'exported_at': time.strftime('%Y-%m-%dT%H:%M:%S')})
+
+
+def connect_redis(url: str):
+    """按需导入 redis-py 并连接"""
+    try:
+        import redis
+    except ImportError:
+        raise RuntimeError("导出到 Redis 需要 redis-py（pip install redis）")
+    return redis.Redis.from_url(url)
+
+
+def default_redis_url() -> str:
+    """由服务器 .env 使用的 REDIS_HOST/REDIS_PORT 组成连接地址"""
+    return f"redis://{os.environ.get('REDIS_HOST', 'localhost')}:{os.environ.get('REDIS_PORT', '6379')}/0"
+
+
+def _print_diff(target: str, diff: ExportDiff):
+    if diff.unchanged:
+        print(f"[OK] {target}: 没有变化")
+    else:
+        print(f"[OK] {target}: 新增 {len(diff.added)}，更新 {len(diff.changed)}，删除 {len(diff.removed)} 个房间")
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='校验地图后把房间图导出到 PostgreSQL 与 Redis')
+    parser.add_argument('maps_root', help='地图根目录，如 packages/server/data/maps')
+    parser.add_argument('--postgres', nargs='?', const=default_postgres_dsn(), metavar='DSN',
+                        help='导出到 PostgreSQL，省略 DSN 时使用 DB_* 环境变量（默认 docker-compose 中的数据库）')
+    parser.add_argument('--redis', nargs='?', const=default_redis_url(), metavar='URL',
+                        help='导出到 Redis，省略 URL 时使用 REDIS_HOST/REDIS_PORT 环境变量')
+    parser.add_argument('--prefix', default='map:', help='Redis 键前缀（默认 map:）')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='并行解析地图文件的进程数，0 表示使用全部 CPU 核（默认 1）')
+    parser.add_argument('--allow-errors', action='store_true',
+                        help=f"存在 {'/'.join(BLOCKING_RULES)} 问题时仍然导出")
+    args = parser.parse_args(argv)
+    if not args.postgres and not args.redis:
+        parser.error('至少需要指定 --postgres 或 --redis')
+    return args
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    world = load_world(discover_map_files(args.maps_root), args.workers or None)
+    for file_path, error in world.errors:
+        print(f"[ERROR] 无法加载文件 {file_path}: {error}")
+    if world.errors:
+        return 1
+
+    rooms, districts, issues = build_export(world.rooms, args.maps_root)
+    blocking = [issue for issue in issues if issue.rule in BLOCKING_RULES]
+    print(f"房间数: {len(rooms)}，区域数: {len(districts)}，校验问题: {len(issues)}")
+    if blocking:
+        for issue in blocking[:10]:
+            print(f"[ERROR] {issue.rule}: {issue.room} --{issue.direction}--> {issue.target}")
+        if not args.allow_errors:
+            print(f"[ERROR] 有 {len(blocking)} 个阻止导出的问题，修复后重试或使用 --allow-errors")
+            return 1
+
+    try:
+        if args.postgres:
+            connection = connect_postgres(args.postgres)
+            try:
+                _print_diff('PostgreSQL', export_postgres(connection, rooms, districts))
+            finally:
+                connection.close()
+        if args.redis:
+            _print_diff('Redis', export_redis(connect_redis(args.redis), rooms, districts, args.prefix))
+    except RuntimeError as e:
+        print(f"[ERROR] {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    # 设置标准输出编码为UTF-8
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.exit(main())
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+玩家流量模拟
+在出口图上构建稀疏转移矩阵，用矩阵-向量迭代计算从出生点出发的期望占用与平稳分布，
+并可用 NumPy 向量化地同时推进成千上万个随机游走或目标导向的代理，统计每个房间的
+平均与峰值人数。结果按房间和区域汇总，可直接作为 map_partition.py --traffic 的输入
+"""
+
+import argparse
+import io
+import json
+import sys
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+from map_graph import RoomGraph
+from map_loader import discover_map_files, load_world
+from map_metrics import adjacency_matrix
+
+DEFAULT_SPAWN = 'tj_gate_south_outside'
+
+
+class FlowModel(NamedTuple):
+    """玩家移动模型
+
+    每一步玩家以 stay 概率留在原地，否则沿出口移动：随机游走时均匀选择一个相邻房间；
+    设置了目标房间时以 greed 概率走向距离最近目标更近的相邻房间。到达目标的玩家与以 restart
+    概率下线重进的玩家下一步回到出生点。没有出口的房间玩家一直停留。
+    """
+    transition: sparse.csr_matrix    # 行随机矩阵，目标房间的行全为 0
+    spawn: np.ndarray                # 出生点概率分布
+    restart: float
+    adjacency: sparse.csr_matrix     # 去除自环与重复出口的 0/1 邻接矩阵
+    downhill: Optional[sparse.csr_matrix]  # 朝目标前进的出口
+    goals: np.ndarray                # 目标房间布尔掩码
+    stay: float
+    greed: float
+
+
+def _row_normalize(matrix: sparse.csr_matrix) -> Tuple[sparse.csr_matrix, np.ndarray]:
+    """按行归一化，返回 (归一化矩阵, 每行的非零元素数)"""
+    degree = np.diff(matrix.indptr)
+    scale = np.divide(1.0, degree, out=np.zeros(len(degree)), where=degree > 0)
+    return sparse.diags(scale) @ matrix, degree
+
+
+def goal_distances(adjacency: sparse.csr_matrix, goal_nodes: Sequence[int]) -> np.ndarray:
+    """每个房间到最近目标房间的最少步数（无法到达为 inf），在反向图上做一次多源 BFS"""
+    return csgraph.dijkstra(adjacency.T.tocsr(), directed=True, indices=list(goal_nodes),
+                            unweighted=True, min_only=True)
+
+
+def build_model(graph: RoomGraph, spawn_nodes: Sequence[int], goal_nodes: Sequence[int] = (),
+                stay: float = 0.2, greed: float = 0.8, restart: float = 0.0) -> FlowModel:
+    """构建转移矩阵与出生分布"""
+    n = graph.room_count
+    adjacency = adjacency_matrix(graph)
+    walk, degree = _row_normalize(adjacency)
+    goals = np.zeros(n, dtype=bool)
+    goals[list(goal_nodes)] = True
+    # 出生点本身不算目标，否则出生在目标房间的玩家会原地反复重生
+    goals[list(spawn_nodes)] = False
+    goal_nodes = np.flatnonzero(goals)
+
+    downhill = None
+    move = walk
+    if goals.any():
+        distance = goal_distances(adjacency, goal_nodes)
+        rows = np.repeat(np.arange(n), degree)
+        closer = distance[adjacency.indices] == distance[rows] - 1
+        downhill = adjacency.copy()
+        downhill.data = closer.astype(np.float64)
+        downhill.eliminate_zeros()
+        toward, toward_degree = _row_normalize(downhill)
+        # 无法再接近目标的房间只做随机游走
+        mix = np.where(toward_degree > 0, greed, 0.0)
+        move = sparse.diags(mix) @ toward + sparse.diags(1.0 - mix) @ walk
+
+    linger = np.where(degree > 0, stay, 1.0)
+    transition = (sparse.diags(linger) + sparse.diags(1.0 - linger) @ move).tocsr()
+    transition = (sparse.diags((~goals).astype(np.float64)) @ transition).tocsr()
+
+    spawn = np.zeros(n)
+    np.add.at(spawn, list(spawn_nodes), 1.0)
+    spawn /= spawn.sum()
+    return FlowModel(transition, spawn, restart, adjacency, downhill, goals, stay, greed)
+
+
+def _step(forward: sparse.csr_matrix, model: FlowModel, x: np.ndarray) -> np.ndarray:
+    """分布前进一步：x' = (1 - restart) P^T x，流失的概率（下线与到达目标）回到出生点"""
+    moved = (1.0 - model.restart) * (forward @ x)
+    moved += (1.0 - moved.sum()) * model.spawn
+    return moved
+
+
+def expected_occupancy(model: FlowModel, steps: int) -> np.ndarray:
+    """从出生点开始 steps 步内每个房间的平均占用概率（第 1..steps 步的平均）"""
+    forward = model.transition.T.tocsr()
+    x = model.spawn.copy()
+    total = np.zeros_like(x)
+    for _ in range(steps):
+        x = _step(forward, model, x)
+        total += x
+    return total / max(steps, 1)
+
+
+def stationary_distribution(model: FlowModel, tol: float = 1e-10,
+                            max_iter: int = 10000) -> Tuple[np.ndarray, int, bool]:
+    """从出生分布开始幂迭代到收敛，返回 (分布, 迭代次数, 是否收敛)
+
+    停留概率保证了链的非周期性；restart > 0 或设置了目标时分布与起点无关，
+    否则在不连通的地图上得到的是从出生点出发的极限分布。
+    """
+    forward = model.transition.T.tocsr()
+    x = model.spawn.copy()
+    for iteration in range(1, max_iter + 1):
+        nxt = _step(forward, model, x)
+        if np.abs(nxt - x).sum() < tol:
+            return nxt, iteration, True
+        x = nxt
+    return x, max_iter, False
+
+
+def simulate_agents(model: FlowModel, agents: int, steps: int, seed: int = 0,
+                    groups: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """同时推进 agents 个代理 steps 步，返回 (每个房间的平均人数, 房间峰值人数, 分组峰值人数)
+
+    所有代理的位置保存在一个数组中，每一步对全部代理一次性抽样，没有逐代理的 Python 循环。
+    groups 为每个房间的分组编号（如区域），分组峰值是同一时刻分组内的最大人数，而不是房间峰值之和。
+    """
+    rng = np.random.default_rng(seed)
+    n = model.transition.shape[0]
+    spawn_nodes = np.flatnonzero(model.spawn)
+    spawn_weights = model.spawn[spawn_nodes]
+    indptr, indices = model.adjacency.indptr, model.adjacency.indices
+    degree = np.diff(indptr)
+    if model.downhill is not None:
+        down_ptr, down_idx = model.downhill.indptr, model.downhill.indices
+        down_degree = np.diff(down_ptr)
+
+    position = rng.choice(spawn_nodes, size=agents, p=spawn_weights)
+    total = np.zeros(n, dtype=np.int64)
+    peak = np.zeros(n, dtype=np.int64)
+    group_peak = None if groups is None else np.zeros(int(groups.max()) + 1, dtype=np.int64)
+    for _ in range(steps):
+        respawn = model.goals[position] | (rng.random(agents) < model.restart)
+        moving = ~respawn & (degree[position] > 0) & (rng.random(agents) >= model.stay)
+
+        movers = position[moving]
+        choice = (rng.random(len(movers)) * degree[movers]).astype(np.int64)
+        target = indices[indptr[movers] + choice]
+        if model.downhill is not None:
+            toward = (down_degree[movers] > 0) & (rng.random(len(movers)) < model.greed)
+            downhill_movers = movers[toward]
+            choice = (rng.random(len(downhill_movers)) * down_degree[downhill_movers]).astype(np.int64)
+            target[toward] = down_idx[down_ptr[downhill_movers] + choice]
+        position[moving] = target
+        position[respawn] = rng.choice(spawn_nodes, size=int(respawn.sum()), p=spawn_weights)
+
+        counts = np.bincount(position, minlength=n)
+        total += counts
+        np.maximum(peak, counts, out=peak)
+        if groups is not None:
+            np.maximum(group_peak, np.bincount(groups, weights=counts, minlength=len(group_peak)).astype(np.int64),
+                       out=group_peak)
+    return total / max(steps, 1), peak, group_peak
+
+
+def resolve_rooms(graph: RoomGraph, types: Dict[str, str], names: Sequence[str]) -> List[int]:
+    """把房间 ID 或房间类型解析为节点编号，类型会展开为该类型的全部房间"""
+    nodes = []
+    for name in names:
+        node = graph.index.get(name)
+        if node is not None and node < graph.room_count:
+            nodes.append(node)
+        else:
+            nodes.extend(node for node in range(graph.room_count) if types[graph.ids[node]] == name)
+    return nodes
+
+
+def flow_report(graph: RoomGraph, districts: Dict[str, str], agents: int, columns: Dict[str, np.ndarray],
+                top: int = 20, district_columns: Optional[Dict[str, Dict[str, float]]] = None) -> Dict:
+    """按第一列排序的热点房间与每个区域的人数汇总，数值均为人数
+
+    区域人数默认为房间人数之和；district_columns 中的列（如同一时刻的峰值）直接使用给定的区域值。
+    """
+    district_columns = district_columns or {}
+    ids = graph.ids
+    primary = next(iter(columns.values()))
+    ranking = np.argsort(-primary, kind='stable')
+    hotspots = [
+        {'room': ids[node], 'district': districts[ids[node]], **{key: float(values[node]) for key, values in columns.items()}}
+        for node in ranking[:top]
+    ]
+    by_district: Dict[str, Dict[str, float]] = {}
+    for node in range(graph.room_count):
+        district = districts[ids[node]]
+        row = by_district.setdefault(district, {key: district_columns[key].get(district, 0.0)
+                                                if key in district_columns else 0.0 for key in columns})
+        for key, values in columns.items():
+            if key not in district_columns:
+                row[key] += float(values[node])
+    return {'agents': agents, 'hotspots': hotspots,
+            'districts': dict(sorted(by_district.items(), key=lambda item: -next(iter(item[1].values()))))}
+
+
+def print_flow_report(report: Dict, names: Dict[str, str], titles: Dict[str, str]):
+    """打印热点房间与区域人数"""
+    header = ' '.join(f"{titles[key]:>10s}" for key in titles)
+    print(f"\n热点房间（{report['agents']} 名玩家）")
+    print("-" * 40)
+    print(f"排名 {'房间名称':20s} {'区域':12s} {header}")
+    for i, row in enumerate(report['hotspots'], 1):
+        values = ' '.join(f"{row[key]:10.2f}" for key in titles)
+        print(f"{i:3d}. {names[row['room']][:20]:20s} {row['district'][:12]:12s} {values}")
+
+    print("\n区域人数")
+    print("-" * 40)
+    for district, row in report['districts'].items():
+        values = ' '.join(f"{row[key]:10.2f}" for key in titles)
+        print(f"     {district[:33]:33s} {values}")
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='模拟玩家在地图上的流动，预测拥挤的房间与区域')
+    parser.add_argument('maps_root', help='地图根目录，如 packages/server/data/maps')
+    parser.add_argument('--spawn', nargs='+', default=[DEFAULT_SPAWN],
+                        help=f'出生点房间 ID 或房间类型（默认 {DEFAULT_SPAWN}）')
+    parser.add_argument('--goals', nargs='*', default=[],
+                        help='目标房间 ID 或房间类型（如 shop），设置后玩家倾向走向最近的目标，到达后回到出生点')
+    parser.add_argument('--agents', type=int, default=10000, help='玩家数量（默认 10000）')
+    parser.add_argument('--steps', type=int, default=200, help='期望占用与模拟的步数（默认 200）')
+    parser.add_argument('--stay', type=float, default=0.2, help='每一步停留在原地的概率（默认 0.2）')
+    parser.add_argument('--greed', type=float, default=0.8, help='有目标时走向目标的概率（默认 0.8）')
+    parser.add_argument('--restart', type=float, default=0.01, help='每一步下线后从出生点重进的概率（默认 0.01）')
+    parser.add_argument('--simulate', action='store_true', help='额外用向量化代理模拟统计平均与峰值人数')
+    parser.add_argument('--seed', type=int, default=0, help='模拟的随机种子')
+    parser.add_argument('--top', type=int, default=20, help='显示的热点房间数（默认 20）')
+    parser.add_argument('--output', default='player_flow.json', help='结果 JSON（默认 player_flow.json）')
+    parser.add_argument('--traffic-output',
+                        help='把每个房间的平稳人数写成 {room_id: 人数}，可作为 map_partition.py --traffic 的输入')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='并行解析地图文件的进程数，0 表示使用全部 CPU 核（默认 1）')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    world = load_world(discover_map_files(args.maps_root), args.workers or None)
+    for file_path, error in world.errors:
+        print(f"[ERROR] 无法加载文件 {file_path}: {error}")
+    for room_id, kept, duplicate in world.conflicts:
+        print(f"[WARNING] 房间ID冲突 {room_id}，保留 {kept}，忽略 {duplicate}")
+    graph = RoomGraph.from_records(world.rooms.values())
+    types = {room_id: record.type for room_id, record in world.rooms.items()}
+    districts = {room_id: record.district for room_id, record in world.rooms.items()}
+    names = {room_id: record.name for room_id, record in world.rooms.items()}
+
+    spawn_nodes = resolve_rooms(graph, types, args.spawn)
+    if not spawn_nodes:
+        print(f"[ERROR] 找不到出生点: {' '.join(args.spawn)}")
+        return 1
+    goal_nodes = resolve_rooms(graph, types, args.goals)
+    if args.goals and not goal_nodes:
+        print(f"[ERROR] 找不到目标房间: {' '.join(args.goals)}")
+        return 1
+
+    model = build_model(graph, spawn_nodes, goal_nodes, args.stay, args.greed, args.restart)
+    stationary, iterations, converged = stationary_distribution(model)
+    if converged:
+        print(f"[OK] 平稳分布在 {iterations} 次迭代后收敛")
+    else:
+        print(f"[WARNING] 平稳分布 {iterations} 次迭代后仍未收敛，结果为近似值（可增大 --restart）")
+
+    columns = {
+        'stationary': stationary * args.agents,
+        'expected': expected_occupancy(model, args.steps) * args.agents
+    }
+    titles = {'stationary': '平稳人数', 'expected': f'{args.steps}步均值'}
+    district_columns = {}
+    if args.simulate:
+        district_names = sorted(set(districts.values()))
+        labels = {name: label for label, name in enumerate(district_names)}
+        groups = np.array([labels[districts[graph.ids[node]]] for node in range(graph.room_count)], dtype=np.int64)
+        mean, peak, district_peak = simulate_agents(model, args.agents, args.steps, args.seed, groups)
+        columns['simulated_mean'] = mean
+        columns['simulated_peak'] = peak.astype(np.float64)
+        district_columns['simulated_peak'] = {name: float(district_peak[label]) for name, label in labels.items()}
+        titles.update(simulated_mean='模拟均值', simulated_peak='模拟峰值')
+
+    report = flow_report(graph, districts, args.agents, columns, args.top, district_columns)
+    print_flow_report(report, names, titles)
+
+    ids = graph.ids
+    report['stationary_converged'] = converged
+    report['rooms'] = {ids[node]: {key: float(values[node]) for key, values in columns.items()}
+                       for node in range(graph.room_count)}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n模拟结果已保存到: {args.output}")
+    if args.traffic_output:
+        with open(args.traffic_output, 'w', encoding='utf-8') as f:
+            json.dump({ids[node]: float(columns['stationary'][node]) for node in range(graph.room_count)},
+                      f, ensure_ascii=False, indent=2)
+        print(f"房间流量已保存到: {args.traffic_output}")
+    return 0
+
+
+if __name__ == "__main__":
+    # 设置标准输出编码为UTF-8
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.exit(main())
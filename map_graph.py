@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑的整数索引房间图
+房间 ID 在加载时映射为连续整数，出口以 CSR（偏移数组 + 目标数组 + 方向编码数组）保存，
+所有连通性分析都在整数数组上完成，只有渲染报告时才回查房间名称等信息
+"""
+
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 常用方向预先编码，未知方向在构建时追加到图自身的方向表
+DIRECTIONS = [
+    'north', 'south', 'east', 'west',
+    'northeast', 'northwest', 'southeast', 'southwest',
+    'up', 'down', 'in', 'out'
+]
+
+# 每个方向对应的反向出口方向
+OPPOSITE_DIRECTIONS = {
+    'north': 'south', 'south': 'north',
+    'east': 'west', 'west': 'east',
+    'northeast': 'southwest', 'southwest': 'northeast',
+    'northwest': 'southeast', 'southeast': 'northwest',
+    'up': 'down', 'down': 'up',
+    'in': 'out', 'out': 'in'
+}
+
+
+class RoomGraph:
+    """CSR 格式的房间出口图
+
+    节点 0..room_count-1 为真实房间；room_count 之后的节点是出口指向但不存在的房间，
+    它们没有出边，仅用于记录悬空出口。每行的出口按目标节点排序，便于二分查找。
+    """
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.room_count = 0
+        self.directions: List[str] = list(DIRECTIONS)
+        self._direction_codes: Dict[str, int] = {d: i for i, d in enumerate(self.directions)}
+        self.offsets = array('i', [0])
+        self.targets = array('i')
+        self.dir_codes = array('B')
+        self._reverse: Optional[Tuple[array, array]] = None
+
+    @classmethod
+    def from_room_exits(cls, room_exits: Dict[str, List[Dict]]) -> 'RoomGraph':
+        """从 {room_id: [{'direction', 'target', ...}]} 构建"""
+        return cls.from_edges(
+            (room_id, ((e['target'], e['direction']) for e in exits))
+            for room_id, exits in room_exits.items()
+        )
+
+    @classmethod
+    def from_records(cls, records: Iterable) -> 'RoomGraph':
+        """从 map_loader.RoomRecord 序列构建"""
+        return cls.from_edges(
+            (record.id, ((target, direction) for direction, target, _ in record.exits))
+            for record in records
+        )
+
+    @classmethod
+    def from_edges(cls, rows: Iterable[Tuple[str, Iterable[Tuple[str, str]]]]) -> 'RoomGraph':
+        """从 (room_id, [(target, direction), ...]) 序列构建"""
+        graph = cls()
+        pending = []
+        for room_id, exits in rows:
+            graph._intern(room_id)
+            pending.append((room_id, [(target, graph._direction_code(d)) for target, d in exits]))
+        graph.room_count = len(graph.ids)
+
+        targets = graph.targets
+        dir_codes = graph.dir_codes
+        offsets = graph.offsets
+        for _, row in pending:
+            encoded = sorted((graph._intern(target), code) for target, code in row)
+            for target, code in encoded:
+                targets.append(target)
+                dir_codes.append(code)
+            offsets.append(len(targets))
+
+        # 不存在的目标房间没有出边
+        offsets.extend([len(targets)] * (len(graph.ids) - graph.room_count))
+        return graph
+
+    @classmethod
+    def from_arrays(cls, ids: List[str], room_count: int, directions: List[str],
+                    offsets, targets, dir_codes) -> 'RoomGraph':
+        """直接使用现成的 CSR 数组（如内存映射快照中的 memoryview）构建，不复制数据"""
+        graph = cls()
+        graph.ids = ids
+        graph.index = {room_id: node for node, room_id in enumerate(ids)}
+        graph.room_count = room_count
+        graph.directions = list(directions)
+        graph._direction_codes = {d: i for i, d in enumerate(graph.directions)}
+        graph.offsets = offsets
+        graph.targets = targets
+        graph.dir_codes = dir_codes
+        return graph
+
+    def _intern(self, room_id: str) -> int:
+        node = self.index.get(room_id)
+        if node is None:
+            node = len(self.ids)
+            self.index[room_id] = node
+            self.ids.append(room_id)
+        return node
+
+    def _direction_code(self, direction: str) -> int:
+        code = self._direction_codes.get(direction)
+        if code is None:
+            code = len(self.directions)
+            if code > 255:
+                raise ValueError(f"方向种类过多，无法编码: {direction}")
+            self.directions.append(direction)
+            self._direction_codes[direction] = code
+        return code
+
+    @property
+    def node_count(self) -> int:
+        return len(self.ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def is_room(self, node: int) -> bool:
+        return node < self.room_count
+
+    def out_degree(self, node: int) -> int:
+        return self.offsets[node + 1] - self.offsets[node]
+
+    def neighbors(self, node: int) -> array:
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def edges(self, node: int) -> Iterator[Tuple[int, int]]:
+        """遍历单个节点的出边 (target, dir_code)"""
+        for pos in range(self.offsets[node], self.offsets[node + 1]):
+            yield self.targets[pos], self.dir_codes[pos]
+
+    def has_edge(self, source: int, target: int) -> bool:
+        lo, hi = self.offsets[source], self.offsets[source + 1]
+        pos = bisect_left(self.targets, target, lo, hi)
+        return pos < hi and self.targets[pos] == target
+
+    def edge_codes(self, source: int, target: int) -> List[int]:
+        """source 指向 target 的全部出口的方向编码（二分查找有序的出边行）"""
+        hi = self.offsets[source + 1]
+        pos = bisect_left(self.targets, target, self.offsets[source], hi)
+        codes = []
+        while pos < hi and self.targets[pos] == target:
+            codes.append(self.dir_codes[pos])
+            pos += 1
+        return codes
+
+    def reverse(self) -> Tuple[array, array]:
+        """入边 CSR (in_offsets, in_sources)，首次调用时构建"""
+        if self._reverse is None:
+            n = self.node_count
+            counts = array('i', [0]) * (n + 1)
+            for target in self.targets:
+                counts[target + 1] += 1
+            for i in range(n):
+                counts[i + 1] += counts[i]
+            in_offsets = array('i', counts)
+            in_sources = array('i', [0]) * len(self.targets)
+            fill = array('i', counts[:n])
+            offsets = self.offsets
+            for source in range(n):
+                for pos in range(offsets[source], offsets[source + 1]):
+                    target = self.targets[pos]
+                    in_sources[fill[target]] = source
+                    fill[target] += 1
+            self._reverse = (in_offsets, in_sources)
+        return self._reverse
+
+    def in_degree(self, node: int) -> int:
+        in_offsets, _ = self.reverse()
+        return in_offsets[node + 1] - in_offsets[node]
+
+
+def bfs_reachable(graph: RoomGraph, start: int) -> List[int]:
+    """沿出边 BFS，返回从 start 可达的真实房间节点（按访问顺序）
+
+    入队前即标记已访问，队列中不会出现重复节点。
+    """
+    room_count = graph.room_count
+    offsets = graph.offsets
+    targets = graph.targets
+    visited = bytearray(graph.node_count)
+    visited[start] = 1
+    order = [start]
+    head = 0
+    while head < len(order):
+        node = order[head]
+        head += 1
+        for pos in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[pos]
+            if neighbor < room_count and not visited[neighbor]:
+                visited[neighbor] = 1
+                order.append(neighbor)
+    return order
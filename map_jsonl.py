@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析结果的流式 JSONL 输出
+每条问题或指标写成一行 JSON 并立即刷新，下游工具可以在分析结束前边读边处理，
+写出端不保留已写出的记录，内存占用与记录数量无关
+"""
+
+import json
+import sys
+from typing import Dict, Iterator, Optional
+
+from map_rules import Issue
+
+
+class JsonlWriter:
+    """逐行写出 {'record': 类型, ...} 记录，path 为 '-' 时写到标准输出"""
+
+    def __init__(self, path: str):
+        self.path = path
+        if path == '-':
+            self.file = sys.stdout
+            self._owns_file = False
+        else:
+            self.file = open(path, 'w', encoding='utf-8')
+            self._owns_file = True
+        self.count = 0
+
+    def write(self, record: str, **fields):
+        self.file.write(json.dumps({'record': record, **fields}, ensure_ascii=False))
+        self.file.write('\n')
+        self.file.flush()
+        self.count += 1
+
+    def issue(self, issue: Issue):
+        """写出一条校验问题，可直接作为 RuleEngine.run 的 sink"""
+        self.write('issue', rule=issue.rule, severity=issue.severity, room=issue.room,
+                   target=issue.target, direction=issue.direction, detail=issue.detail)
+
+    def close(self):
+        if self._owns_file:
+            self.file.close()
+
+    def __enter__(self) -> 'JsonlWriter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_jsonl(path: str, record: Optional[str] = None) -> Iterator[Dict]:
+    """逐行读取 JSONL 记录，record 不为空时只返回该类型的记录"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if record is None or item.get('record') == record:
+                yield item
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+地图流式加载器
+按 districts -> locations -> rooms 的层级增量读取地图 JSON，
+每次只解码一个房间对象并产出紧凑的房间记录，内存占用以单个房间为上限
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+_decoder = json.JSONDecoder()
+
+
+class RoomRecord(NamedTuple):
+    """紧凑房间记录，出口为 (direction, target, description) 元组"""
+    id: str
+    name: str
+    type: str
+    district: str
+    location: str
+    coordinates: Dict
+    description: str
+    exits: Tuple[Tuple[str, str, str], ...]
+    source: str
+
+
+class _JsonStream:
+    """基于分块读取的最小 JSON 拉取解析器
+
+    只在需要时把完整的值交给 json 模块解码，其余结构逐字符推进。
+    """
+
+    def __init__(self, f, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # 丢弃已消费的部分，保持缓冲区只包含未解析内容
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """跳过空白并返回下一个字符，文件结束时返回空串"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str):
+        actual = self.peek()
+        if actual != char:
+            raise ValueError(f"JSON 格式错误：期望 '{char}'，实际为 '{actual or 'EOF'}'")
+        self.pos += 1
+
+    def read_value(self):
+        """完整解码下一个值（字符串、数字或一个较小的对象）"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # 数字可能恰好被块边界截断，需确认其后还有内容
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def skip_value(self):
+        """跳过下一个值而不解码，用于不关心的大型字段"""
+        char = self.peek()
+        if char not in '{[':
+            self.read_value()
+            return
+
+        depth = 0
+        in_string = False
+        escaped = False
+        while True:
+            if self.pos >= len(self.buf) and not self._fill():
+                raise ValueError("JSON 格式错误：文件意外结束")
+            c = self.buf[self.pos]
+            self.pos += 1
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif c == '\\':
+                    escaped = True
+                elif c == '"':
+                    in_string = False
+            elif c == '"':
+                in_string = True
+            elif c in '{[':
+                depth += 1
+            elif c in '}]':
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def iter_object_keys(self) -> Iterator[str]:
+        """逐个产出对象的键，调用方负责消费对应的值"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError(f"JSON 格式错误：对象中出现 '{char or 'EOF'}'")
+
+    def iter_array(self) -> Iterator[None]:
+        """逐个元素推进数组，调用方在每次产出后消费一个值"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield None
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"JSON 格式错误：数组中出现 '{char or 'EOF'}'")
+
+
+def _make_record(room: Dict, district: Dict, location: Dict, source: str) -> RoomRecord:
+    return RoomRecord(
+        id=room['id'],
+        name=room.get('name', room['id']),
+        type=room.get('type', 'unknown'),
+        district=district.get('name', 'unknown'),
+        location=location.get('name', 'unknown'),
+        coordinates=room.get('coordinates', {}),
+        description=room.get('description', ''),
+        exits=tuple(
+            (exit_info['direction'], exit_info['targetRoomId'], exit_info.get('description', ''))
+            for exit_info in room.get('exits', [])
+        ),
+        source=source
+    )
+
+
+def _iter_locations(stream: _JsonStream, district: Dict, source: str) -> Iterator[RoomRecord]:
+    for _ in stream.iter_array():
+        location = {}
+        for key in stream.iter_object_keys():
+            if key == 'rooms':
+                for _ in stream.iter_array():
+                    yield _make_record(stream.read_value(), district, location, source)
+            elif stream.peek() in '{[':
+                stream.skip_value()
+            else:
+                location[key] = stream.read_value()
+
+
+def iter_file_rooms(file_path: str) -> Iterator[RoomRecord]:
+    """流式读取单个地图文件中的所有房间
+
+    区域与位置的 id/name 等标量字段需出现在 locations/rooms 数组之前
+    （导出脚本生成的文件均满足这一点），之后出现的字段不会附加到房间记录上。
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        stream = _JsonStream(f)
+        for key in stream.iter_object_keys():
+            if key != 'districts':
+                stream.skip_value()
+                continue
+            for _ in stream.iter_array():
+                district = {}
+                for district_key in stream.iter_object_keys():
+                    if district_key == 'locations':
+                        yield from _iter_locations(stream, district, file_path)
+                    elif stream.peek() in '{[':
+                        stream.skip_value()
+                    else:
+                        district[district_key] = stream.read_value()
+
+
+def iter_rooms(file_paths: List[str],
+               on_error: Optional[Callable[[str, Exception, int], None]] = None) -> Iterator[RoomRecord]:
+    """依次流式读取多个地图文件，单个文件出错时回调 on_error(file_path, exc, count) 后继续
+
+    房间边解析边产出，内存占用以单个房间为上限。因此解析到一半出错的文件，出错前的 count 个
+    房间已经产出，调用方需要在报告中单独说明；这与 load_world 整体丢弃出错文件的处理不同，
+    需要一致结果时使用 load_world。
+    """
+    for file_path in file_paths:
+        count = 0
+        try:
+            for record in iter_file_rooms(file_path):
+                yield record
+                count += 1
+        except Exception as e:
+            if on_error is None:
+                raise
+            on_error(file_path, e, count)
+
+
+class WorldLoad(NamedTuple):
+    """多文件加载结果
+
+    rooms 按文件路径排序后首次出现的顺序合并；
+    conflicts 为 (room_id, 保留的文件, 重复的文件)；errors 为 (文件, 错误信息)。
+    """
+    rooms: Dict[str, RoomRecord]
+    conflicts: List[Tuple[str, str, str]]
+    errors: List[Tuple[str, str]]
+
+
+def discover_map_files(maps_root: str) -> List[str]:
+    """递归查找 maps_root 下的所有地图 JSON 文件，按路径排序保证结果确定"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(maps_root):
+        dirnames.sort()
+        for filename in filenames:
+            if filename.endswith('.json'):
+                found.append(os.path.join(dirpath, filename))
+    return sorted(found)
+
+
+def _load_file(file_path: str) -> Tuple[List[RoomRecord], Optional[str]]:
+    """进程池工作函数：读取单个文件的全部房间"""
+    try:
+        return list(iter_file_rooms(file_path)), None
+    except Exception as e:
+        return [], str(e)
+
+
+def load_world(file_paths: List[str], workers: Optional[int] = None) -> WorldLoad:
+    """并行加载多个地图文件并确定性地合并
+
+    workers 为进程数，None 表示使用 CPU 核数，1 表示在当前进程内顺序加载。
+    重复的房间 ID 保留第一次出现的版本并记录为冲突，不会静默覆盖；
+    解析出错的文件整体记入 errors，其中出错之前的房间也不会合并，结果与 workers 无关。
+    """
+    file_paths = sorted(file_paths)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(file_paths)))
+
+    if workers == 1:
+        # 顺序模式与进程池使用同一工作函数，出错文件在两种模式下都不贡献任何房间
+        return _merge(file_paths, map(_load_file, file_paths))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map 按提交顺序返回结果，合并顺序与进程调度无关
+        return _merge(file_paths, pool.map(_load_file, file_paths))
+
+
+def _merge(file_paths: List[str], results) -> WorldLoad:
+    rooms = {}
+    conflicts = []
+    errors = []
+    for file_path, (records, error) in zip(file_paths, results):
+        if error is not None:
+            errors.append((file_path, error))
+            continue
+        for record in records:
+            existing = rooms.get(record.id)
+            if existing is not None:
+                conflicts.append((record.id, existing.source, record.source))
+                continue
+            rooms[record.id] = record
+    return WorldLoad(rooms, conflicts, errors)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+房间图中心性指标
+基于 NumPy/SciPy 稀疏矩阵计算出入度、介数中心性（小地图精确计算，大地图按源点采样）、
+割点与桥出口，用于判断真正的咽喉要道以及分服时的切分位置
+"""
+
+import argparse
+import io
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from map_graph import RoomGraph
+from map_loader import discover_map_files, load_world
+from map_snapshot import SnapshotRoomInfo, load_or_compile
+
+# 房间数不超过该值时精确计算介数，否则按源点采样
+EXACT_BETWEENNESS_LIMIT = 5000
+# 大地图默认的采样源点数：排名靠前的咽喉要道在几百个源点下已经稳定
+DEFAULT_BETWEENNESS_SAMPLES = 256
+# 每批 BFS 的稠密矩阵元素上限，控制内存占用
+BATCH_CELLS = 4_000_000
+
+
+def adjacency_matrix(graph: RoomGraph) -> sparse.csr_matrix:
+    """真实房间之间的 0/1 邻接矩阵 A[u, v] = 1 表示存在 u -> v 的出口（去除自环与重复出口）"""
+    n = graph.room_count
+    offsets = np.frombuffer(graph.offsets, dtype=np.int32)[:n + 1].astype(np.int64)
+    targets = np.frombuffer(graph.targets, dtype=np.int32)[:offsets[-1]]
+    sources = np.repeat(np.arange(n, dtype=np.int32), np.diff(offsets))
+    keep = (targets < n) & (targets != sources)
+    data = np.ones(int(keep.sum()), dtype=np.float64)
+    matrix = sparse.csr_matrix((data, (sources[keep], targets[keep])), shape=(n, n))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1.0
+    return matrix
+
+
+def degree_metrics(graph: RoomGraph, matrix: Optional[sparse.csr_matrix] = None) -> Dict[str, np.ndarray]:
+    """出度与入度，均按去重后的邻接矩阵计算：出度为房间通往的不同真实房间数，入度为指向该房间的不同房间数
+
+    悬空出口、自环与指向同一房间的重复出口都不计入，两者可以直接比较。
+    """
+    if matrix is None:
+        matrix = adjacency_matrix(graph)
+    return {
+        'out_degree': np.diff(matrix.indptr).astype(np.int64),
+        'in_degree': np.bincount(matrix.indices, minlength=matrix.shape[0]).astype(np.int64)
+    }
+
+
+def _expand(indptr: np.ndarray, indices: np.ndarray, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR 中 nodes 各行的全部列，返回 (每条边所属的 nodes 下标, 列号)"""
+    starts = indptr[nodes]
+    counts = indptr[nodes + 1] - starts
+    owner = np.repeat(np.arange(len(nodes)), counts)
+    positions = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts) + starts[owner]
+    return owner, indices[positions]
+
+
+def betweenness(graph: RoomGraph, matrix: Optional[sparse.csr_matrix] = None,
+                samples: Optional[int] = None, seed: int = 0) -> np.ndarray:
+    """有向介数中心性（Brandes 算法，一批源点同时向量化执行）
+
+    每批源点的 (房间, 源点) 状态以扁平数组保存，每层只保留本层新到达的 (房间, 源点) 对：
+    前向沿出边展开前沿累计最短路径数，反向从最深一层开始沿入边回传依赖值。每层的工作量与
+    前沿的出入边数成正比，总代价为 O(k·(n+m))，与地图直径无关。samples 为 None 时
+    房间数不超过 EXACT_BETWEENNESS_LIMIT 则精确计算，否则随机采样 DEFAULT_BETWEENNESS_SAMPLES
+    个源点并按比例放大。
+    """
+    if matrix is None:
+        matrix = adjacency_matrix(graph)
+    n = matrix.shape[0]
+    if n == 0:
+        return np.zeros(0)
+
+    if samples is None and n > EXACT_BETWEENNESS_LIMIT:
+        samples = DEFAULT_BETWEENNESS_SAMPLES
+    if samples is None or samples >= n:
+        sources = np.arange(n)
+    else:
+        sources = np.random.default_rng(seed).choice(n, size=samples, replace=False)
+
+    out_indptr, out_indices = matrix.indptr.astype(np.int64), matrix.indices.astype(np.int64)
+    reverse = matrix.T.tocsr()
+    in_indptr, in_indices = reverse.indptr.astype(np.int64), reverse.indices.astype(np.int64)
+    scores = np.zeros(n)
+    batch = max(1, BATCH_CELLS // n)
+
+    for start in range(0, len(sources), batch):
+        batch_sources = sources[start:start + batch]
+        k = len(batch_sources)
+        # (房间, 源点) 对编码为 room * k + column
+        sigma = np.zeros(n * k)
+        depth = np.full(n * k, -1, dtype=np.int32)
+        frontier = batch_sources.astype(np.int64) * k + np.arange(k)
+        sigma[frontier] = 1.0
+        depth[frontier] = 0
+        levels = [frontier]
+        # 去重用的暂存数组：同一 (房间, 源点) 只保留最后一次写入的下标，比排序去重快
+        last = np.empty(n * k, dtype=np.int64)
+
+        while True:
+            owner, targets = _expand(out_indptr, out_indices, frontier // k)
+            keys = targets * k + frontier[owner] % k
+            fresh = depth[keys] < 0
+            if not fresh.any():
+                break
+            keys, weights = keys[fresh], sigma[frontier[owner[fresh]]]
+            np.add.at(sigma, keys, weights)
+            positions = np.arange(len(keys))
+            last[keys] = positions
+            frontier = keys[last[keys] == positions]
+            depth[frontier] = len(levels)
+            levels.append(frontier)
+        del last
+
+        delta = np.zeros(n * k)
+        for level in range(len(levels) - 1, 0, -1):
+            at_level = levels[level]
+            coefficient = (1.0 + delta[at_level]) / sigma[at_level]
+            owner, predecessors = _expand(in_indptr, in_indices, at_level // k)
+            keys = predecessors * k + at_level[owner] % k
+            on_path = depth[keys] == level - 1
+            keys = keys[on_path]
+            np.add.at(delta, keys, sigma[keys] * coefficient[owner[on_path]])
+
+        delta[levels[0]] = 0.0
+        scores += delta.reshape(n, k).sum(axis=1)
+
+    if len(sources) < n:
+        scores *= n / len(sources)
+    return scores
+
+
+def articulation_points_and_bridges(graph: RoomGraph,
+                                    matrix: Optional[sparse.csr_matrix] = None) -> Tuple[List[int], List[Tuple[int, int]]]:
+    """在无向化的房间图上求割点与桥（迭代 DFS，O(V+E)）
+
+    割点被封锁后地图会断开；桥是唯一连接两片区域的通道。
+    """
+    if matrix is None:
+        matrix = adjacency_matrix(graph)
+    undirected = ((matrix + matrix.T) > 0).tocsr()
+    indptr = undirected.indptr.tolist()
+    indices = undirected.indices.tolist()
+    n = undirected.shape[0]
+
+    order = [-1] * n
+    low = [0] * n
+    parent = [-1] * n
+    is_articulation = [False] * n
+    bridges = []
+    counter = 0
+
+    for root in range(n):
+        if order[root] != -1:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        root_children = 0
+        stack = [(root, indptr[root])]
+        while stack:
+            node, pos = stack[-1]
+            if pos < indptr[node + 1]:
+                stack[-1] = (node, pos + 1)
+                neighbor = indices[pos]
+                if order[neighbor] == -1:
+                    parent[neighbor] = node
+                    order[neighbor] = low[neighbor] = counter
+                    counter += 1
+                    if node == root:
+                        root_children += 1
+                    stack.append((neighbor, indptr[neighbor]))
+                elif neighbor != parent[node] and order[neighbor] < low[node]:
+                    low[node] = order[neighbor]
+                continue
+
+            stack.pop()
+            up = parent[node]
+            if up == -1:
+                continue
+            if low[node] < low[up]:
+                low[up] = low[node]
+            if low[node] > order[up]:
+                bridges.append((up, node))
+            if up != root and low[node] >= order[up]:
+                is_articulation[up] = True
+
+        if root_children > 1:
+            is_articulation[root] = True
+
+    return [node for node in range(n) if is_articulation[node]], bridges
+
+
+def compute_metrics(graph: RoomGraph, samples: Optional[int] = None, seed: int = 0) -> Dict:
+    """一次性计算全部中心性指标，结果以房间 ID 表示"""
+    matrix = adjacency_matrix(graph)
+    degrees = degree_metrics(graph, matrix)
+    if samples is None and graph.room_count > EXACT_BETWEENNESS_LIMIT:
+        samples = DEFAULT_BETWEENNESS_SAMPLES
+    sampled = samples is not None and samples < graph.room_count
+    scores = betweenness(graph, matrix, samples, seed)
+    articulation, bridges = articulation_points_and_bridges(graph, matrix)
+    ids = graph.ids
+    ranking = np.argsort(-scores, kind='stable')
+    return {
+        'out_degree': {ids[node]: int(value) for node, value in enumerate(degrees['out_degree'])},
+        'in_degree': {ids[node]: int(value) for node, value in enumerate(degrees['in_degree'])},
+        'betweenness': {ids[node]: float(scores[node]) for node in range(graph.room_count)},
+        'top_betweenness': [(ids[node], float(scores[node])) for node in ranking[:20]],
+        'articulation_points': [ids[node] for node in articulation],
+        'bridge_exits': [(ids[u], ids[v]) for u, v in bridges],
+        'betweenness_sampled': sampled
+    }
+
+
+def print_metrics_report(metrics: Dict, room_info: Dict[str, Dict], limit: int = 10):
+    """打印咽喉要道报告"""
+    sampled = '（采样估计）' if metrics['betweenness_sampled'] else ''
+    print(f"\n咽喉要道 (介数中心性{sampled})")
+    print("-" * 40)
+    print("排名 房间名称 类型 介数 出度 入度")
+    print("-" * 60)
+    for i, (room_id, score) in enumerate(metrics['top_betweenness'][:limit], 1):
+        info = room_info.get(room_id, {})
+        room_name = info.get('name', room_id)
+        room_type = info.get('type', 'unknown')
+        print(f"{i:2d}. {room_name[:20]:20s} {room_type[:10]:10s} {score:10.1f} "
+              f"{metrics['out_degree'][room_id]:3d} {metrics['in_degree'][room_id]:3d}")
+
+    print(f"\n割点房间 ({len(metrics['articulation_points'])} 个，封锁后地图会断开):")
+    for room_id in metrics['articulation_points'][:limit]:
+        print(f"  - {room_info.get(room_id, {}).get('name', room_id)} ({room_id})")
+    if len(metrics['articulation_points']) > limit:
+        print(f"  ... 还有 {len(metrics['articulation_points']) - limit} 个")
+
+    print(f"\n桥出口 ({len(metrics['bridge_exits'])} 条，两片区域之间的唯一通道):")
+    for from_id, to_id in metrics['bridge_exits'][:limit]:
+        from_name = room_info.get(from_id, {}).get('name', from_id)
+        to_name = room_info.get(to_id, {}).get('name', to_id)
+        print(f"  {from_name} <-> {to_name}")
+    if len(metrics['bridge_exits']) > limit:
+        print(f"  ... 还有 {len(metrics['bridge_exits']) - limit} 条")
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='计算房间图的中心性指标')
+    parser.add_argument('maps_root', help='地图根目录，如 packages/server/data/maps')
+    parser.add_argument('--samples', type=int, help='介数中心性的采样源点数（默认小地图精确计算，大地图采样 256 个）')
+    parser.add_argument('--seed', type=int, default=0, help='采样随机种子')
+    parser.add_argument('--limit', type=int, default=10, help='每项显示的条目数')
+    parser.add_argument('--snapshot', metavar='PATH', help='从二进制地图快照加载，源文件变化时自动重新编译')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='并行解析地图文件的进程数，0 表示使用全部 CPU 核（默认 1）')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    map_files = discover_map_files(args.maps_root)
+    if args.snapshot:
+        with load_or_compile(map_files, args.snapshot, args.workers or None) as snapshot:
+            graph = snapshot.graph()
+            metrics = compute_metrics(graph, args.samples, args.seed)
+            print_metrics_report(metrics, SnapshotRoomInfo(snapshot, graph), args.limit)
+        return
+    world = load_world(map_files, args.workers or None)
+    for file_path, error in world.errors:
+        print(f"[ERROR] 无法加载文件 {file_path}: {error}")
+    for room_id, kept, duplicate in world.conflicts:
+        print(f"[WARNING] 房间ID冲突 {room_id}，保留 {kept}，忽略 {duplicate}")
+    graph = RoomGraph.from_records(world.rooms.values())
+    metrics = compute_metrics(graph, args.samples, args.seed)
+    room_info = {room_id: {'name': record.name, 'type': record.type} for room_id, record in world.rooms.items()}
+    print_metrics_report(metrics, room_info, args.limit)
+
+
+if __name__ == "__main__":
+    # 设置标准输出编码为UTF-8
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    main()
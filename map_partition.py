@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+房间图分服切分
+把房间划分到 k 个游戏服务器进程，在保持各分片负载均衡的前提下尽量减少跨分片出口。
+采用多层方法：先按位置/区域提示和重边匹配逐层粗化，在最粗的图上做贪心区域生长，
+再逐层投影回细图并做边界贪心迁移（FM 式）优化
+"""
+
+import argparse
+import heapq
+import io
+import json
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from map_graph import RoomGraph
+from map_loader import discover_map_files, load_world
+
+# 同一位置/区域内出口的权重放大系数，作为软分组提示
+LOCATION_HINT_BONUS = 1.5
+DISTRICT_HINT_BONUS = 1.2
+# 粗化到每个分片约这么多个节点时停止
+COARSEST_NODES_PER_PART = 15
+
+
+class _Level:
+    """一层（可能已粗化的）无向加权图"""
+
+    def __init__(self, node_weights: List[float], adjacency: List[Dict[int, float]], hints: List):
+        self.node_weights = node_weights
+        self.adjacency = adjacency
+        self.hints = hints
+
+    @property
+    def size(self) -> int:
+        return len(self.node_weights)
+
+
+def build_level(graph: RoomGraph, districts: Sequence[str], locations: Sequence[str],
+                traffic: Optional[Sequence[float]] = None) -> _Level:
+    """把有向出口图转换为无向加权图
+
+    出口权重为 1 加上两端房间的平均预期流量，同一位置或区域内的出口按提示系数放大。
+    traffic 为每个房间的预期流量（可选，如玩家流量模拟结果），同时作为节点负载。
+    """
+    n = graph.room_count
+    adjacency: List[Dict[int, float]] = [{} for _ in range(n)]
+    offsets = graph.offsets
+    targets = graph.targets
+    for node in range(n):
+        for pos in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[pos]
+            if neighbor >= n or neighbor == node:
+                continue
+            weight = 1.0
+            if traffic is not None:
+                weight += (traffic[node] + traffic[neighbor]) / 2
+            if locations[node] == locations[neighbor] and districts[node] == districts[neighbor]:
+                weight *= LOCATION_HINT_BONUS
+            elif districts[node] == districts[neighbor]:
+                weight *= DISTRICT_HINT_BONUS
+            adjacency[node][neighbor] = adjacency[node].get(neighbor, 0.0) + weight
+            adjacency[neighbor][node] = adjacency[neighbor].get(node, 0.0) + weight
+    node_weights = [1.0 + (traffic[node] if traffic is not None else 0.0) for node in range(n)]
+    hints = [(districts[node], locations[node]) for node in range(n)]
+    return _Level(node_weights, adjacency, hints)
+
+
+def _coarsen(level: _Level, max_node_weight: float) -> Tuple[_Level, List[int]]:
+    """重边匹配粗化，优先匹配同一位置的邻居，返回 (粗图, 细节点 -> 粗节点)"""
+    n = level.size
+    mapping = [-1] * n
+    # 从度数小的节点开始匹配，减少孤立未匹配节点
+    order = sorted(range(n), key=lambda node: (len(level.adjacency[node]), node))
+    coarse = 0
+    for node in order:
+        if mapping[node] != -1:
+            continue
+        best = -1
+        best_key = None
+        for neighbor, weight in level.adjacency[node].items():
+            if mapping[neighbor] != -1:
+                continue
+            if level.node_weights[node] + level.node_weights[neighbor] > max_node_weight:
+                continue
+            key = (level.hints[neighbor] == level.hints[node], weight, -neighbor)
+            if best_key is None or key > best_key:
+                best, best_key = neighbor, key
+        mapping[node] = coarse
+        if best != -1:
+            mapping[best] = coarse
+        coarse += 1
+
+    node_weights = [0.0] * coarse
+    adjacency: List[Dict[int, float]] = [{} for _ in range(coarse)]
+    hints = [None] * coarse
+    for node in range(n):
+        target = mapping[node]
+        node_weights[target] += level.node_weights[node]
+        if hints[target] is None:
+            hints[target] = level.hints[node]
+        elif hints[target] != level.hints[node]:
+            hints[target] = (level.hints[node][0], None) if hints[target][0] == level.hints[node][0] else (None, None)
+        for neighbor, weight in level.adjacency[node].items():
+            other = mapping[neighbor]
+            if other != target:
+                adjacency[target][other] = adjacency[target].get(other, 0.0) + weight
+    return _Level(node_weights, adjacency, hints), mapping
+
+
+def _grow_initial(level: _Level, k: int) -> List[int]:
+    """贪心区域生长：每个分片从最重的未分配节点出发，优先吸收与分片连接最强的节点"""
+    n = level.size
+    parts = [-1] * n
+    total = sum(level.node_weights)
+    remaining = n
+    for part in range(k):
+        if remaining == 0:
+            break
+        target = (total - sum(level.node_weights[i] for i in range(n) if parts[i] != -1)) / (k - part)
+        seed = max((node for node in range(n) if parts[node] == -1),
+                   key=lambda node: (level.node_weights[node], -node))
+        weight = 0.0
+        connection: Dict[int, float] = {}
+        heap = [(0.0, seed)]
+        while heap and (weight < target or part == k - 1):
+            _, node = heapq.heappop(heap)
+            if parts[node] != -1:
+                continue
+            if weight > 0 and weight + level.node_weights[node] > target * 1.05 and part != k - 1:
+                continue
+            parts[node] = part
+            weight += level.node_weights[node]
+            remaining -= 1
+            for neighbor, edge_weight in level.adjacency[node].items():
+                if parts[neighbor] == -1:
+                    connection[neighbor] = connection.get(neighbor, 0.0) + edge_weight
+                    heapq.heappush(heap, (-connection[neighbor], neighbor))
+            if not heap and remaining and (weight < target or part == k - 1):
+                # 当前连通块已耗尽，从下一个未分配节点继续
+                next_seed = next(i for i in range(n) if parts[i] == -1)
+                heapq.heappush(heap, (0.0, next_seed))
+    for node in range(n):
+        if parts[node] == -1:
+            parts[node] = k - 1
+    return parts
+
+
+def _refine(level: _Level, parts: List[int], k: int, max_part_weight: float, passes: int = 8):
+    """边界节点贪心迁移：增益为正且不破坏负载上限时把节点移到连接最强的相邻分片"""
+    part_weights = [0.0] * k
+    for node, part in enumerate(parts):
+        part_weights[part] += level.node_weights[node]
+
+    for _ in range(passes):
+        moved = 0
+        for node in range(level.size):
+            own = parts[node]
+            links: Dict[int, float] = {}
+            for neighbor, weight in level.adjacency[node].items():
+                links[parts[neighbor]] = links.get(parts[neighbor], 0.0) + weight
+            internal = links.get(own, 0.0)
+            best_part, best_gain = own, 0.0
+            for part, external in links.items():
+                if part == own:
+                    continue
+                gain = external - internal
+                if part_weights[part] + level.node_weights[node] > max_part_weight:
+                    continue
+                # 同等增益时倾向于把更重的分片减轻
+                if gain > best_gain or (gain == best_gain and gain >= 0 and best_part != own
+                                        and part_weights[part] < part_weights[best_part]):
+                    best_part, best_gain = part, gain
+            if best_part == own and part_weights[own] > max_part_weight:
+                # 超载分片向能容纳该节点的最轻相邻分片卸载，不能把超载转移到目标分片
+                candidates = [part for part in links if part != own
+                              and part_weights[part] + level.node_weights[node] <= max_part_weight]
+                if candidates:
+                    best_part = min(candidates, key=lambda part: part_weights[part])
+            if best_part != own:
+                parts[node] = best_part
+                part_weights[own] -= level.node_weights[node]
+                part_weights[best_part] += level.node_weights[node]
+                moved += 1
+        if not moved:
+            break
+
+
+def partition_rooms(graph: RoomGraph, districts: Sequence[str], locations: Sequence[str], k: int,
+                    imbalance: float = 0.05, traffic: Optional[Sequence[float]] = None) -> List[int]:
+    """把真实房间划分为 k 个分片，返回每个房间的分片编号"""
+    if k < 1:
+        raise ValueError("分片数必须大于 0")
+    finest = build_level(graph, districts, locations, traffic)
+    if k == 1 or finest.size == 0:
+        return [0] * finest.size
+
+    total = sum(finest.node_weights)
+    max_part_weight = total / k * (1 + imbalance)
+
+    levels = [finest]
+    mappings = []
+    while levels[-1].size > k * COARSEST_NODES_PER_PART:
+        coarse, mapping = _coarsen(levels[-1], max_part_weight / 4)
+        if coarse.size > levels[-1].size * 0.9:
+            break
+        levels.append(coarse)
+        mappings.append(mapping)
+
+    parts = _grow_initial(levels[-1], k)
+    _refine(levels[-1], parts, k, max_part_weight)
+    for level, mapping in zip(reversed(levels[:-1]), reversed(mappings)):
+        parts = [parts[mapping[node]] for node in range(level.size)]
+        _refine(level, parts, k, max_part_weight)
+    return parts
+
+
+def partition_stats(graph: RoomGraph, parts: Sequence[int], k: int,
+                    traffic: Optional[Sequence[float]] = None) -> Dict:
+    """跨分片出口数量与负载不均衡度"""
+    n = graph.room_count
+    offsets = graph.offsets
+    targets = graph.targets
+    cut_exits = 0
+    total_exits = 0
+    cut_pairs: Dict[Tuple[int, int], int] = {}
+    for node in range(n):
+        for pos in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[pos]
+            if neighbor >= n:
+                continue
+            total_exits += 1
+            if parts[node] != parts[neighbor]:
+                cut_exits += 1
+                pair = (parts[node], parts[neighbor])
+                cut_pairs[pair] = cut_pairs.get(pair, 0) + 1
+
+    loads = [0.0] * k
+    rooms = [0] * k
+    for node in range(n):
+        loads[parts[node]] += 1.0 + (traffic[node] if traffic is not None else 0.0)
+        rooms[parts[node]] += 1
+    average = sum(loads) / k if k else 0.0
+    return {
+        'shards': k,
+        'rooms_per_shard': rooms,
+        'load_per_shard': loads,
+        'imbalance': (max(loads) / average - 1.0) if average else 0.0,
+        'cut_exits': cut_exits,
+        'total_exits': total_exits,
+        'cut_ratio': cut_exits / total_exits if total_exits else 0.0,
+        'cut_exits_between_shards': {f"{a}->{b}": count for (a, b), count in sorted(cut_pairs.items())}
+    }
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='把房间图切分为 k 个均衡的服务器分片')
+    parser.add_argument('maps_root', help='地图根目录，如 packages/server/data/maps')
+    parser.add_argument('-k', '--shards', type=int, default=4, help='分片数量（默认 4）')
+    parser.add_argument('--imbalance', type=float, default=0.05, help='允许的负载不均衡比例（默认 0.05）')
+    parser.add_argument('--traffic', help='每个房间预期流量的 JSON 文件 {room_id: 数值}，用作负载与出口权重')
+    parser.add_argument('--output', default='room_shards.json', help='输出文件（默认 room_shards.json）')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='并行解析地图文件的进程数，0 表示使用全部 CPU 核（默认 1）')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    world = load_world(discover_map_files(args.maps_root), args.workers or None)
+    for file_path, error in world.errors:
+        print(f"[ERROR] 无法加载文件 {file_path}: {error}")
+    for room_id, kept, duplicate in world.conflicts:
+        print(f"[WARNING] 房间ID冲突 {room_id}，保留 {kept}，忽略 {duplicate}")
+    records = list(world.rooms.values())
+    graph = RoomGraph.from_records(records)
+
+    traffic = None
+    if args.traffic:
+        with open(args.traffic, 'r', encoding='utf-8') as f:
+            room_traffic = json.load(f)
+        traffic = [float(room_traffic.get(record.id, 0.0)) for record in records]
+
+    parts = partition_rooms(graph, [r.district for r in records], [r.location for r in records],
+                            args.shards, args.imbalance, traffic)
+    stats = partition_stats(graph, parts, args.shards, traffic)
+
+    print(f"房间数: {graph.room_count}，分片数: {args.shards}")
+    print(f"跨分片出口: {stats['cut_exits']}/{stats['total_exits']} ({stats['cut_ratio']:.1%})")
+    print(f"负载不均衡度: {stats['imbalance']:.1%}")
+    for shard in range(args.shards):
+        print(f"  分片 {shard}: {stats['rooms_per_shard'][shard]} 个房间，负载 {stats['load_per_shard'][shard]:.1f}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'room_shards': {record.id: parts[node] for node, record in enumerate(records)},
+            'stats': stats
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\n分片结果已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    # 设置标准输出编码为UTF-8
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    main()
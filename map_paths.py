@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+房间间移动距离与路径引擎
+在 RoomGraph 上提供单源 BFS 距离、多源 BFS（如每个房间最近的医馆/商店）、
+按目的地缓存的下一跳表，以及各区域的离心率与直径统计
+"""
+
+import argparse
+import io
+import sys
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from map_graph import RoomGraph
+from map_loader import discover_map_files, load_world
+from map_snapshot import load_or_compile
+
+UNREACHABLE = -1
+
+
+def bfs_distances(graph: RoomGraph, source: int) -> array:
+    """沿出口方向的单源 BFS 步数，不可达为 -1"""
+    distances, _ = multi_source_distances(graph, [source])
+    return distances
+
+
+def multi_source_distances(graph: RoomGraph, sources: Iterable[int]) -> Tuple[array, array]:
+    """多源 BFS，返回 (distances, nearest)
+
+    distances[node] 为从最近的源房间走到 node 的步数，nearest[node] 为该源房间，不可达均为 -1。
+    """
+    room_count = graph.room_count
+    offsets = graph.offsets
+    targets = graph.targets
+    distances = array('i', [UNREACHABLE]) * room_count
+    nearest = array('i', [UNREACHABLE]) * room_count
+
+    frontier = []
+    for source in sources:
+        if distances[source] == UNREACHABLE:
+            distances[source] = 0
+            nearest[source] = source
+            frontier.append(source)
+
+    head = 0
+    while head < len(frontier):
+        node = frontier[head]
+        head += 1
+        step = distances[node] + 1
+        for pos in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[pos]
+            if neighbor < room_count and distances[neighbor] == UNREACHABLE:
+                distances[neighbor] = step
+                nearest[neighbor] = nearest[node]
+                frontier.append(neighbor)
+    return distances, nearest
+
+
+def distances_to(graph: RoomGraph, destinations: Iterable[int]) -> Tuple[array, array]:
+    """反向多源 BFS：每个房间走到最近目的地的步数，以及沿最短路径的下一跳
+
+    返回 (distances, next_hop)，目的地自身的下一跳为自身，不可达为 -1。
+    适合“每个房间最近的医馆在哪、下一步往哪走”这类查询。
+    """
+    room_count = graph.room_count
+    in_offsets, in_sources = graph.reverse()
+    distances = array('i', [UNREACHABLE]) * room_count
+    next_hop = array('i', [UNREACHABLE]) * room_count
+
+    frontier = []
+    for destination in destinations:
+        if distances[destination] == UNREACHABLE:
+            distances[destination] = 0
+            next_hop[destination] = destination
+            frontier.append(destination)
+
+    head = 0
+    while head < len(frontier):
+        node = frontier[head]
+        head += 1
+        step = distances[node] + 1
+        for pos in range(in_offsets[node], in_offsets[node + 1]):
+            source = in_sources[pos]
+            if distances[source] == UNREACHABLE:
+                distances[source] = step
+                next_hop[source] = node
+                frontier.append(source)
+    return distances, next_hop
+
+
+class PathEngine:
+    """带下一跳表缓存的寻路引擎
+
+    每个目的地的下一跳表由一次反向 BFS 生成并按 LRU 缓存，
+    之后任意起点到该目的地的下一步与完整路线都只需查表。
+    """
+
+    def __init__(self, graph: RoomGraph, cache_size: int = 256):
+        self.graph = graph
+        self.cache_size = cache_size
+        self._tables: 'OrderedDict[int, Tuple[array, array]]' = OrderedDict()
+
+    def table(self, destination: int) -> Tuple[array, array]:
+        tables = self._tables
+        if destination in tables:
+            tables.move_to_end(destination)
+            return tables[destination]
+        table = distances_to(self.graph, [destination])
+        tables[destination] = table
+        if len(tables) > self.cache_size:
+            tables.popitem(last=False)
+        return table
+
+    def precompute(self, destinations: Iterable[int]):
+        """预先生成一批常用目的地的下一跳表（如城门、医馆、驿站）"""
+        for destination in destinations:
+            self.table(destination)
+
+    def distance(self, source: int, destination: int) -> int:
+        return self.table(destination)[0][source]
+
+    def next_hop(self, source: int, destination: int) -> int:
+        return self.table(destination)[1][source]
+
+    def route(self, source: int, destination: int) -> Optional[List[int]]:
+        """完整路线（含起点与终点），不可达时返回 None"""
+        _, next_hop = self.table(destination)
+        if next_hop[source] == UNREACHABLE:
+            return None
+        path = [source]
+        while path[-1] != destination:
+            path.append(next_hop[path[-1]])
+        return path
+
+    def route_exits(self, source: int, destination: int) -> Optional[List[str]]:
+        """路线对应的出口方向序列，可直接用于“前往”指令"""
+        path = self.route(source, destination)
+        if path is None:
+            return None
+        graph = self.graph
+        directions = []
+        for here, there in zip(path, path[1:]):
+            for target, code in graph.edges(here):
+                if target == there:
+                    directions.append(graph.directions[code])
+                    break
+        return directions
+
+
+def district_eccentricity(graph: RoomGraph, district_of: List[str]) -> Dict[str, Dict]:
+    """计算各区域内部（只走本区域房间）的离心率与直径
+
+    district_of[node] 为每个真实房间的区域名。对每个区域内的每个房间做一次受限 BFS，
+    复杂度为各区域 V_d * (V_d + E_d) 之和。不可达的房间对单独计数，不计入离心率。
+    """
+    members: Dict[str, List[int]] = {}
+    for node in range(graph.room_count):
+        members.setdefault(district_of[node], []).append(node)
+
+    offsets = graph.offsets
+    targets = graph.targets
+    room_count = graph.room_count
+    distances = array('i', [UNREACHABLE]) * room_count
+    results = {}
+
+    for district, rooms in members.items():
+        eccentricity = {}
+        unreachable_pairs = 0
+        for source in rooms:
+            distances[source] = 0
+            visited = [source]
+            head = 0
+            while head < len(visited):
+                node = visited[head]
+                head += 1
+                step = distances[node] + 1
+                for pos in range(offsets[node], offsets[node + 1]):
+                    neighbor = targets[pos]
+                    if (neighbor < room_count and distances[neighbor] == UNREACHABLE
+                            and district_of[neighbor] == district):
+                        distances[neighbor] = step
+                        visited.append(neighbor)
+            eccentricity[source] = distances[visited[-1]]
+            unreachable_pairs += len(rooms) - len(visited)
+            for node in visited:
+                distances[node] = UNREACHABLE
+
+        diameter = max(eccentricity.values())
+        radius = min(eccentricity.values())
+        results[district] = {
+            'rooms': len(rooms),
+            'diameter': diameter,
+            'radius': radius,
+            'center': [graph.ids[node] for node, value in eccentricity.items() if value == radius],
+            'unreachable_pairs': unreachable_pairs,
+            'eccentricity': {graph.ids[node]: value for node, value in eccentricity.items()}
+        }
+    return results
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='房间距离、最近设施与区域直径分析')
+    parser.add_argument('maps_root', help='地图根目录，如 packages/server/data/maps')
+    parser.add_argument('--nearest', metavar='TYPE', action='append', default=[],
+                        help='统计每个房间到最近的该类型房间（如 clinic、shop）的距离，可重复')
+    parser.add_argument('--route', nargs=2, metavar=('FROM', 'TO'), help='输出两个房间之间的最短路线')
+    parser.add_argument('--diameter', action='store_true',
+                        help='统计各区域的直径与半径（区域内逐房间 BFS，大区域耗时明显）')
+    parser.add_argument('--workers', type=int, default=1, help='并行解析的进程数，0 表示全部 CPU 核')
+    parser.add_argument('--snapshot', metavar='PATH', help='从二进制地图快照加载，源文件变化时自动重新编译')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    map_files = discover_map_files(args.maps_root)
+    if args.snapshot:
+        with load_or_compile(map_files, args.snapshot, args.workers or None) as snapshot:
+            graph = snapshot.graph()
+            room_types = [snapshot.room_type(node) for node in range(graph.room_count)]
+            districts = [snapshot.room_district(node) for node in range(graph.room_count)]
+    else:
+        records = list(load_world(map_files, args.workers or None).rooms.values())
+        graph = RoomGraph.from_records(records)
+        room_types = [record.type for record in records]
+        districts = [record.district for record in records]
+    print(f"加载了 {graph.room_count} 个房间，{graph.edge_count} 个出口")
+
+    if args.route:
+        source, destination = (graph.index.get(room_id) for room_id in args.route)
+        if source is None or destination is None or not graph.is_room(source) or not graph.is_room(destination):
+            print("错误：起点或终点房间不存在")
+        else:
+            engine = PathEngine(graph)
+            directions = engine.route_exits(source, destination)
+            if directions is None:
+                print(f"{args.route[0]} 无法到达 {args.route[1]}")
+            else:
+                path = engine.route(source, destination)
+                print(f"\n路线 ({len(directions)} 步): {' -> '.join(graph.ids[node] for node in path)}")
+                print(f"方向: {' '.join(directions)}")
+
+    for room_type in args.nearest:
+        sources = [node for node, node_type in enumerate(room_types) if node_type == room_type]
+        print(f"\n最近的 {room_type} 类型房间 ({len(sources)} 个):")
+        if not sources:
+            continue
+        distances, _ = distances_to(graph, sources)
+        reachable = [d for d in distances if d != UNREACHABLE]
+        print(f"  可到达的房间: {len(reachable)}/{graph.room_count}")
+        if reachable:
+            print(f"  平均步数: {sum(reachable) / len(reachable):.2f}，最远: {max(reachable)}")
+
+    if args.diameter:
+        print("\n区域直径:")
+        print(f"{'区域':20s} {'房间':>5s} {'直径':>5s} {'半径':>5s} {'不可达对':>8s}")
+        stats = district_eccentricity(graph, districts)
+        for district, info in sorted(stats.items(), key=lambda x: x[1]['diameter'], reverse=True):
+            print(f"{district:20s} {info['rooms']:5d} {info['diameter']:5d} {info['radius']:5d} "
+                  f"{info['unreachable_pairs']:8d}")
+
+
+if __name__ == "__main__":
+    # 设置标准输出编码为UTF-8
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析流程的分阶段计时与内存统计
+PhaseRecorder 记录每个阶段的耗时、tracemalloc 峰值内存与处理的房间/出口数量，
+阶段可以嵌套，结果可直接写入分析结果 JSON；另提供可选的 cProfile 整体剖析
+"""
+
+import cProfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+
+class PhaseRecorder:
+    """分阶段记录器
+
+    trace_memory 为 True 时启用 tracemalloc 统计每个阶段的峰值内存（会明显拖慢运行），
+    否则只记录耗时与数量。嵌套阶段的名称以 '父阶段/子阶段' 表示。
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.phases: List[Dict] = []
+        self._stack: List[Dict] = []
+        self._started_tracing = False
+
+    @contextmanager
+    def phase(self, name: str, **counts) -> Iterator[Dict]:
+        """计时一个阶段，产出的字典用于在阶段内补充数量（如 record['rooms'] = n）"""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        parent = self._stack[-1] if self._stack else None
+        record = {'name': f"{parent['name']}/{name}" if parent else name, **counts}
+        self.phases.append(record)
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent['_peak'] = max(parent['_peak'], peak)
+            tracemalloc.reset_peak()
+            record['_start_memory'] = current
+            record['_peak'] = current
+        self._stack.append(record)
+
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - started
+            self._stack.pop()
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                peak = max(record.pop('_peak'), peak)
+                record['peak_memory_bytes'] = peak
+                record['memory_growth_bytes'] = peak - record.pop('_start_memory')
+                if parent is not None:
+                    parent['_peak'] = max(parent['_peak'], peak)
+
+    def stop(self):
+        """停止由记录器启动的 tracemalloc"""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def to_dict(self) -> Dict:
+        return {'trace_memory': self.trace_memory, 'phases': self.phases}
+
+    def print_summary(self):
+        """打印各阶段耗时与峰值内存"""
+        print(f"\n分阶段耗时{'与峰值内存' if self.trace_memory else ''}")
+        print("-" * 40)
+        for record in self.phases:
+            depth = record['name'].count('/')
+            label = '  ' * depth + record['name'].rsplit('/', 1)[-1]
+            line = f"{label:28s} {record['seconds'] * 1000:10.1f} ms"
+            if 'peak_memory_bytes' in record:
+                line += f" {record['peak_memory_bytes'] / 1024 / 1024:9.1f} MB"
+            counts = ', '.join(f"{key}={value}" for key, value in record.items()
+                               if key not in ('name', 'seconds', 'peak_memory_bytes', 'memory_growth_bytes'))
+            if counts:
+                line += f"  ({counts})"
+            print(line)
+
+
+class _NullRecorder:
+    """不记录任何内容的占位记录器，未启用统计时使用"""
+
+    @contextmanager
+    def phase(self, name: str, **counts) -> Iterator[Dict]:
+        yield {}
+
+
+NULL_RECORDER = _NullRecorder()
+
+
+@contextmanager
+def cprofile_to(path: Optional[str]) -> Iterator[Optional[cProfile.Profile]]:
+    """path 不为空时用 cProfile 剖析代码块并把统计数据写入 path（可用 pstats/snakeviz 查看）"""
+    if not path:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+带二级索引的房间查询
+加载时一次性建立区域、位置、类型的哈希索引，名称与描述的字符 n-gram 索引，
+名称前缀的有序索引以及跨区域出口索引，之后每次查询只访问相关的倒排表。
+既可作为 API 使用，也提供交互式命令行:
+
+    find district=东城区 type=shop name=广场
+    exits 皇城区 [东城区]
+    room tj_palace_square
+"""
+
+import argparse
+import io
+import shlex
+import sys
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from map_loader import RoomRecord, discover_map_files, load_world
+
+FIND_FILTERS = ('district', 'location', 'type', 'name', 'prefix', 'text')
+
+
+class CrossExit(NamedTuple):
+    """跨区域出口"""
+    room: str
+    direction: str
+    target: str
+    from_district: str
+    to_district: str
+
+
+def _grams(text: str) -> Iterable[str]:
+    """查询用的 n-gram：单字查询用单字，否则用全部相邻二字组"""
+    if len(text) < 2:
+        return [text]
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class _NgramIndex:
+    """字符一元组与二元组倒排索引
+
+    查询只取查询串各 n-gram 中最短的倒排表作为候选，再对候选做子串校验，
+    代价与最罕见的 n-gram 出现次数成正比，不需要对常见字组的大表求交集。
+    """
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.postings: Dict[str, List[int]] = {}
+        for node, text in enumerate(texts):
+            grams = set(text)
+            grams.update(text[i:i + 2] for i in range(len(text) - 1))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(node)
+
+    def candidates(self, query: str) -> List[int]:
+        """包含查询串全部 n-gram 的房间的超集（升序）"""
+        shortest = None
+        for gram in _grams(query):
+            posting = self.postings.get(gram)
+            if posting is None:
+                return []
+            if shortest is None or len(posting) < len(shortest):
+                shortest = posting
+        return shortest
+
+
+class RoomIndex:
+    """房间二级索引，节点编号为房间在 records 中的顺序"""
+
+    def __init__(self, records: Dict[str, RoomRecord]):
+        self.records: List[RoomRecord] = list(records.values())
+        self.node_of: Dict[str, int] = {record.id: node for node, record in enumerate(self.records)}
+        self.by_district: Dict[str, List[int]] = {}
+        self.by_location: Dict[str, List[int]] = {}
+        self.by_type: Dict[str, List[int]] = {}
+        # (来源区域, 目标区域) -> [(房间节点, 出口序号)]
+        self.cross_exits: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+
+        for node, record in enumerate(self.records):
+            self.by_district.setdefault(record.district, []).append(node)
+            self.by_location.setdefault(record.location, []).append(node)
+            self.by_type.setdefault(record.type, []).append(node)
+
+        node_of = self.node_of
+        records_list = self.records
+        for node, record in enumerate(records_list):
+            for ordinal, (_, target, _) in enumerate(record.exits):
+                target_node = node_of.get(target)
+                if target_node is not None and records_list[target_node].district != record.district:
+                    key = (record.district, records_list[target_node].district)
+                    self.cross_exits.setdefault(key, []).append((node, ordinal))
+
+        names = [record.name.lower() for record in self.records]
+        self.names = _NgramIndex(names)
+        self.sorted_names = sorted((name, node) for node, name in enumerate(names))
+        self._descriptions: Optional[_NgramIndex] = None
+
+    @property
+    def descriptions(self) -> _NgramIndex:
+        """描述的 n-gram 索引体积较大，首次按描述查询时才建立"""
+        if self._descriptions is None:
+            self._descriptions = _NgramIndex([record.description.lower() for record in self.records])
+        return self._descriptions
+
+    def _prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """名称以 prefix 开头的房间在 sorted_names 中的区间，两次二分即可得到匹配数量"""
+        names = self.sorted_names
+        # 上界为比所有以 prefix 开头的字符串都大的最小字符串：去掉末尾的最大码位后把最后一个字符加一
+        upper = prefix.rstrip('\U0010ffff')
+        if not upper:
+            return bisect_left(names, (prefix, -1)), len(names)
+        upper = upper[:-1] + chr(ord(upper[-1]) + 1)
+        return bisect_left(names, (prefix, -1)), bisect_left(names, (upper, -1))
+
+    def find(self, district: Optional[str] = None, location: Optional[str] = None, type: Optional[str] = None,
+             name: Optional[str] = None, prefix: Optional[str] = None, text: Optional[str] = None,
+             limit: Optional[int] = None) -> List[RoomRecord]:
+        """按条件查询房间，所有条件同时满足；name/text 为名称/描述子串，prefix 为名称前缀
+
+        从各条件的倒排表中选出最短的一个作为候选，其余条件直接在候选房间上校验。
+        """
+        name = name.lower() if name is not None else None
+        prefix = prefix.lower() if prefix is not None else None
+        text = text.lower() if text is not None else None
+
+        lists = []
+        for value, index in ((district, self.by_district), (location, self.by_location), (type, self.by_type)):
+            if value is not None:
+                lists.append(index.get(value, []))
+        if name is not None:
+            lists.append(self.names.candidates(name))
+        if text is not None:
+            lists.append(self.descriptions.candidates(text))
+        nodes = min(lists, key=len) if lists else range(len(self.records))
+        if prefix is not None:
+            lo, hi = self._prefix_range(prefix)
+            if hi - lo < len(nodes):
+                nodes = sorted(node for _, node in self.sorted_names[lo:hi])
+
+        records = self.records
+        names = self.names.texts
+        descriptions = self.descriptions.texts if text is not None else None
+        result = []
+        for node in nodes:
+            record = records[node]
+            if ((district is None or record.district == district)
+                    and (location is None or record.location == location)
+                    and (type is None or record.type == type)
+                    and (name is None or name in names[node])
+                    and (prefix is None or names[node].startswith(prefix))
+                    and (text is None or text in descriptions[node])):
+                result.append(record)
+                if limit is not None and len(result) >= limit:
+                    break
+        return result
+
+    def exits_leaving(self, district: str, to_district: Optional[str] = None) -> List[CrossExit]:
+        """离开 district 的出口，to_district 不为空时只返回通往该区域的出口"""
+        keys = [(district, to_district)] if to_district is not None else \
+            [key for key in self.cross_exits if key[0] == district]
+        result = []
+        for key in keys:
+            for node, ordinal in self.cross_exits.get(key, []):
+                record = self.records[node]
+                direction, target, _ = record.exits[ordinal]
+                result.append(CrossExit(record.id, direction, target, key[0], key[1]))
+        return result
+
+    def room(self, room_id: str) -> Optional[RoomRecord]:
+        node = self.node_of.get(room_id)
+        return None if node is None else self.records[node]
+
+
+def _print_rooms(rooms: List[RoomRecord]):
+    for record in rooms:
+        print(f"  {record.id:32s} {record.name}  [{record.type}] {record.district}/{record.location}")
+
+
+def run_command(index: RoomIndex, line: str, limit: int = 20) -> bool:
+    """执行一条查询命令，返回 False 表示退出"""
+    try:
+        words = shlex.split(line)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return True
+    if not words:
+        return True
+    command, args = words[0], words[1:]
+
+    started = time.perf_counter()
+    if command in ('quit', 'exit'):
+        return False
+    if command == 'find':
+        filters = {}
+        for arg in args:
+            key, _, value = arg.partition('=')
+            if key not in FIND_FILTERS or not value:
+                print(f"[ERROR] 无效条件 {arg}，可用条件: {', '.join(FIND_FILTERS)}")
+                return True
+            filters[key] = value
+        rooms = index.find(**filters)
+        elapsed = time.perf_counter() - started
+        _print_rooms(rooms[:limit])
+        total = len(rooms)
+    elif command == 'exits' and 1 <= len(args) <= 2:
+        exits = index.exits_leaving(*args)
+        elapsed = time.perf_counter() - started
+        for item in exits[:limit]:
+            print(f"  {item.room} --{item.direction}--> {item.target}  ({item.from_district} -> {item.to_district})")
+        total = len(exits)
+    elif command == 'room' and len(args) == 1:
+        record = index.room(args[0])
+        elapsed = time.perf_counter() - started
+        if record is None:
+            print(f"[ERROR] 房间不存在: {args[0]}")
+            return True
+        _print_rooms([record])
+        print(f"  {record.description}")
+        for direction, target, description in record.exits:
+            print(f"    {direction:10s} -> {target}  {description}")
+        return True
+    elif command == 'stats':
+        for title, groups in (('区域', index.by_district), ('类型', index.by_type)):
+            print(f"{title}:")
+            for key, nodes in sorted(groups.items(), key=lambda item: -len(item[1])):
+                print(f"  {key}: {len(nodes)}")
+        return True
+    else:
+        print("命令: find [district=.. location=.. type=.. name=.. prefix=.. text=..] | "
+              "exits <区域> [目标区域] | room <房间ID> | stats | quit")
+        return True
+
+    if total > limit:
+        print(f"  ... 还有 {total - limit} 个")
+    print(f"共 {total} 条，查询耗时 {elapsed * 1e6:.1f} µs")
+    return True
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='按区域、位置、类型与名称查询房间')
+    parser.add_argument('maps_root', help='地图根目录，如 packages/server/data/maps')
+    parser.add_argument('-c', '--command', action='append',
+                        help='执行查询命令后退出，可重复指定；不指定时进入交互模式')
+    parser.add_argument('--limit', type=int, default=20, help='每次查询显示的条目数（默认 20）')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='并行解析地图文件的进程数，0 表示使用全部 CPU 核（默认 1）')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    started = time.perf_counter()
+    world = load_world(discover_map_files(args.maps_root), args.workers or None)
+    for file_path, error in world.errors:
+        print(f"[ERROR] 无法加载文件 {file_path}: {error}")
+    for room_id, kept, duplicate in world.conflicts:
+        print(f"[WARNING] 房间ID冲突 {room_id}，保留 {kept}，忽略 {duplicate}")
+    index = RoomIndex(world.rooms)
+    print(f"已加载 {len(index.records)} 个房间并建立索引，用时 {time.perf_counter() - started:.2f} s")
+
+    if args.command:
+        for line in args.command:
+            print(f"> {line}")
+            run_command(index, line, args.limit)
+        return
+
+    try:
+        import readline  # noqa: F401  交互模式下提供历史记录与行编辑
+    except ImportError:
+        pass
+    while True:
+        try:
+            line = input('map> ')
+        except (EOFError, KeyboardInterrupt):
+            print()
+            break
+        if not run_command(index, line, args.limit):
+            break
+
+
+if __name__ == "__main__":
+    # 设置标准输出编码为UTF-8
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    main()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量修复缺失的反向出口
+一次遍历整个世界，按反向方向表为每个没有返回出口的连接生成反向出口；
+反向方向已被其他出口占用、多个房间争用同一方向或方向没有反向时记为冲突，不自动修复。
+修复以最小的原地文本插入写回原始地图分卷，其余内容（缩进、换行、字段顺序）保持不变
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import sys
+from json.decoder import scanstring
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from map_graph import OPPOSITE_DIRECTIONS, RoomGraph
+from map_loader import RoomRecord, discover_map_files, load_world
+from map_rules import NoReverseRule, RuleEngine
+
+# 生成出口描述用的方向名称，描述形如 "北面是内廷"
+DIRECTION_NAMES = {
+    'north': '北', 'south': '南', 'east': '东', 'west': '西',
+    'northeast': '东北', 'northwest': '西北', 'southeast': '东南', 'southwest': '西南',
+    'up': '上', 'down': '下', 'in': '里', 'out': '外'
+}
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+class Repair(NamedTuple):
+    """在 room 中添加 direction -> target 的出口"""
+    room: str
+    direction: str
+    target: str
+    description: str
+    source: str
+
+
+class Conflict(NamedTuple):
+    """无法自动修复的缺失反向出口 from_room --direction--> to_room
+
+    kind: direction_taken（to_room 的反向方向已指向 existing）、
+    competing（多个房间需要 to_room 的同一反向方向）、unknown_direction（方向没有反向）。
+    """
+    kind: str
+    from_room: str
+    direction: str
+    to_room: str
+    existing: Optional[str]
+
+
+def exit_description(direction: str, target: RoomRecord) -> str:
+    return f"{DIRECTION_NAMES.get(direction, direction)}面是{target.name}"
+
+
+def plan_repairs(records: Dict[str, RoomRecord]) -> Tuple[List[Repair], List[Conflict]]:
+    """找出所有缺失的反向出口，返回 (可修复的出口, 冲突)
+
+    缺失反向出口的判定与连通性分析的 no_reverse 规则一致：目标房间没有任何指向来源房间的出口。
+    """
+    graph = RoomGraph.from_records(records.values())
+    missing = RuleEngine([NoReverseRule()]).run(graph, exits_of=lambda room_id: records[room_id].exits)
+
+    conflicts = []
+    # (需要添加出口的房间, 方向) -> 提出该出口的来源房间
+    wanted: Dict[Tuple[str, str], List[str]] = {}
+    for issue in missing:
+        from_room, to_room, direction = issue.room, issue.target, issue.direction
+        opposite = OPPOSITE_DIRECTIONS.get(direction)
+        if opposite is None:
+            conflicts.append(Conflict('unknown_direction', from_room, direction, to_room, None))
+            continue
+        existing = next((target for exit_direction, target, _ in records[to_room].exits
+                         if exit_direction == opposite), None)
+        if existing is not None:
+            conflicts.append(Conflict('direction_taken', from_room, direction, to_room, existing))
+            continue
+        wanted.setdefault((to_room, opposite), []).append(from_room)
+
+    repairs = []
+    for (room_id, direction), from_rooms in wanted.items():
+        if len(from_rooms) > 1:
+            conflicts.extend(Conflict('competing', from_room, OPPOSITE_DIRECTIONS[direction], room_id, None)
+                             for from_room in from_rooms)
+            continue
+        target = records[from_rooms[0]]
+        repairs.append(Repair(room_id, direction, target.id, exit_description(direction, target),
+                              records[room_id].source))
+    return repairs, conflicts
+
+
+class _ExitsSpan(NamedTuple):
+    """房间对象在原始文本中的位置
+
+    exits 为 None 表示房间没有 exits 字段；否则 exits 为 '[' 的位置，elements 为已有出口的 (起, 止)。
+    member_start 为房间第一个字段键的位置，close 为房间对象 '}' 的位置。
+    """
+    exits: Optional[int]
+    exits_close: Optional[int]
+    elements: List[Tuple[int, int]]
+    member_start: Optional[int]
+    close: int
+
+
+def _skip(text: str, pos: int) -> int:
+    return _WHITESPACE.match(text, pos).end()
+
+
+# 与 map_loader 相同的层级：districts -> locations -> rooms，其余值整体跳过
+_NESTED_KEYS = {None: 'districts', 'districts': 'locations', 'locations': 'rooms'}
+
+
+def _skip_value(text: str, pos: int) -> int:
+    return _decoder.raw_decode(text, pos)[1]
+
+
+def _scan(text: str, pos: int, level: Optional[str], on_room: Callable[[str, _ExitsSpan], None]) -> int:
+    """扫描 pos 处 level 层级的对象（None 为文件顶层）并返回其结束位置，对每个房间对象回调 on_room"""
+    is_room = level == 'rooms'
+    nested = _NESTED_KEYS.get(level)
+    room_id = None
+    exits = exits_close = member_start = None
+    elements: List[Tuple[int, int]] = []
+    pos = _skip(text, pos + 1)
+    if text[pos] != '}':
+        while True:
+            if member_start is None:
+                member_start = pos
+            member, pos = scanstring(text, pos + 1)
+            pos = _skip(text, _skip(text, pos) + 1)  # ':'
+            if member == nested and text[pos] == '[':
+                pos = _skip(text, pos + 1)
+                while text[pos] != ']':
+                    pos = _skip(text, _scan(text, pos, member, on_room) if text[pos] == '{'
+                                else _skip_value(text, pos))
+                    if text[pos] == ',':
+                        pos = _skip(text, pos + 1)
+                end = pos + 1
+            elif is_room and member == 'exits' and text[pos] == '[':
+                exits = pos
+                pos = _skip(text, pos + 1)
+                while text[pos] != ']':
+                    end = _skip_value(text, pos)
+                    elements.append((pos, end))
+                    pos = _skip(text, end)
+                    if text[pos] == ',':
+                        pos = _skip(text, pos + 1)
+                exits_close = pos
+                end = pos + 1
+            elif is_room and member == 'id' and text[pos] == '"':
+                room_id, end = scanstring(text, pos + 1)
+            else:
+                end = _skip_value(text, pos)
+            pos = _skip(text, end)
+            if text[pos] == '}':
+                break
+            pos = _skip(text, pos + 1)  # ','
+    if is_room and room_id is not None:
+        on_room(room_id, _ExitsSpan(exits, exits_close, elements, member_start, pos))
+    return pos + 1
+
+
+def _line_indent(text: str, pos: int) -> Optional[str]:
+    """pos 所在行的缩进；pos 前面同一行还有其他内容时返回 None"""
+    start = pos
+    while start > 0 and text[start - 1] in ' \t':
+        start -= 1
+    if start == 0 or text[start - 1] == '\n':
+        return text[start:pos]
+    return None
+
+
+def _indent_unit(text: str) -> str:
+    match = re.search(r'\n([ \t]+)\S', text)
+    return match.group(1) if match else '  '
+
+
+def _render_exit(exit_info: Dict, indent: str, unit: Optional[str], newline: str) -> str:
+    """按已有出口的风格渲染一个出口对象，unit 为 None 时渲染为单行"""
+    if unit is None:
+        return json.dumps(exit_info, ensure_ascii=False)
+    rendered = json.dumps(exit_info, ensure_ascii=False, indent=unit)
+    return rendered.replace('\n', newline + indent)
+
+
+def _insertion(text: str, span: _ExitsSpan, new_exits: List[Dict], unit: str, newline: str) -> Tuple[int, int, str]:
+    """计算在房间出口数组末尾追加 new_exits 的文本编辑 (起, 止, 替换文本)"""
+    if span.elements:
+        first_start, first_end = span.elements[0]
+        indent = _line_indent(text, first_start)
+        if indent is None:
+            # 出口写在同一行：[{...}, {...}]
+            separator = ', '
+            element_unit = None
+        else:
+            separator = ',' + newline + indent
+            element = text[first_start:first_end]
+            element_unit = None
+            if '\n' in element:
+                key_indent = _line_indent(text, text.index('"', first_start))
+                element_unit = key_indent[len(indent):] if key_indent is not None else unit
+        rendered = ''.join(separator + _render_exit(exit_info, indent or '', element_unit, newline)
+                           for exit_info in new_exits)
+        last_end = span.elements[-1][1]
+        return last_end, last_end, rendered
+
+    if span.exits is not None:
+        # 空数组 []：按 exits 键所在行的缩进展开
+        key_indent = _line_indent(text, text.rfind('"exits"', 0, span.exits))
+        if key_indent is None:
+            return span.exits, span.exits_close + 1, \
+                '[' + ', '.join(json.dumps(exit_info, ensure_ascii=False) for exit_info in new_exits) + ']'
+        indent = key_indent + unit
+        body = (',' + newline + indent).join(_render_exit(exit_info, indent, unit, newline) for exit_info in new_exits)
+        return span.exits, span.exits_close + 1, '[' + newline + indent + body + newline + key_indent + ']'
+
+    # 房间没有 exits 字段：追加到最后一个字段之后
+    member_indent = _line_indent(text, span.member_start) if span.member_start is not None else None
+    if member_indent is None:
+        member_indent = ''
+        separator = ', '
+        array = '[' + ', '.join(json.dumps(exit_info, ensure_ascii=False) for exit_info in new_exits) + ']'
+    else:
+        separator = ',' + newline + member_indent
+        indent = member_indent + unit
+        body = (',' + newline + indent).join(_render_exit(exit_info, indent, unit, newline) for exit_info in new_exits)
+        array = '[' + newline + indent + body + newline + member_indent + ']'
+    last = span.close
+    while text[last - 1] in ' \t\r\n':
+        last -= 1
+    return last, last, separator + '"exits": ' + array
+
+
+def _expected_data(text: str, additions: Dict[str, List[Dict]]) -> Dict:
+    data = json.loads(text.lstrip('\ufeff'))
+    for district in data.get('districts', []):
+        for location in district.get('locations', []):
+            for room in location.get('rooms', []):
+                if room.get('id') in additions:
+                    room.setdefault('exits', []).extend(additions[room['id']])
+    return data
+
+
+def rewrite_file(file_path: str, repairs: List[Repair], dry_run: bool = False) -> int:
+    """把同一文件中的修复以原地插入写回，返回实际添加的出口数
+
+    写入前会重新解析修改后的文本并与预期结构比较，不一致时抛出 ValueError 且不修改文件。
+    """
+    with open(file_path, 'r', encoding='utf-8', newline='') as f:
+        original = f.read()
+
+    additions: Dict[str, List[Dict]] = {}
+    for repair in repairs:
+        additions.setdefault(repair.room, []).append(
+            {'direction': repair.direction, 'targetRoomId': repair.target, 'description': repair.description})
+
+    spans: Dict[str, _ExitsSpan] = {}
+
+    def on_room(room_id: str, span: _ExitsSpan):
+        if room_id in additions:
+            spans.setdefault(room_id, span)
+
+    _scan(original, _skip(original, 1 if original.startswith('\ufeff') else 0), None, on_room)
+
+    newline = '\r\n' if '\r\n' in original else '\n'
+    unit = _indent_unit(original)
+    edits = sorted(_insertion(original, spans[room_id], additions[room_id], unit, newline) for room_id in spans)
+    pieces = []
+    pos = 0
+    for start, end, replacement in edits:
+        pieces.append(original[pos:start])
+        pieces.append(replacement)
+        pos = end
+    pieces.append(original[pos:])
+    text = ''.join(pieces)
+
+    if json.loads(text.lstrip('\ufeff')) != _expected_data(original, {room_id: additions[room_id] for room_id in spans}):
+        raise ValueError(f"修改后的内容与预期不一致，未写入: {file_path}")
+
+    if not dry_run and edits:
+        temp_path = file_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        os.replace(temp_path, file_path)
+    return sum(len(additions[room_id]) for room_id in spans)
+
+
+def apply_repairs(repairs: List[Repair], dry_run: bool = False) -> Dict[str, int]:
+    """按文件分组写回全部修复，返回 {文件: 添加的出口数}"""
+    by_file: Dict[str, List[Repair]] = {}
+    for repair in repairs:
+        by_file.setdefault(repair.source, []).append(repair)
+    return {file_path: rewrite_file(file_path, file_repairs, dry_run)
+            for file_path, file_repairs in sorted(by_file.items())}
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='批量补全缺失的反向出口并原地写回地图文件')
+    parser.add_argument('maps_root', help='地图根目录，如 packages/server/data/maps')
+    parser.add_argument('--apply', action='store_true', help='写回地图文件（默认只显示修复计划）')
+    parser.add_argument('--limit', type=int, default=20, help='显示的修复与冲突条目数，0 表示全部（默认 20）')
+    parser.add_argument('--output', help='把修复计划与冲突保存为 JSON')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='并行解析地图文件的进程数，0 表示使用全部 CPU 核（默认 1）')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    world = load_world(discover_map_files(args.maps_root), args.workers or None)
+    for file_path, error in world.errors:
+        print(f"[ERROR] 无法加载文件 {file_path}: {error}")
+    for room_id, kept, duplicate in world.conflicts:
+        print(f"[WARNING] 房间ID冲突 {room_id}，保留 {kept}，忽略 {duplicate}")
+    if world.errors:
+        return 1
+
+    records = world.rooms
+    repairs, conflicts = plan_repairs(records)
+    limit = args.limit or None
+
+    print(f"房间数: {len(records)}，可修复的缺失反向出口: {len(repairs)}，冲突: {len(conflicts)}")
+    for repair in repairs[:limit]:
+        print(f"  + {records[repair.room].name} ({repair.room}) --{repair.direction}--> "
+              f"{records[repair.target].name} ({repair.target})  \"{repair.description}\"")
+    if limit and len(repairs) > limit:
+        print(f"  ... 还有 {len(repairs) - limit} 个")
+
+    if conflicts:
+        print("\n[WARNING] 需要人工处理的冲突:")
+        for conflict in conflicts[:limit]:
+            line = f"  {conflict.kind}: {conflict.from_room} --{conflict.direction}--> {conflict.to_room}"
+            if conflict.existing:
+                line += f"（{conflict.to_room} 的反向方向已指向 {conflict.existing}）"
+            print(line)
+        if limit and len(conflicts) > limit:
+            print(f"  ... 还有 {len(conflicts) - limit} 个")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'repairs': [repair._asdict() for repair in repairs],
+                       'conflicts': [conflict._asdict() for conflict in conflicts]}, f, ensure_ascii=False, indent=2)
+        print(f"\n修复计划已保存到: {args.output}")
+
+    written = apply_repairs(repairs, dry_run=not args.apply)
+    if args.apply:
+        for file_path, count in written.items():
+            print(f"[OK] {file_path}: 添加 {count} 个出口")
+    elif repairs:
+        print("\n未写入文件，使用 --apply 写回地图文件")
+    return 0
+
+
+if __name__ == "__main__":
+    # 设置标准输出编码为UTF-8
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.exit(main())
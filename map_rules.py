@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可插拔的地图校验规则引擎
+每条规则注册房间级和出口级访问函数，引擎在 RoomGraph 上只做一次融合遍历，
+依次调用所有规则的访问函数，输出带类型的问题记录。新增检查不会增加遍历次数
+"""
+
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from check_coordinates import Point, exit_mismatch
+from map_graph import RoomGraph
+
+# 预期的房间总数
+EXPECTED_ROOM_COUNT = 140
+
+ExitsOf = Callable[[str], Iterable[Tuple[str, str, str]]]
+IssueSink = Callable[['Issue'], None]
+
+
+class Issue(NamedTuple):
+    """一条校验问题
+
+    rule 为产生问题的规则名，room/target/direction 在与房间或出口无关时为 None，
+    detail 保存规则特有的附加信息（如坐标差、出口描述）。
+    """
+    rule: str
+    severity: str
+    room: Optional[str]
+    target: Optional[str]
+    direction: Optional[str]
+    detail: Dict
+
+
+class RuleContext:
+    """一次遍历中所有规则共享的只读数据与问题收集
+
+    sink 不为空时每条问题产生后立即交给 sink（如流式写出）；keep 为 False 时不在内存中保留问题，
+    只按规则计数，内存占用与问题数量无关。
+    """
+
+    def __init__(self, graph: RoomGraph, exits_of: Optional[ExitsOf] = None,
+                 points: Optional[Sequence[Optional[Point]]] = None,
+                 sink: Optional[IssueSink] = None, keep: bool = True):
+        self.graph = graph
+        self.ids = graph.ids
+        self.directions = graph.directions
+        self.exits_of = exits_of
+        self.points = points
+        self.sink = sink
+        self.keep = keep
+        self.issues: List[Issue] = []
+        self.counts = Counter()
+
+    def report(self, rule: str, severity: str, room: Optional[str] = None, target: Optional[str] = None,
+               direction: Optional[str] = None, **detail):
+        issue = Issue(rule, severity, room, target, direction, detail)
+        self.counts[rule] += 1
+        if self.sink is not None:
+            self.sink(issue)
+        if self.keep:
+            self.issues.append(issue)
+
+    def exit_info(self, node: int, target: int) -> Tuple[str, str]:
+        """房间 node 第一个指向 target 的出口 (direction, description)，只在报告问题时调用"""
+        if self.exits_of is not None:
+            target_id = self.ids[target]
+            for direction, exit_target, description in self.exits_of(self.ids[node]):
+                if exit_target == target_id:
+                    return direction, description
+        return 'unknown', ''
+
+
+class Rule:
+    """规则基类，按需覆盖以下钩子，未覆盖的钩子不会在遍历中被调用
+
+    visit_room(node) 在房间的出口之前调用；visit_edge(node, target, code, first) 对每个出口调用，
+    first 表示这是该房间指向 target 的第一个出口（同一目标的多个出口在 CSR 行内相邻）。
+    """
+    name = ''
+
+    def begin(self, context: RuleContext):
+        self.context = context
+
+    def visit_room(self, node: int):
+        pass
+
+    def visit_edge(self, node: int, target: int, code: int, first: bool):
+        pass
+
+    def finish(self):
+        pass
+
+
+class RoomCountRule(Rule):
+    """房间总数与预期不符"""
+    name = 'room_count'
+
+    def __init__(self, expected: int = EXPECTED_ROOM_COUNT):
+        self.expected = expected
+
+    def finish(self):
+        actual = self.context.graph.room_count
+        if actual != self.expected:
+            self.context.report(self.name, 'error', actual=actual, expected=self.expected)
+
+
+class MissingTargetRule(Rule):
+    """出口指向不存在的房间"""
+    name = 'missing_target'
+
+    def begin(self, context: RuleContext):
+        super().begin(context)
+        self.room_count = context.graph.room_count
+
+    def visit_edge(self, node: int, target: int, code: int, first: bool):
+        if first and target >= self.room_count:
+            context = self.context
+            context.report(self.name, 'error', context.ids[node], context.ids[target], context.directions[code])
+
+
+class NoReverseRule(Rule):
+    """目标房间没有任何返回的出口"""
+    name = 'no_reverse'
+
+    def begin(self, context: RuleContext):
+        super().begin(context)
+        self.room_count = context.graph.room_count
+        self.has_edge = context.graph.has_edge
+
+    def visit_edge(self, node: int, target: int, code: int, first: bool):
+        if first and target < self.room_count and not self.has_edge(target, node):
+            context = self.context
+            direction, description = context.exit_info(node, target)
+            context.report(self.name, 'warning', context.ids[node], context.ids[target], direction,
+                           description=description)
+
+
+class DirectionMismatchRule(Rule):
+    """出口方向与两个房间的坐标差不符（需要坐标）"""
+    name = 'direction_mismatch'
+
+    def begin(self, context: RuleContext):
+        super().begin(context)
+        self.room_count = context.graph.room_count
+        self.points = context.points
+
+    def visit_edge(self, node: int, target: int, code: int, first: bool):
+        if self.points is None or target >= self.room_count or target == node:
+            return
+        context = self.context
+        direction = context.directions[code]
+        delta = exit_mismatch(self.points, node, target, direction)
+        if delta is not None:
+            context.report(self.name, 'warning', context.ids[node], context.ids[target], direction,
+                           delta=delta)
+
+
+class SelfLoopRule(Rule):
+    """出口指向房间自身"""
+    name = 'self_loop'
+
+    def visit_edge(self, node: int, target: int, code: int, first: bool):
+        if target == node:
+            context = self.context
+            context.report(self.name, 'warning', context.ids[node], context.ids[node], context.directions[code])
+
+
+class DuplicateDirectionRule(Rule):
+    """同一房间有多个相同方向的出口
+
+    CSR 行内出口按目标序号排列，报告哪一个出口与房间编号有关；有原始出口时改为按出口顺序
+    报告第一个之后的同向出口，使结果只取决于房间本身（增量分析在子图上得到相同的问题）。
+    """
+    name = 'duplicate_direction'
+
+    def begin(self, context: RuleContext):
+        super().begin(context)
+        self.node = -1
+        self.repeated = []
+
+    def visit_room(self, node: int):
+        self._flush()
+        self.node = node
+        self.seen = set()
+
+    def visit_edge(self, node: int, target: int, code: int, first: bool):
+        if code in self.seen:
+            self.repeated.append((target, code))
+        else:
+            self.seen.add(code)
+
+    def finish(self):
+        self._flush()
+
+    def _flush(self):
+        if not self.repeated:
+            return
+        context = self.context
+        room_id = context.ids[self.node]
+        if context.exits_of is None:
+            for target, code in self.repeated:
+                context.report(self.name, 'error', room_id, context.ids[target], context.directions[code])
+        else:
+            seen = set()
+            for direction, target, _ in context.exits_of(room_id):
+                if direction in seen:
+                    context.report(self.name, 'error', room_id, target, direction)
+                else:
+                    seen.add(direction)
+        self.repeated = []
+
+
+class ExitStatistics(Rule):
+    """不产生问题，在同一次遍历中统计每个房间的不同目标数与方向使用次数"""
+    name = 'exit_statistics'
+
+    def begin(self, context: RuleContext):
+        super().begin(context)
+        self.room_connections: Dict[str, int] = {}
+        self.code_counts = Counter()
+        self.distinct = 0
+        self.node = -1
+
+    def visit_room(self, node: int):
+        if self.node >= 0:
+            self.room_connections[self.context.ids[self.node]] = self.distinct
+        self.node = node
+        self.distinct = 0
+
+    def visit_edge(self, node: int, target: int, code: int, first: bool):
+        self.code_counts[code] += 1
+        if first:
+            self.distinct += 1
+
+    def finish(self):
+        if self.node >= 0:
+            self.room_connections[self.context.ids[self.node]] = self.distinct
+        directions = self.context.directions
+        self.direction_stats = {directions[code]: count for code, count in sorted(self.code_counts.items())}
+
+
+def default_rules(expected_rooms: int = EXPECTED_ROOM_COUNT) -> List[Rule]:
+    """默认启用的全部校验规则"""
+    return [
+        RoomCountRule(expected_rooms),
+        MissingTargetRule(),
+        NoReverseRule(),
+        DirectionMismatchRule(),
+        SelfLoopRule(),
+        DuplicateDirectionRule()
+    ]
+
+
+class RuleEngine:
+    """把多条规则融合为对房间与出口的一次遍历"""
+
+    def __init__(self, rules: Iterable[Rule]):
+        self.rules = list(rules)
+        self.counts = Counter()
+
+    def run(self, graph: RoomGraph, exits_of: Optional[ExitsOf] = None,
+            points: Optional[Sequence[Optional[Point]]] = None,
+            sink: Optional[IssueSink] = None, keep: bool = True) -> List[Issue]:
+        """遍历全部真实房间与出口，返回所有规则产生的问题
+
+        exits_of(room_id) 返回房间原始出口 (direction, target, description)，用于在问题中附带出口描述；
+        points[node] 为房间坐标，未提供时跳过依赖坐标的规则。
+        sink/keep 见 RuleContext，各规则的问题数量保存在 self.counts。
+        """
+        context = RuleContext(graph, exits_of, points, sink, keep)
+        self.counts = context.counts
+        for rule in self.rules:
+            rule.begin(context)
+
+        # 只调用规则实际覆盖的钩子
+        room_visitors = [rule.visit_room for rule in self.rules if type(rule).visit_room is not Rule.visit_room]
+        edge_visitors = [rule.visit_edge for rule in self.rules if type(rule).visit_edge is not Rule.visit_edge]
+
+        offsets = graph.offsets
+        targets = graph.targets
+        dir_codes = graph.dir_codes
+        for node in range(graph.room_count):
+            for visit in room_visitors:
+                visit(node)
+            previous = -1
+            for pos in range(offsets[node], offsets[node + 1]):
+                target = targets[pos]
+                code = dir_codes[pos]
+                first = target != previous
+                previous = target
+                for visit in edge_visitors:
+                    visit(node, target, code, first)
+
+        for rule in self.rules:
+            rule.finish()
+        return context.issues
+
+
+def issues_by_rule(issues: Iterable[Issue]) -> Dict[str, List[Issue]]:
+    """按规则名分组问题，报告与汇总只需分组一次"""
+    grouped: Dict[str, List[Issue]] = {}
+    for issue in issues:
+        grouped.setdefault(issue.rule, []).append(issue)
+    return grouped
+
+
+def missing_reverse_connections(issues: Iterable[Issue]) -> List[Dict]:
+    """转换为旧的 missing_reverse_connections 格式，供结果 JSON 与监视模式使用"""
+    connections = []
+    for issue in issues:
+        if issue.rule == 'missing_target':
+            connections.append({'from': issue.room, 'to': issue.target, 'type': 'missing_target'})
+        elif issue.rule == 'no_reverse':
+            connections.append({
+                'from': issue.room,
+                'to': issue.target,
+                'type': 'no_reverse',
+                'from_exit': {'direction': issue.direction, 'description': issue.detail.get('description', '')}
+            })
+    return connections
+
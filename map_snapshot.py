@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+地图二进制快照
+把 districts/locations/rooms/exits 结构的地图 JSON 预编译为紧凑的二进制快照：
+字符串表、房间记录、CSR 出口数组以及区域/位置索引。分析工具通过 mmap 直接使用，
+无需解析 JSON；只有源文件内容哈希变化时才重新编译。
+
+文件布局（小端序，每段按 8 字节对齐）:
+    header      魔数 TJMAPSNP 与各段元素数量
+    strings     uint32 偏移数组 (n_strings + 1) + UTF-8 字节块
+    sources     每个源文件: uint32 路径字符串 + 32 字节 SHA-256
+    errors      uint32 文件路径/错误信息字符串（编译时无法加载的文件）
+    conflicts   uint32 房间 ID/保留的文件/忽略的文件字符串（编译时的房间 ID 冲突）
+    directions  uint32 方向名称字符串
+    districts   uint32 区域名称字符串
+    locations   uint32 位置名称字符串, uint32 所属区域
+    node_ids    uint32 节点 ID 字符串（真实房间在前，其后为不存在的目标房间）
+    rooms       uint32 名称/类型/描述字符串, uint32 位置, float64 x/y/z（缺失为 NaN）
+    offsets     int32 (n_nodes + 1)
+    targets     int32 (n_edges)
+    exit_descs  uint32 (n_edges)
+    dir_codes   uint8 (n_edges)
+"""
+
+import argparse
+import io
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+from map_analysis_cache import file_digest
+from map_graph import DIRECTIONS, RoomGraph
+from map_loader import discover_map_files, load_world
+
+MAGIC = b'TJMAPSNP'
+VERSION = 2
+
+_HEADER = struct.Struct('<8sIIIIIIIIIIII')
+_ROOM = struct.Struct('<IIIIddd')
+_NAN = float('nan')
+
+
+def _pad(out: io.BytesIO):
+    remainder = out.tell() % 8
+    if remainder:
+        out.write(b'\0' * (8 - remainder))
+
+
+def _write_array(out: io.BytesIO, typecode: str, values):
+    data = array(typecode, values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    out.write(data.tobytes())
+    _pad(out)
+
+
+def _coordinate(coordinates: Dict, axis: str) -> float:
+    value = coordinates.get(axis) if isinstance(coordinates, dict) else None
+    return float(value) if isinstance(value, (int, float)) else _NAN
+
+
+def compile_maps(file_paths: List[str], out_path: str, workers: Optional[int] = 1) -> Dict:
+    """把地图 JSON 编译为二进制快照，返回编译统计"""
+    file_paths = sorted(file_paths)
+    world = load_world(file_paths, workers)
+
+    strings: List[str] = []
+    string_index: Dict[str, int] = {}
+
+    def intern(text: str) -> int:
+        idx = string_index.get(text)
+        if idx is None:
+            idx = len(strings)
+            string_index[text] = idx
+            strings.append(text)
+        return idx
+
+    records = list(world.rooms.values())
+    node_index = {record.id: node for node, record in enumerate(records)}
+    node_ids = [record.id for record in records]
+
+    directions = list(DIRECTIONS)
+    direction_codes = {d: i for i, d in enumerate(directions)}
+    districts: Dict[str, int] = {}
+    locations: Dict[Tuple[str, str], int] = {}
+
+    rooms_blob = io.BytesIO()
+    offsets = [0]
+    targets = array('i')
+    exit_descs = array('I')
+    dir_codes = array('B')
+
+    for record in records:
+        districts.setdefault(record.district, len(districts))
+        location = locations.setdefault((record.district, record.location), len(locations))
+        rooms_blob.write(_ROOM.pack(
+            intern(record.name), intern(record.type), intern(record.description), location,
+            _coordinate(record.coordinates, 'x'),
+            _coordinate(record.coordinates, 'y'),
+            _coordinate(record.coordinates, 'z')
+        ))
+
+        row = []
+        for direction, target, description in record.exits:
+            node = node_index.get(target)
+            if node is None:
+                node = node_index[target] = len(node_ids)
+                node_ids.append(target)
+            code = direction_codes.get(direction)
+            if code is None:
+                code = direction_codes[direction] = len(directions)
+                directions.append(direction)
+            row.append((node, code, intern(description)))
+        # 与 RoomGraph 一致：每行按目标节点排序
+        row.sort()
+        for node, code, description in row:
+            targets.append(node)
+            dir_codes.append(code)
+            exit_descs.append(description)
+        offsets.append(len(targets))
+
+    offsets.extend([len(targets)] * (len(node_ids) - len(records)))
+
+    sources = [(intern(path), bytes.fromhex(file_digest(path))) for path in file_paths]
+    error_strs = [intern(text) for error in world.errors for text in error]
+    conflict_strs = [intern(text) for conflict in world.conflicts for text in conflict]
+    direction_strs = [intern(d) for d in directions]
+    district_strs = [intern(name) for name in districts]
+    location_rows = [(intern(location_name), districts[district_name])
+                     for district_name, location_name in locations]
+    node_strs = [intern(node_id) for node_id in node_ids]
+
+    encoded = [text.encode('utf-8') for text in strings]
+    string_offsets = [0]
+    for data in encoded:
+        string_offsets.append(string_offsets[-1] + len(data))
+
+    out = io.BytesIO()
+    out.write(_HEADER.pack(
+        MAGIC, VERSION, len(sources), len(strings), string_offsets[-1],
+        len(records), len(node_ids), len(targets), len(directions), len(districts), len(locations),
+        len(world.errors), len(world.conflicts)
+    ))
+    _pad(out)
+    _write_array(out, 'I', string_offsets)
+    out.write(b''.join(encoded))
+    _pad(out)
+    for path_str, digest in sources:
+        out.write(struct.pack('<I', path_str) + digest)
+    _pad(out)
+    _write_array(out, 'I', error_strs)
+    _write_array(out, 'I', conflict_strs)
+    _write_array(out, 'I', direction_strs)
+    _write_array(out, 'I', district_strs)
+    _write_array(out, 'I', [value for row in location_rows for value in row])
+    _write_array(out, 'I', node_strs)
+    out.write(rooms_blob.getvalue())
+    _pad(out)
+    _write_array(out, 'i', offsets)
+    _write_array(out, 'i', targets)
+    _write_array(out, 'I', exit_descs)
+    _write_array(out, 'B', dir_codes)
+
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(out.getvalue())
+    os.replace(tmp_path, out_path)
+
+    return {
+        'rooms': len(records),
+        'edges': len(targets),
+        'strings': len(strings),
+        'bytes': out.tell(),
+        'conflicts': world.conflicts,
+        'errors': world.errors
+    }
+
+
+class MapSnapshot:
+    """内存映射的地图快照，所有数组都是指向映射区域的 memoryview"""
+
+    _SECTIONS = ('_string_offsets', '_blob', '_sources', '_errors', '_conflicts', '_directions', '_districts',
+                 '_locations', '_node_ids', '_rooms', 'offsets', 'targets', '_exit_descs', 'dir_codes')
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map()
+        except Exception:
+            self.close()
+            raise
+
+    def _map(self):
+        path = self.path
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = self._view = memoryview(self._mmap)
+
+        (magic, version, n_sources, n_strings, blob_len, self.room_count, self.node_count,
+         self.edge_count, n_directions, n_districts, n_locations,
+         n_errors, n_conflicts) = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"不是受支持的地图快照: {path}")
+        if sys.byteorder != 'little':
+            raise ValueError("地图快照仅支持小端序平台直接映射")
+
+        pos = _HEADER.size
+
+        def take(typecode: str, count: int, itemsize: int):
+            nonlocal pos
+            section = view[pos:pos + count * itemsize].cast(typecode)
+            pos += count * itemsize
+            pos += -pos % 8
+            return section
+
+        self._string_offsets = take('I', n_strings + 1, 4)
+        self._blob = take('B', blob_len, 1)
+        self._sources = take('B', n_sources * 36, 1)
+        self._n_sources = n_sources
+        self._errors = take('I', n_errors * 2, 4)
+        self._conflicts = take('I', n_conflicts * 3, 4)
+        self._directions = take('I', n_directions, 4)
+        self._districts = take('I', n_districts, 4)
+        self._locations = take('I', n_locations * 2, 4)
+        self._node_ids = take('I', self.node_count, 4)
+        self._rooms = take('B', self.room_count * _ROOM.size, 1)
+        self.offsets = take('i', self.node_count + 1, 4)
+        self.targets = take('i', self.edge_count, 4)
+        self._exit_descs = take('I', self.edge_count, 4)
+        self.dir_codes = take('B', self.edge_count, 1)
+        if pos > len(view):
+            raise ValueError(f"地图快照不完整: {path}")
+
+    def close(self):
+        """关闭快照；graph() 返回的图持有自己的视图，关闭后仍可使用"""
+        # 释放所有 memoryview 后才能关闭映射（构造失败时部分属性可能不存在）
+        for name in self._SECTIONS + ('_view',):
+            section = getattr(self, name, None)
+            if section is not None:
+                section.release()
+        mapped = getattr(self, '_mmap', None)
+        if mapped is not None:
+            try:
+                mapped.close()
+            except BufferError:
+                # graph() 返回的图仍引用映射，映射在图释放后由垃圾回收关闭
+                pass
+        self._file.close()
+
+    def __enter__(self) -> 'MapSnapshot':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def string(self, idx: int) -> str:
+        return bytes(self._blob[self._string_offsets[idx]:self._string_offsets[idx + 1]]).decode('utf-8')
+
+    def sources(self) -> Dict[str, str]:
+        """编译时的源文件及其 SHA-256"""
+        result = {}
+        for i in range(self._n_sources):
+            entry = self._sources[i * 36:(i + 1) * 36]
+            path_str = struct.unpack_from('<I', entry, 0)[0]
+            result[self.string(path_str)] = bytes(entry[4:36]).hex()
+        return result
+
+    def errors(self) -> List[Tuple[str, str]]:
+        """编译时无法加载的文件 (文件路径, 错误信息)，与 load_world 的 errors 一致"""
+        return [(self.string(self._errors[i]), self.string(self._errors[i + 1]))
+                for i in range(0, len(self._errors), 2)]
+
+    def conflicts(self) -> List[Tuple[str, str, str]]:
+        """编译时的房间 ID 冲突 (room_id, 保留的文件, 忽略的文件)，与 load_world 的 conflicts 一致"""
+        return [tuple(self.string(idx) for idx in self._conflicts[i:i + 3])
+                for i in range(0, len(self._conflicts), 3)]
+
+    def is_current(self, file_paths: List[str]) -> bool:
+        """源文件集合与内容哈希都未变化时返回 True"""
+        sources = self.sources()
+        if set(sources) != set(file_paths):
+            return False
+        return all(file_digest(path) == digest for path, digest in sources.items())
+
+    def room_id(self, node: int) -> str:
+        return self.string(self._node_ids[node])
+
+    def room(self, node: int) -> Dict:
+        """按需解码单个房间的完整信息"""
+        name, room_type, description, location, x, y, z = _ROOM.unpack_from(self._rooms, node * _ROOM.size)
+        location_name = self._locations[location * 2]
+        district = self._locations[location * 2 + 1]
+        coordinates = {axis: (int(v) if v.is_integer() else v)
+                       for axis, v in (('x', x), ('y', y), ('z', z)) if not math.isnan(v)}
+        return {
+            'id': self.room_id(node),
+            'name': self.string(name),
+            'type': self.string(room_type),
+            'description': self.string(description),
+            'district': self.string(self._districts[district]),
+            'location': self.string(location_name),
+            'coordinates': coordinates,
+            'exits': [
+                {
+                    'direction': self.string(self._directions[self.dir_codes[pos]]),
+                    'targetRoomId': self.room_id(self.targets[pos]),
+                    'description': self.string(self._exit_descs[pos])
+                }
+                for pos in range(self.offsets[node], self.offsets[node + 1])
+            ]
+        }
+
+    def room_type(self, node: int) -> str:
+        return self.string(_ROOM.unpack_from(self._rooms, node * _ROOM.size)[1])
+
+    def room_district(self, node: int) -> str:
+        location = _ROOM.unpack_from(self._rooms, node * _ROOM.size)[3]
+        return self.string(self._districts[self._locations[location * 2 + 1]])
+
+    def graph(self) -> RoomGraph:
+        """构建直接引用映射数组的 RoomGraph，只解码节点 ID
+
+        图中的 CSR 数组是映射区域的独立视图，不随 close() 释放：快照关闭后图仍然可用，
+        映射在图被回收后才真正解除。
+        """
+        ids = [self.room_id(node) for node in range(self.node_count)]
+        directions = [self.string(idx) for idx in self._directions]
+        return RoomGraph.from_arrays(ids, self.room_count, directions,
+                                     self.offsets[:], self.targets[:], self.dir_codes[:])
+
+
+class SnapshotRoomInfo(Mapping):
+    """按需从快照解码 room_info 条目（name/type/district/location/coordinates/description），
+    只在快照打开期间有效"""
+
+    def __init__(self, snapshot: MapSnapshot, graph: RoomGraph):
+        self._snapshot = snapshot
+        self._graph = graph
+
+    def __getitem__(self, room_id: str) -> Dict:
+        node = self._graph.index[room_id]
+        if not self._graph.is_room(node):
+            raise KeyError(room_id)
+        room = self._snapshot.room(node)
+        del room['id'], room['exits']
+        return room
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._graph.ids[:self._graph.room_count])
+
+    def __len__(self) -> int:
+        return self._graph.room_count
+
+
+def load_or_compile(file_paths: List[str], snapshot_path: str, workers: Optional[int] = 1) -> MapSnapshot:
+    """打开快照；快照不存在或源文件内容已变化时先重新编译
+
+    编译时记录在快照中的加载错误与房间 ID 冲突每次打开都会打印，与 load_map_data 一致，
+    沿用旧快照时也不会被静默忽略。
+    """
+    file_paths = sorted(file_paths)
+    snapshot = None
+    if os.path.exists(snapshot_path):
+        try:
+            snapshot = MapSnapshot(snapshot_path)
+            if not snapshot.is_current(file_paths):
+                snapshot.close()
+                snapshot = None
+        except (ValueError, struct.error, TypeError, OSError) as e:
+            print(f"警告：无法读取地图快照 {snapshot_path}: {e}，将重新编译")
+            if snapshot is not None:
+                snapshot.close()
+                snapshot = None
+    if snapshot is None:
+        compile_maps(file_paths, snapshot_path, workers)
+        snapshot = MapSnapshot(snapshot_path)
+    for file_path, error in snapshot.errors():
+        print(f"错误：无法加载文件 {file_path}: {error}")
+    for room_id, kept, duplicate in snapshot.conflicts():
+        print(f"警告：房间ID冲突 {room_id}，保留 {kept}，忽略 {duplicate}")
+    return snapshot
+
+
+def benchmark(file_paths: List[str], snapshot_path: str, repeat: int = 5) -> Dict[str, float]:
+    """比较 json.load 路径与快照映射路径构建房间图的耗时（取最小值，单位毫秒）"""
+
+    def via_json():
+        room_exits = {}
+        for path in file_paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for district in data.get('districts', []):
+                for location in district.get('locations', []):
+                    for room in location.get('rooms', []):
+                        room_exits[room['id']] = [
+                            {'direction': e['direction'], 'target': e['targetRoomId']}
+                            for e in room.get('exits', [])
+                        ]
+        return RoomGraph.from_room_exits(room_exits)
+
+    def via_snapshot():
+        snapshot = MapSnapshot(snapshot_path)
+        graph = snapshot.graph()
+        return graph, snapshot
+
+    def best_of(func):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            best = min(best, time.perf_counter() - started)
+            if isinstance(result, tuple):
+                result[1].close()
+        return best * 1000
+
+    compile_started = time.perf_counter()
+    compile_maps(file_paths, snapshot_path)
+    compile_ms = (time.perf_counter() - compile_started) * 1000
+
+    return {
+        'compile_ms': compile_ms,
+        'json_load_ms': best_of(via_json),
+        'snapshot_ms': best_of(via_snapshot)
+    }
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='编译或测试地图二进制快照')
+    parser.add_argument('command', choices=['compile', 'bench'], help='compile 编译快照，bench 对比加载耗时')
+    parser.add_argument('maps_root', help='地图根目录，如 packages/server/data/maps')
+    parser.add_argument('--output', default='maps.snapshot', help='快照文件路径（默认 maps.snapshot）')
+    parser.add_argument('--workers', type=int, default=1, help='编译时并行解析的进程数，0 表示全部 CPU 核')
+    parser.add_argument('--repeat', type=int, default=5, help='bench 每种方式重复次数（默认 5）')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    map_files = discover_map_files(args.maps_root)
+
+    if args.command == 'compile':
+        stats = compile_maps(map_files, args.output, args.workers or None)
+        for file_path, error in stats['errors']:
+            print(f"错误：无法加载文件 {file_path}: {error}")
+        for room_id, kept, duplicate in stats['conflicts']:
+            print(f"警告：房间ID冲突 {room_id}，保留 {kept}，忽略 {duplicate}")
+        print(f"已编译 {stats['rooms']} 个房间、{stats['edges']} 个出口到 {args.output} ({stats['bytes']} 字节)")
+    else:
+        result = benchmark(map_files, args.output, args.repeat)
+        print(f"编译快照:       {result['compile_ms']:10.2f} ms")
+        print(f"json.load 建图: {result['json_load_ms']:10.2f} ms")
+        print(f"快照映射建图:   {result['snapshot_ms']:10.2f} ms")
+        if result['snapshot_ms'] > 0:
+            print(f"加速比:         {result['json_load_ms'] / result['snapshot_ms']:10.1f}x")
+
+
+if __name__ == "__main__":
+    # 设置标准输出编码为UTF-8
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    main()
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""测试公共设置：地图工具都是仓库根目录下的平铺模块"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def room(room_id, district='区1', exits=(), room_type='street', x=0, y=0):
+    """构造一个地图房间，exits 为 (direction, target) 序列"""
+    return {
+        'id': room_id,
+        'name': f'房间{room_id}',
+        'type': room_type,
+        'district': district,
+        'description': '',
+        'coordinates': {'x': x, 'y': y, 'z': 0},
+        'exits': [{'direction': direction, 'targetRoomId': target, 'description': ''}
+                  for direction, target in exits]
+    }
+
+
+def map_document(rooms, district='区1'):
+    return {'districts': [{'id': district, 'name': district,
+                           'locations': [{'id': 'loc', 'name': '地点', 'rooms': list(rooms)}]}]}
+
+
+@pytest.fixture
+def write_map(tmp_path):
+    """在临时地图根目录下写入地图文件，返回文件路径"""
+    def write(name, rooms, district='区1'):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(map_document(rooms, district), ensure_ascii=False, indent=2), encoding='utf-8')
+        return str(path)
+    return write
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from check_asymmetric_connections import check_connection, validate_connections
+
+
+def recursive_check_connection(room_id, rooms, visited=None, path=None):
+    """原始的递归实现（只返回遇到的第一个问题），作为对照"""
+    if visited is None:
+        visited = set()
+    if path is None:
+        path = []
+    if room_id in visited:
+        return False, []
+    visited.add(room_id)
+    path.append(room_id)
+    if room_id not in rooms:
+        return False, path
+
+    exits = rooms[room_id].get('exits', [])
+    for exit_info in exits:
+        target = exit_info['targetRoomId']
+        if target in rooms and not any(back['targetRoomId'] == room_id for back in rooms[target].get('exits', [])):
+            return False, [room_id, target, exit_info['direction']]
+    for exit_info in exits:
+        target = exit_info['targetRoomId']
+        if target != room_id:
+            is_symmetric, problematic_path = recursive_check_connection(target, rooms, visited.copy(), path.copy())
+            if not is_symmetric:
+                return False, problematic_path
+    return True, []
+
+
+def recursive_problems(start, rooms):
+    """反复调用递归实现，每找到一个缺失的反向出口就补上，收集它报告的全部问题
+
+    递归实现在重新遇到已访问的房间（任何回路，包括一对互通的房间）时返回 (False, [])，
+    此时停止收集。
+    """
+    rooms = {room_id: {'exits': list(room['exits'])} for room_id, room in rooms.items()}
+    found = []
+    while True:
+        is_symmetric, problem = recursive_check_connection(start, rooms)
+        if is_symmetric or not problem:
+            return found
+        from_id, to_id, direction = problem
+        found.append((from_id, to_id, direction))
+        rooms[to_id]['exits'].append({'direction': 'back', 'targetRoomId': from_id})
+
+
+def reachable_from(start, rooms):
+    reached = {start}
+    stack = [start]
+    while stack:
+        for exit_info in rooms[stack.pop()]['exits']:
+            if exit_info['targetRoomId'] not in reached:
+                reached.add(exit_info['targetRoomId'])
+                stack.append(exit_info['targetRoomId'])
+    return reached
+
+
+def random_rooms(seed, count=12):
+    rng = random.Random(seed)
+    ids = [f'r{i}' for i in range(count)]
+    rooms = {room_id: {'exits': []} for room_id in ids}
+    for _ in range(rng.randint(count, count * 2)):
+        a, b = rng.sample(ids, 2)
+        rooms[a]['exits'].append({'direction': rng.choice(['north', 'south', 'east', 'west']), 'targetRoomId': b})
+        if rng.random() < 0.7:
+            rooms[b]['exits'].append({'direction': 'back', 'targetRoomId': a})
+    return rooms
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_problems_match_the_recursive_checker(seed):
+    rooms = random_rooms(seed)
+    start = 'r0'
+
+    problems = validate_connections(rooms, start)
+
+    asymmetric = [(room_id, exit_info['targetRoomId'], exit_info['direction'])
+                  for room_id, room in rooms.items() for exit_info in room['exits']
+                  if not any(back['targetRoomId'] == room_id for back in rooms[exit_info['targetRoomId']]['exits'])]
+    reached = reachable_from(start, rooms)
+    unreachable = set(problems['unreachable'])
+    reachable_problems = [problem for problem in problems['asymmetric'] if problem[0] not in unreachable]
+    # 从其余房间继续遍历后，覆盖所有缺少反向出口的出口
+    assert sorted(problems['asymmetric']) == sorted(asymmetric)
+    assert unreachable == set(rooms) - reached
+    assert sorted(reachable_problems) == sorted(problem for problem in asymmetric if problem[0] in reached)
+    # 递归实现报告的每个问题都在结果中
+    assert set(recursive_problems(start, rooms)) <= set(reachable_problems)
+
+    is_symmetric, problem = check_connection(start, rooms)
+    assert is_symmetric == (not reachable_problems)
+    assert is_symmetric or tuple(problem) in reachable_problems
+
+
+def test_first_problem_matches_the_recursive_checker_on_a_tree():
+    # 没有回路时递归实现能完整运行，两者报告同一个问题
+    rooms = {
+        'a': {'exits': [{'direction': 'east', 'targetRoomId': 'b'}]},
+        'b': {'exits': [{'direction': 'north', 'targetRoomId': 'c'}]},
+        'c': {'exits': []},
+    }
+
+    assert check_connection('a', rooms) == recursive_check_connection('a', rooms) == (False, ['a', 'b', 'east'])
+    assert check_connection('c', rooms) == recursive_check_connection('c', rooms) == (True, [])
+    assert recursive_problems('a', rooms) == validate_connections(rooms, 'a')['asymmetric'] == [
+        ('a', 'b', 'east'), ('b', 'c', 'north')]
+
+
+def test_missing_targets_and_unreachable_rooms():
+    rooms = {
+        'a': {'exits': [{'direction': 'east', 'targetRoomId': 'b'}, {'direction': 'north', 'targetRoomId': 'ghost'}]},
+        'b': {'exits': [{'direction': 'west', 'targetRoomId': 'a'}]},
+        'c': {'exits': [{'direction': 'south', 'targetRoomId': 'a'}]},
+    }
+
+    problems = validate_connections(rooms, 'a')
+
+    assert problems == {'asymmetric': [('c', 'a', 'south')],
+                        'missing_targets': [('a', 'ghost', 'north')],
+                        'unreachable': ['c']}
+    assert check_connection('a', rooms) == (True, [])
+    assert check_connection('ghost', rooms) == (False, ['ghost'])
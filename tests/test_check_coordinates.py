@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from conftest import room
+
+from check_coordinates import check_coordinates, main
+from map_graph import RoomGraph
+from map_rules import DirectionMismatchRule, RuleEngine
+
+
+def test_reverse_mismatch_is_reported_once_per_pair():
+    graph = RoomGraph.from_edges([
+        ('a', [('b', 'north')]),
+        ('b', [('a', 'east')]),
+        ('c', [('d', 'north')]),
+        ('d', [('c', 'south'), ('c', 'west')]),
+    ])
+    points = [(0, 0, 0), (0, 0, 0), (10, 0, 0), (10, 10, 0)]
+
+    result = check_coordinates(graph, points)
+
+    assert result['reverse_mismatch'] == [('a', 'b', 'north', ['east']), ('d', 'c', 'west', ['north'])]
+    assert result['duplicate_coordinates'] == [((0, 0, 0), ['a', 'b'])]
+
+
+def test_spatial_index_reports_close_rooms_on_the_same_floor():
+    graph = RoomGraph.from_edges([('a', []), ('b', []), ('c', []), ('d', []), ('e', [])])
+    # c 在 a 正上方一层，e 与 a 坐标相同（算作重叠，不算过近）
+    points = [(0, 0, 0), (3, 4, 0), (0, 0, 1), (40, 0, 0), (0, 0, 0)]
+
+    result = check_coordinates(graph, points, min_distance=6)
+
+    assert result['close_rooms'] == [('a', 'b', 5.0), ('b', 'e', 5.0)]
+    assert result['duplicate_coordinates'] == [((0, 0, 0), ['a', 'e'])]
+    assert check_coordinates(graph, points)['close_rooms'] == []
+
+
+def test_direction_mismatch_matches_the_rule_engine():
+    graph = RoomGraph.from_edges([
+        ('a', [('b', 'north'), ('c', 'east'), ('d', 'up')]),
+        ('b', [('a', 'north')]),
+        ('c', [('a', 'west'), ('d', 'northeast')]),
+        ('d', [('a', 'down')]),
+    ])
+    points = [(0, 0, 0), (0, 10, 0), (10, 0, 0), (0, 0, 5)]
+
+    expected = [(issue.room, issue.target, issue.direction, issue.detail['delta'])
+                for issue in RuleEngine([DirectionMismatchRule()]).run(graph, points=points)]
+
+    assert check_coordinates(graph, points)['direction_mismatch'] == expected == [
+        ('b', 'a', 'north', (0, -10, 0)), ('c', 'd', 'northeast', (-10, 0, 5))]
+
+
+def test_main_reports_load_errors_and_conflicts(tmp_path, write_map, capsys):
+    first = write_map('a.json', [room('r1'), room('r2', x=10)])
+    second = write_map('b.json', [room('r2', x=20)])
+    broken = tmp_path / 'c.json'
+    broken.write_text('{"districts": [', encoding='utf-8')
+
+    main([str(tmp_path), '--workers', '2'])
+
+    output = capsys.readouterr().out
+    assert f"[ERROR] 无法加载文件 {broken}" in output
+    assert f"[WARNING] 房间ID冲突 r2，保留 {first}，忽略 {second}" in output
+    assert "加载了 2 个房间" in output
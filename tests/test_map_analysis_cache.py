@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import json
+
+from conftest import room
+
+from analyze_map_connectivity import analyze_connectivity, load_map_data
+from map_analysis_cache import IncrementalAnalyzer
+from map_loader import discover_map_files
+
+
+def normalized(analysis):
+    """分析结果中与输出顺序无关的部分"""
+    return {
+        'total_rooms': analysis['total_rooms'],
+        'issues': sorted((issue.rule, issue.room or '', issue.target or '', issue.direction or '',
+                          json.dumps(issue.detail, sort_keys=True)) for issue in analysis['issues']),
+        'top_hub_rooms': analysis['top_hub_rooms'],
+        'isolated_rooms': analysis['isolated_rooms'],
+        'connected_components': [sorted(component) for component in analysis['connected_components']],
+        'strongly_connected_components': sorted(sorted(c) for c in analysis['strongly_connected_components']),
+        'trap_components': analysis['trap_components'],
+        'room_types': analysis['room_types'],
+        'district_stats': analysis['district_stats'],
+        'direction_stats': analysis['direction_stats'],
+        'room_connections': analysis['room_connections'],
+    }
+
+
+def full_analysis(root):
+    _, room_exits, room_info = load_map_data(discover_map_files(root))
+    return normalized(analyze_connectivity(room_exits, room_info))
+
+
+def test_cached_matches_uncached_with_duplicate_ids(tmp_path, write_map):
+    write_map('a.json', [room('r1', exits=[('south', 'r2')], y=10),
+                         room('r2', exits=[('north', 'r1')])])
+    write_map('b.json', [room('r2', district='D2', room_type='shop', exits=[('south', 'r9')]),
+                         room('r3', exits=[('north', 'r2')], y=-10),
+                         room('r3', exits=[('east', 'r1')])], district='D2')
+
+    analyzer = IncrementalAnalyzer()
+    cached, _ = analyzer.update(discover_map_files(str(tmp_path)))
+
+    assert normalized(cached) == full_analysis(str(tmp_path))
+    assert len(cached['connected_components']) == 1
+    assert [(issue.room, issue.target) for issue in cached['issues'] if issue.rule == 'no_reverse'] == [('r3', 'r2')]
+    assert [(room_id, duplicate.endswith('b.json')) for room_id, _, duplicate in analyzer.conflicts] == \
+        [('r2', True), ('r3', True)]
+
+
+def test_incremental_updates_match_full_analysis(tmp_path, write_map):
+    cache_path = str(tmp_path / 'cache.pickle')
+    maps = tmp_path / 'maps'
+    write_map('maps/a.json', [room('a1', exits=[('east', 'a2')]), room('a2', exits=[('west', 'a1')], x=10)])
+    write_map('maps/b.json', [room('b1', exits=[('west', 'a2')], x=20), room('b2', exits=[('north', 'b1')])])
+    write_map('maps/c.json', [room('c1'), room('c2', exits=[('up', 'c1')])])
+
+    edits = [
+        # 新增出口把孤立分量并入主分量，并在 b2 处形成单向出口
+        lambda: write_map('maps/c.json', [room('c1', exits=[('north', 'b2')]), room('c2', exits=[('up', 'c1')])]),
+        # 删除一个房间使主分量断开，引用它的出口变为目标不存在
+        lambda: write_map('maps/b.json', [room('b2', exits=[('north', 'b1')])]),
+        # 只改描述与坐标，不改变出口结构
+        lambda: write_map('maps/a.json', [room('a1', exits=[('east', 'a2')]), room('a2', exits=[('west', 'a1')])]),
+        # 文件损坏后其房间全部移除
+        lambda: (maps / 'c.json').write_text('{"districts": [', encoding='utf-8'),
+        # 较早的文件新增重复 ID，生效的版本随之改变
+        lambda: write_map('maps/0.json', [room('b2', exits=[('south', 'a1')])]),
+        lambda: (maps / 'a.json').unlink(),
+    ]
+
+    analyzer = IncrementalAnalyzer(cache_path)
+    analysis, _ = analyzer.update(discover_map_files(str(maps)))
+    analyzer.save()
+    assert normalized(analysis) == full_analysis(str(maps))
+    for edit in edits:
+        edit()
+        analyzer = IncrementalAnalyzer(cache_path)
+        analysis, _ = analyzer.update(discover_map_files(str(maps)))
+        analyzer.save()
+        assert normalized(analysis) == full_analysis(str(maps))
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from map_components import (describe_strong_components, find_trap_components, group_by_label, strong_components,
+                            weak_components)
+from map_graph import RoomGraph
+
+
+def random_graph(seed, count=14):
+    rng = random.Random(seed)
+    ids = [f'r{i}' for i in range(count)]
+    return RoomGraph.from_edges(
+        (room_id, [(rng.choice(ids + ['ghost']), 'north') for _ in range(rng.randint(0, 2))]) for room_id in ids)
+
+
+def reach_sets(graph, undirected=False):
+    """每个真实房间可达的房间集合（包括自身），逐个 BFS"""
+    room_count = graph.room_count
+    adjacency = [set(target for target in graph.neighbors(node) if target < room_count) for node in range(room_count)]
+    if undirected:
+        for node in range(room_count):
+            for target in list(adjacency[node]):
+                adjacency[target].add(node)
+    reach = []
+    for start in range(room_count):
+        seen = {start}
+        stack = [start]
+        while stack:
+            for target in adjacency[stack.pop()]:
+                if target not in seen:
+                    seen.add(target)
+                    stack.append(target)
+        reach.append(seen)
+    return reach
+
+
+def partition(labels, count):
+    return sorted(map(tuple, group_by_label(labels, count)))
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_components_match_brute_force_reachability(seed):
+    graph = random_graph(seed)
+    reach = reach_sets(graph)
+    nodes = range(graph.room_count)
+
+    labels, count = strong_components(graph)
+
+    assert partition(labels, count) == sorted({tuple(b for b in nodes if b in reach[a] and a in reach[b])
+                                               for a in nodes})
+    # 逆拓扑序：出口只会指向编号不大于自身的分量
+    assert all(labels[target] <= labels[node] for node in nodes for target in graph.neighbors(node)
+               if target < graph.room_count)
+
+    labels, count = weak_components(graph)
+    assert partition(labels, count) == sorted({tuple(sorted(group)) for group in reach_sets(graph, True)})
+    assert [labels[group[0]] for group in group_by_label(labels, count)] == list(range(count))
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_trap_regions_match_brute_force(seed):
+    graph = random_graph(seed)
+    reach = reach_sets(graph)
+    labels, count = strong_components(graph)
+    main = max(group_by_label(labels, count), key=lambda group: (len(group), -group[0]))
+
+    traps = find_trap_components(graph, labels, count)
+
+    # 陷阱房间即无法回到主分量的房间，区域为这些房间之间按出口（视为无向）连成的片
+    trapped = [node for node in range(graph.room_count) if not reach[node] & set(main)]
+    expected = []
+    for node in trapped:
+        members = {node}
+        frontier = [node]
+        while frontier:
+            current = frontier.pop()
+            for other in trapped:
+                if other not in members and (graph.has_edge(current, other) or graph.has_edge(other, current)):
+                    members.add(other)
+                    frontier.append(other)
+        region = sorted(members)
+        if region not in expected:
+            expected.append(region)
+    expected.sort()
+    assert [trap['rooms'] for trap in traps] == expected
+    assert [trap['entered_from_main'] for trap in traps] == [
+        any(node in reach[main[0]] for node in region) for region in expected]
+
+
+def test_deep_chain_does_not_recurse():
+    count = 50000
+    graph = RoomGraph.from_edges((f'r{i}', [(f'r{i + 1}', 'east')] if i + 1 < count else [('r0', 'east')])
+                                 for i in range(count))
+
+    labels, components = strong_components(graph)
+
+    assert components == 1 and set(labels) == {0}
+
+
+def test_one_way_chain_is_a_single_trap_region():
+    graph = RoomGraph.from_edges([
+        ('m1', [('m2', 'east')]),
+        ('m2', [('m1', 'west'), ('a', 'north')]),
+        ('a', [('b', 'north')]),
+        ('b', [('c', 'north')]),
+        ('c', []),
+        ('x', [('y', 'east')]),
+        ('y', []),
+    ])
+
+    _, traps = describe_strong_components(graph)
+
+    assert traps == [
+        {'rooms': ['a', 'b', 'c'], 'entered_from_main': True},
+        {'rooms': ['x', 'y'], 'entered_from_main': False},
+    ]
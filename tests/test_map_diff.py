@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import json
+import subprocess
+
+from conftest import map_document, room
+
+from map_analysis_cache import IncrementalAnalyzer
+from map_diff import diff_versions, main
+
+
+def write_root(root, files):
+    for name, rooms in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(map_document(rooms), ensure_ascii=False), encoding='utf-8')
+    return str(root)
+
+
+def test_duplicate_ids_follow_world_order_and_referrers_come_from_cache(tmp_path):
+    shared = {
+        'a.json': [room('hub', exits=[('east', 'gate')])],
+        'c.json': [room('gate', room_type='shop', exits=[('west', 'hub')], x=10)],
+    }
+    old_root = write_root(tmp_path / 'old', dict(shared, **{'b.json': []}))
+    # b.json 排在 c.json 之前，其中的 gate 按世界顺序覆盖 c.json 中的版本
+    new_root = write_root(tmp_path / 'new', dict(shared, **{'b.json': [room('gate', x=10)]}))
+
+    analyzer = IncrementalAnalyzer()
+    analyzer.refresh([str(tmp_path / 'new' / name) for name in ('a.json', 'c.json')])
+    result = diff_versions(old_root, new_root, analyzer)
+
+    assert result['files'] == {'changed': ['b.json'], 'added': [], 'removed': [], 'unchanged': 2}
+    assert result['total_rooms'] == {'old': 2, 'new': 2}
+    assert result['rooms']['changed'] == [{'room': 'gate', 'fields': ['type', 'exits']}]
+    assert [item['room'] for item in result['rooms']['moved']] == ['gate']
+    assert analyzer.reparsed == [str(tmp_path / 'new' / 'b.json')]
+    # hub 未变化，通过反向出口索引找到，新版本中 gate 不再有指回 hub 的出口
+    assert [(issue['rule'], issue['room'], issue['target']) for issue in result['issues']['new']] == [
+        ('no_reverse', 'hub', 'gate')]
+    assert result['issues']['resolved'] == []
+
+
+def git(cwd, *args):
+    subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com', *args],
+                   cwd=cwd, check=True, capture_output=True)
+
+
+def test_base_revision_is_diffed_against_the_working_tree(tmp_path):
+    maps_root = write_root(tmp_path / 'repo' / 'maps', {'a.json': [room('r1'), room('r2')]})
+    git(tmp_path / 'repo', 'init', '-q')
+    git(tmp_path / 'repo', 'add', '.')
+    git(tmp_path / 'repo', 'commit', '-q', '-m', 'maps')
+    write_root(tmp_path / 'repo' / 'maps', {'a.json': [room('r1'), room('r3', room_type='shop')]})
+    output = tmp_path / 'diff.json'
+
+    assert main([maps_root, '--base', 'HEAD', '--output', str(output)]) == 0
+
+    result = json.loads(output.read_text(encoding='utf-8'))
+    assert result['old'] == 'HEAD'
+    assert result['files']['changed'] == ['a.json']
+    assert (result['rooms']['added'], result['rooms']['removed']) == (['r3'], ['r2'])
+
+
+def test_base_outside_git_reports_the_error(tmp_path, monkeypatch, capsys):
+    maps_root = write_root(tmp_path / 'maps', {'a.json': [room('r1')]})
+    monkeypatch.setenv('GIT_CEILING_DIRECTORIES', str(tmp_path))
+
+    assert main([maps_root, '--base', 'HEAD', '--output', str(tmp_path / 'diff.json')]) == 1
+    assert '[ERROR] 无法从 git 取出 HEAD' in capsys.readouterr().out
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+import csv
+
+from conftest import room
+
+from map_export import build_export, export_postgres, export_redis
+from map_loader import discover_map_files, load_world
+
+
+class FakeRedis:
+    """redis-py 客户端的最小替身：键值保存在字典中，WATCH 按键的写入版本检测冲突"""
+
+    def __init__(self):
+        self.data = {}
+        self.versions = {}
+        self.commits = 0
+        self.before_commit = None
+
+    def smembers(self, key):
+        return {member.encode('utf-8') for member in self.data.get(key, set())}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def transaction(self, func, *watches, value_from_callable=False):
+        while True:
+            watched = {key: self.versions.get(key, 0) for key in watches}
+            pipe = FakePipeline(self)
+            value = func(pipe)
+            if self.before_commit is not None:
+                hook, self.before_commit = self.before_commit, None
+                hook()
+            if any(self.versions.get(key, 0) != version for key, version in watched.items()):
+                continue
+            result = pipe.execute()
+            return value if value_from_callable else result
+
+    def apply(self, name, args, kwargs):
+        key = args[0]
+        if name == 'hmget':
+            fields = self.data.get(key, {})
+            return [None if fields.get(field) is None else str(fields[field]).encode('utf-8') for field in args[1:]]
+        for written in (args if name == 'delete' else [key]):
+            self.versions[written] = self.versions.get(written, 0) + 1
+        if name == 'delete':
+            for written in args:
+                self.data.pop(written, None)
+        elif name == 'sadd':
+            self.data.setdefault(key, set()).update(args[1:])
+        elif name == 'srem':
+            self.data.setdefault(key, set()).difference_update(args[1:])
+        elif name == 'hset':
+            self.data.setdefault(key, {}).update(kwargs['mapping'])
+        else:
+            raise AssertionError(name)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def multi(self):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        writes = [command for command in self.commands if command[0] != 'hmget']
+        if writes:
+            self.client.commits += 1
+        return [self.client.apply(*command) for command in self.commands]
+
+
+class FakeCursor:
+    """只实现 export_postgres 用到的语句，COPY 数据按 CSV 解析后存入表"""
+
+    def __init__(self, database):
+        self.database = database
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self, sql, params=None):
+        database = self.database
+        if sql.startswith('SELECT id'):
+            self.result = [(row[0], row[-1]) for row in database.rooms.values()]
+        elif sql.startswith('SELECT name'):
+            self.result = list(database.districts.items())
+        elif sql.startswith('DELETE FROM map_rooms'):
+            for room_id in params[0]:
+                del database.rooms[room_id]
+            database.exits = [row for row in database.exits if row[0] not in params[0]]
+        elif sql.startswith('DELETE FROM map_districts'):
+            database.districts = {}
+
+    def fetchall(self):
+        return self.result
+
+    def copy_expert(self, sql, buffer):
+        table = sql.split()[1]
+        self.database.copies.append(table)
+        for row in csv.reader(buffer):
+            if table == 'map_rooms':
+                self.database.rooms[row[0]] = row
+            elif table == 'map_exits':
+                self.database.exits.append(row)
+            else:
+                self.database.districts[row[0]] = int(float(row[1]))
+
+
+class FakeConnection:
+    def __init__(self):
+        self.rooms, self.exits, self.districts, self.copies = {}, [], {}, []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+def export_rows(tmp_path):
+    world = load_world(discover_map_files(str(tmp_path)), workers=1)
+    rooms, districts, _ = build_export(world.rooms, str(tmp_path))
+    return rooms, districts
+
+
+def test_unrelated_component_change_does_not_rewrite_rooms(tmp_path, write_map):
+    write_map('a.json', [room('a1'), room('a2')])
+    write_map('b.json', [room('b1', exits=[('east', 'b2')]), room('b2', exits=[('west', 'b1')])])
+    rooms, districts = export_rows(tmp_path)
+    client, connection = FakeRedis(), FakeConnection()
+    export_redis(client, rooms, districts)
+    export_postgres(connection, rooms, districts)
+
+    # 删除前面的孤立房间会改变其后所有分量的序号，但不应让 b1/b2 被视为变化
+    write_map('a.json', [room('a2')])
+    rooms, districts = export_rows(tmp_path)
+    redis_diff = export_redis(client, rooms, districts)
+    connection.copies.clear()
+    postgres_diff = export_postgres(connection, rooms, districts)
+
+    assert tuple(redis_diff) == tuple(postgres_diff) == ([], [], ['a1'])
+    # 只有区域房间数变化，房间与出口表不重写
+    assert connection.copies == ['map_districts']
+    assert connection.districts == {'区1': 3}
+    assert client.data['map:room:b1']['component'] == 'b1'
+    assert client.data['map:rooms'] == {'a2', 'b1', 'b2'}
+    assert sorted(connection.rooms) == ['a2', 'b1', 'b2']
+
+
+def test_postgres_copy_writes_only_changed_rooms(tmp_path, write_map):
+    write_map('a.json', [room('r1', exits=[('east', 'r2')]), room('r2', exits=[('west', 'r1')], x=10)])
+    rooms, districts = export_rows(tmp_path)
+    connection = FakeConnection()
+    assert tuple(export_postgres(connection, rooms, districts)) == (['r1', 'r2'], [], [])
+    assert connection.copies == ['map_rooms', 'map_exits', 'map_districts']
+    assert [row[:4] for row in connection.exits] == [['r1', '0', 'east', 'r2'], ['r2', '0', 'west', 'r1']]
+
+    connection.copies.clear()
+    assert export_postgres(connection, rooms, districts).unchanged
+    assert connection.copies == []
+
+    write_map('a.json', [room('r1', exits=[('east', 'r2')]), room('r2', room_type='shop', exits=[('west', 'r1')], x=10)])
+    rooms, districts = export_rows(tmp_path)
+    assert tuple(export_postgres(connection, rooms, districts)) == ([], ['r2'], [])
+    assert connection.copies == ['map_rooms', 'map_exits']
+    assert connection.rooms['r2'][2] == 'shop'
+    assert len(connection.exits) == 2
+
+
+def test_concurrent_redis_export_retries_against_fresh_state(tmp_path, write_map):
+    write_map('a.json', [room('r1'), room('r2')])
+    old_rooms, old_districts = export_rows(tmp_path)
+    write_map('a.json', [room('r1', room_type='shop'), room('r3')])
+    new_rooms, new_districts = export_rows(tmp_path)
+
+    client = FakeRedis()
+    # 另一个导出进程在本次读取之后、提交之前写入了旧版本地图
+    client.before_commit = lambda: export_redis(client, old_rooms, old_districts)
+    diff = export_redis(client, new_rooms, new_districts)
+
+    assert tuple(diff) == (['r3'], ['r1'], ['r2'])
+    assert client.commits == 2
+    assert client.data['map:rooms'] == {'r1', 'r3'}
+    assert client.data['map:room:r1']['type'] == 'shop'
+    assert 'map:room:r2' not in client.data
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from map_graph import RoomGraph
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('scipy')
+
+from map_flow import build_model, expected_occupancy, simulate_agents, stationary_distribution  # noqa: E402
+
+
+def town():
+    """出生点 s 连接 a、b，a 通往商店 g，b 通往死胡同 d（只进不出）"""
+    return RoomGraph.from_edges([
+        ('s', [('a', 'north'), ('b', 'east')]),
+        ('a', [('s', 'south'), ('g', 'north')]),
+        ('b', [('s', 'west'), ('d', 'east')]),
+        ('g', [('a', 'south')]),
+        ('d', []),
+    ])
+
+
+def dense_chain(model):
+    """显式的行随机矩阵：每行流失的概率（下线与到达目标）加到出生点"""
+    matrix = (1.0 - model.restart) * model.transition.toarray()
+    matrix += np.outer(1.0 - matrix.sum(axis=1), model.spawn)
+    return matrix
+
+
+@pytest.mark.parametrize('goals, restart', [((), 0.05), ((3,), 0.0), ((3,), 0.1)])
+def test_stationary_distribution_is_the_chain_fixed_point(goals, restart):
+    model = build_model(town(), [0], goals, stay=0.2, greed=0.8, restart=restart)
+    chain = dense_chain(model)
+    assert np.allclose(chain.sum(axis=1), 1.0)
+
+    distribution, iterations, converged = stationary_distribution(model, tol=1e-13)
+
+    assert converged and iterations > 1
+    assert distribution.sum() == pytest.approx(1.0)
+    assert (distribution >= 0).all()
+    np.testing.assert_allclose(distribution @ chain, distribution, atol=1e-10)
+    # 与稠密矩阵的左特征向量一致
+    values, vectors = np.linalg.eig(chain.T)
+    expected = np.real(vectors[:, np.argmin(np.abs(values - 1.0))])
+    np.testing.assert_allclose(distribution, expected / expected.sum(), atol=1e-8)
+
+
+def test_goal_mass_returns_to_spawn():
+    model = build_model(town(), [0], [3], stay=0.2, greed=1.0)
+    forward = model.transition.T.tocsr()
+
+    # 目标房间的行全为 0，站在目标上的玩家下一步全部回到出生点
+    assert model.transition[3].nnz == 0
+    at_goal = np.zeros(5)
+    at_goal[3] = 1.0
+    moved = forward @ at_goal
+    moved += (1.0 - moved.sum()) * model.spawn
+    np.testing.assert_allclose(moved, model.spawn)
+
+    # greed=1 时 s 与 a 都只朝 g 走，b 与 d 永远不会被访问
+    distribution, _, converged = stationary_distribution(model)
+    assert converged
+    assert distribution[2] == distribution[4] == 0.0
+    assert distribution.sum() == pytest.approx(1.0)
+
+
+def test_simulated_agents_follow_the_expected_occupancy():
+    model = build_model(town(), [0], [3], stay=0.2, greed=0.8, restart=0.01)
+
+    mean, peak, group_peak = simulate_agents(model, agents=20000, steps=100, seed=1,
+                                             groups=np.array([0, 0, 1, 0, 1]))
+
+    assert mean.sum() == pytest.approx(20000)
+    np.testing.assert_allclose(mean / 20000, expected_occupancy(model, 100), atol=0.01)
+    assert (peak >= mean).all()
+    assert group_peak[1] >= peak[[2, 4]].max()
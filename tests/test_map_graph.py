@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from map_graph import RoomGraph, bfs_reachable
+
+
+def random_rows(seed, count=15):
+    """随机房间出口，包括重复目标、自环与指向不存在房间的出口"""
+    rng = random.Random(seed)
+    ids = [f'r{i}' for i in range(count)]
+    rows = []
+    for room_id in ids:
+        exits = [(rng.choice(ids + ['ghost1', 'ghost2']), rng.choice(['north', 'south', 'east', 'up', 'portal']))
+                 for _ in range(rng.randint(0, 4))]
+        rows.append((room_id, exits))
+    return rows
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_csr_rows_match_the_exit_lists(seed):
+    rows = random_rows(seed)
+
+    graph = RoomGraph.from_edges(rows)
+
+    assert graph.room_count == len(rows)
+    assert graph.ids[:graph.room_count] == [room_id for room_id, _ in rows]
+    # 每行按目标节点排序，同一目标的出口按方向编码排序
+    exits = {room_id: sorted(((graph.index[target], direction) for target, direction in row),
+                             key=lambda edge: (edge[0], graph.directions.index(edge[1])))
+             for room_id, row in rows}
+    for room_id, _ in rows:
+        node = graph.index[room_id]
+        assert [(target, graph.directions[code]) for target, code in graph.edges(node)] == exits[room_id]
+        for target in range(graph.node_count):
+            expected = [direction for other, direction in exits[room_id] if other == target]
+            assert graph.has_edge(node, target) == bool(expected)
+            assert [graph.directions[code] for code in graph.edge_codes(node, target)] == expected
+    # 不存在的房间排在真实房间之后，没有出边
+    assert all(graph.out_degree(node) == 0 for node in range(graph.room_count, graph.node_count))
+
+    in_offsets, in_sources = graph.reverse()
+    for node in range(graph.node_count):
+        sources = sorted(in_sources[in_offsets[node]:in_offsets[node + 1]])
+        assert sources == sorted(graph.index[room_id] for room_id, row in rows
+                                 for target, _ in row if graph.index[target] == node)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_bfs_reaches_exactly_the_transitive_targets(seed):
+    graph = RoomGraph.from_edges(random_rows(seed))
+    reached = {0}
+    frontier = [0]
+    while frontier:
+        frontier = [target for node in frontier for target in graph.neighbors(node)
+                    if target < graph.room_count and target not in reached]
+        reached.update(frontier)
+
+    order = bfs_reachable(graph, 0)
+
+    assert sorted(order) == sorted(reached)
+    assert len(order) == len(set(order))
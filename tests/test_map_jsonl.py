@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import json
+
+from map_graph import RoomGraph
+from map_jsonl import JsonlWriter, read_jsonl
+from map_rules import Issue, NoReverseRule, RuleEngine
+
+
+def test_issues_and_metrics_round_trip(tmp_path):
+    path = str(tmp_path / 'issues.jsonl')
+    graph = RoomGraph.from_edges([('甲', [('乙', 'east')]), ('乙', [])])
+
+    with JsonlWriter(path) as writer:
+        issues = RuleEngine([NoReverseRule()]).run(graph, sink=writer.issue)
+        writer.issue(Issue('room_count', 'error', None, None, None, {'actual': 2, 'expected': 140}))
+        writer.write('metric', name='betweenness', room='甲', value=0.5)
+    assert writer.count == 3
+
+    records = list(read_jsonl(path))
+    assert [record['record'] for record in records] == ['issue', 'issue', 'metric']
+    # 问题记录可以无损还原为 Issue
+    assert [Issue(**{field: record[field] for field in Issue._fields}) for record in read_jsonl(path, 'issue')] == \
+        issues + [Issue('room_count', 'error', None, None, None, {'actual': 2, 'expected': 140})]
+    assert list(read_jsonl(path, 'metric')) == [
+        {'record': 'metric', 'name': 'betweenness', 'room': '甲', 'value': 0.5}]
+
+
+def test_each_record_is_flushed_as_one_line(tmp_path):
+    path = tmp_path / 'stream.jsonl'
+    writer = JsonlWriter(str(path))
+
+    writer.write('metric', text='多行\n文本')
+    # 关闭前即可读到完整的一行，换行符在 JSON 字符串内被转义
+    assert path.read_text(encoding='utf-8').splitlines() == [
+        json.dumps({'record': 'metric', 'text': '多行\n文本'}, ensure_ascii=False)]
+    writer.close()
+
+
+def test_blank_lines_are_skipped_and_stdout_is_not_closed(tmp_path, capsys):
+    path = tmp_path / 'gaps.jsonl'
+    path.write_text('{"record": "a"}\n\n   \n{"record": "b"}\n', encoding='utf-8')
+    assert [record['record'] for record in read_jsonl(str(path))] == ['a', 'b']
+
+    with JsonlWriter('-') as writer:
+        writer.write('metric', value=1)
+    print('still open')
+    assert capsys.readouterr().out == '{"record": "metric", "value": 1}\nstill open\n'
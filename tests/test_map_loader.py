@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from conftest import room
+
+from map_loader import discover_map_files, iter_rooms, load_world
+
+
+def test_broken_file_contributes_no_rooms_for_any_worker_count(tmp_path, write_map):
+    write_map('a.json', [room('r1'), room('r2')])
+    broken = write_map('b.json', [room('r3'), room('r4')])
+    with open(broken, 'r', encoding='utf-8') as f:
+        text = f.read()
+    # 截断在第二个房间中间：r3 已完整出现，r4 之后文件结束
+    with open(broken, 'w', encoding='utf-8') as f:
+        f.write(text[:text.index('"r4"') + 10])
+    write_map('c.json', [room('r5')])
+
+    files = discover_map_files(str(tmp_path))
+    serial = load_world(files, workers=1)
+    parallel = load_world(files, workers=2)
+
+    assert list(serial.rooms) == list(parallel.rooms) == ['r1', 'r2', 'r5']
+    assert [path for path, _ in serial.errors] == [path for path, _ in parallel.errors] == [broken]
+
+    # 流式读取不缓冲整个文件：出错前已产出的 r3 保留，并在回调中报告数量
+    errors = []
+    streamed = [record.id for record in
+                iter_rooms(files, on_error=lambda path, e, count: errors.append((path, count)))]
+    assert streamed == ['r1', 'r2', 'r3', 'r5']
+    assert errors == [(broken, 1)]
+
+
+def test_duplicate_ids_keep_first_file(tmp_path, write_map):
+    first = write_map('a.json', [room('r1'), room('r2', room_type='street')])
+    second = write_map('b.json', [room('r2', room_type='shop'), room('r3')])
+
+    world = load_world(discover_map_files(str(tmp_path)), workers=1)
+
+    assert world.rooms['r2'].type == 'street'
+    assert world.conflicts == [('r2', first, second)]
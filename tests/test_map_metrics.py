@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import random
+from collections import deque
+
+import pytest
+
+from map_graph import RoomGraph
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('scipy')
+
+from map_metrics import betweenness, degree_metrics  # noqa: E402
+
+
+def test_betweenness_splits_dependency_across_shortest_paths():
+    graph = RoomGraph.from_edges([
+        ('s', [('a', 'north'), ('b', 'east')]),
+        ('a', [('t', 'east')]),
+        ('b', [('t', 'north')]),
+        ('t', [('u', 'east')]),
+        ('u', []),
+    ])
+
+    scores = betweenness(graph)
+
+    # s->t 与 s->u 各有两条最短路径，分别经过 a 与 b；t 位于 s、a、b 到 u 的全部最短路径上
+    expected = {'s': 0.0, 'a': 1.0, 'b': 1.0, 't': 3.0, 'u': 0.0}
+    assert {room_id: scores[graph.index[room_id]] for room_id in expected} == pytest.approx(expected)
+
+
+def brute_force_betweenness(adjacency):
+    """按定义逐对统计：sigma_st(v) = sigma_sv * sigma_vt，当 d(s, v) + d(v, t) = d(s, t)"""
+    def bfs(source):
+        distance, count, queue = {source: 0}, {source: 1}, deque([source])
+        while queue:
+            node = queue.popleft()
+            for neighbor in adjacency[node]:
+                if neighbor not in distance:
+                    distance[neighbor], count[neighbor] = distance[node] + 1, 0
+                    queue.append(neighbor)
+                if distance[neighbor] == distance[node] + 1:
+                    count[neighbor] += count[node]
+        return distance, count
+
+    paths = {node: bfs(node) for node in adjacency}
+    scores = dict.fromkeys(adjacency, 0.0)
+    for s, (from_s, count_s) in paths.items():
+        for t in from_s:
+            for v in from_s:
+                from_v, count_v = paths[v]
+                if v not in (s, t) and t in from_v and from_s[v] + from_v[t] == from_s[t]:
+                    scores[v] += count_s[v] * count_v[t] / count_s[t]
+    return scores
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_betweenness_matches_brute_force(seed, monkeypatch):
+    rng = random.Random(seed)
+    rooms = [f'r{i}' for i in range(rng.randint(2, 14))]
+    adjacency = {room_id: sorted(set(rng.sample(rooms, rng.randint(0, 3))) - {room_id}) for room_id in rooms}
+    graph = RoomGraph.from_edges((room_id, [(target, 'north') for target in targets])
+                                 for room_id, targets in adjacency.items())
+    # 很小的批次让多个源点批次与单源点批次都被覆盖
+    monkeypatch.setattr('map_metrics.BATCH_CELLS', rng.choice([1, 20, 4_000_000]))
+
+    scores = betweenness(graph)
+
+    expected = brute_force_betweenness(adjacency)
+    assert {room_id: scores[graph.index[room_id]] for room_id in rooms} == pytest.approx(expected)
+
+
+def test_degrees_count_distinct_real_rooms_on_both_sides():
+    graph = RoomGraph.from_edges([
+        ('a', [('b', 'north'), ('b', 'up'), ('a', 'down'), ('nowhere', 'east')]),
+        ('b', [('a', 'south')]),
+    ])
+
+    degrees = degree_metrics(graph)
+
+    assert degrees['out_degree'].tolist() == [1, 1]
+    assert degrees['in_degree'].tolist() == [1, 1]
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from map_graph import RoomGraph
+from map_paths import UNREACHABLE, PathEngine, district_eccentricity, multi_source_distances
+
+
+def random_graph(seed, count=15):
+    rng = random.Random(seed)
+    ids = [f'r{i}' for i in range(count)]
+    directions = ['north', 'south', 'east', 'west', 'up', 'down']
+    return RoomGraph.from_edges(
+        (room_id, [(rng.choice(ids + ['ghost']), rng.choice(directions)) for _ in range(rng.randint(0, 3))])
+        for room_id in ids)
+
+
+def all_pairs_distances(graph):
+    """Floyd–Warshall 步数矩阵，不可达为 None"""
+    n = graph.room_count
+    dist = [[0 if a == b else None for b in range(n)] for a in range(n)]
+    for a in range(n):
+        for b in graph.neighbors(a):
+            if b < n and a != b:
+                dist[a][b] = 1
+    for k in range(n):
+        for a in range(n):
+            if dist[a][k] is None:
+                continue
+            for b in range(n):
+                if dist[k][b] is not None and (dist[a][b] is None or dist[a][k] + dist[k][b] < dist[a][b]):
+                    dist[a][b] = dist[a][k] + dist[k][b]
+    return dist
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_next_hops_follow_shortest_paths(seed):
+    graph = random_graph(seed)
+    dist = all_pairs_distances(graph)
+    engine = PathEngine(graph, cache_size=3)
+
+    for destination in range(graph.room_count):
+        for source in range(graph.room_count):
+            expected = dist[source][destination]
+            hop = engine.next_hop(source, destination)
+            if expected is None:
+                assert engine.distance(source, destination) == hop == UNREACHABLE
+                assert engine.route(source, destination) is None
+                continue
+            assert engine.distance(source, destination) == expected
+            if source == destination:
+                assert hop == destination
+            else:
+                # 下一跳是一个出口目标，并且离目的地恰好近一步
+                assert graph.has_edge(source, hop)
+                assert dist[hop][destination] == expected - 1
+            route = engine.route(source, destination)
+            assert len(route) == expected + 1 and route[0] == source and route[-1] == destination
+            exits = engine.route_exits(source, destination)
+            assert [graph.directions[graph.edge_codes(here, there)[0]] for here, there in zip(route, route[1:])] \
+                == exits
+    assert len(engine._tables) == 3
+
+
+def test_multi_source_distances_pick_the_nearest_source():
+    graph = RoomGraph.from_edges([
+        ('a', [('b', 'east')]),
+        ('b', [('c', 'east')]),
+        ('c', [('d', 'east')]),
+        ('d', []),
+        ('e', [('d', 'west')]),
+    ])
+
+    distances, nearest = multi_source_distances(graph, [graph.index['a'], graph.index['e']])
+
+    assert list(distances) == [0, 1, 2, 1, 0]
+    assert [graph.ids[node] for node in nearest] == ['a', 'a', 'a', 'e', 'e']
+
+
+def test_district_eccentricity_stays_inside_the_district():
+    graph = RoomGraph.from_edges([
+        ('a', [('b', 'east'), ('x', 'north')]),
+        ('b', [('a', 'west'), ('c', 'east')]),
+        ('c', [('b', 'west')]),
+        ('x', [('c', 'south')]),
+    ])
+
+    result = district_eccentricity(graph, ['区1', '区1', '区1', '区2'])
+
+    assert result['区1']['eccentricity'] == {'a': 2, 'b': 1, 'c': 2}
+    assert (result['区1']['diameter'], result['区1']['radius'], result['区1']['center']) == (2, 1, ['b'])
+    assert result['区2']['unreachable_pairs'] == 0
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import itertools
+import random
+
+import pytest
+
+from map_loader import RoomRecord
+from map_query import RoomIndex
+
+NAMES = ['天京城门', '天京大街', '天街', 'Inn', 'inner yard', '城门', '', '京', 'a\U0010ffffb', 'a\U0010ffff']
+DESCRIPTIONS = ['一条大街', '城门口人来人往', '', 'The Inn', '大街尽头']
+
+
+def random_records(seed, count=60):
+    rng = random.Random(seed)
+    records = {}
+    for i in range(count):
+        room_id = f'r{i}'
+        records[room_id] = RoomRecord(
+            room_id, rng.choice(NAMES), rng.choice(['street', 'shop', 'inn']), rng.choice(['区1', '区2']),
+            rng.choice(['loc1', 'loc2', 'loc3']), {}, rng.choice(DESCRIPTIONS),
+            [('east', f'r{rng.randrange(count)}', '')], 'a.json')
+    return records
+
+
+def brute_force(records, district=None, location=None, type=None, name=None, prefix=None, text=None):
+    return [record for record in records.values()
+            if (district is None or record.district == district)
+            and (location is None or record.location == location)
+            and (type is None or record.type == type)
+            and (name is None or name.lower() in record.name.lower())
+            and (prefix is None or record.name.lower().startswith(prefix.lower()))
+            and (text is None or text.lower() in record.description.lower())]
+
+
+FILTERS = {
+    'district': [None, '区1', '区3'],
+    'type': [None, 'shop'],
+    'location': [None, 'loc2'],
+    'name': [None, '天', '天京', 'INN', '京城门', 'x'],
+    'prefix': [None, '', '天京', 'in', 'a', 'a\U0010ffff', '城门', '城门外'],
+    'text': [None, '大街', 'inn'],
+}
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_combined_filters_match_a_linear_scan(seed):
+    records = random_records(seed)
+    index = RoomIndex(records)
+
+    for values in itertools.product(*FILTERS.values()):
+        filters = {key: value for key, value in zip(FILTERS, values) if value is not None}
+        expected = brute_force(records, **filters)
+        assert index.find(**filters) == expected, filters
+        assert index.find(limit=2, **filters) == expected[:2], filters
+
+
+def test_cross_district_exits_and_room_lookup():
+    records = {
+        'a': RoomRecord('a', '甲', 'street', '区1', 'loc', {}, '', [('east', 'b', ''), ('north', 'c', '')], 'a.json'),
+        'b': RoomRecord('b', '乙', 'street', '区1', 'loc', {}, '', [('west', 'a', ''), ('up', 'ghost', '')], 'a.json'),
+        'c': RoomRecord('c', '丙', 'street', '区2', 'loc', {}, '', [('south', 'a', '')], 'a.json'),
+    }
+    index = RoomIndex(records)
+
+    assert [(item.room, item.direction, item.target) for item in index.exits_leaving('区1')] == [('a', 'north', 'c')]
+    assert [item.room for item in index.exits_leaving('区2', '区1')] == ['c']
+    assert index.exits_leaving('区2', '区3') == []
+    assert index.room('b') is records['b'] and index.room('ghost') is None
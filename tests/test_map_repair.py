@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import json
+
+from conftest import map_document, room
+
+from map_repair import Repair, main, rewrite_file
+
+
+def repaired_document(additions):
+    """房间 a 向东、c 向东都指向 b，b 没有出口；additions 为 {room_id: [(direction, target, description)]}"""
+    rooms = [room('a', exits=[('east', 'b')]), room('b'), room('c', exits=[('east', 'b')])]
+    for item in rooms:
+        item['exits'].extend({'direction': direction, 'targetRoomId': target, 'description': description}
+                             for direction, target, description in additions.get(item['id'], ()))
+    return map_document(rooms)
+
+
+def write_document(tmp_path, **dump_options):
+    path = tmp_path / 'maps.json'
+    path.write_text(json.dumps(repaired_document({}), ensure_ascii=False, **dump_options), encoding='utf-8')
+    return str(path)
+
+
+def repairs_for(path):
+    # b 原本是空数组 "exits": []，并且一次添加两个出口；a 在已有出口之后追加
+    return [Repair('b', 'west', 'a', '西面是房间a', path), Repair('b', 'south', 'c', '南面是房间c', path),
+            Repair('a', 'north', 'c', '北面是房间c', path)]
+
+
+EXPECTED = {
+    'a': [('north', 'c', '北面是房间c')],
+    'b': [('west', 'a', '西面是房间a'), ('south', 'c', '南面是房间c')],
+}
+
+
+def test_indented_file_keeps_its_layout(tmp_path):
+    path = write_document(tmp_path, indent=2)
+
+    assert rewrite_file(path, repairs_for(path)) == 3
+
+    with open(path, 'r', encoding='utf-8') as f:
+        assert f.read() == json.dumps(repaired_document(EXPECTED), ensure_ascii=False, indent=2)
+
+
+def test_minified_file_stays_on_one_line(tmp_path):
+    path = write_document(tmp_path, separators=(',', ':'))
+
+    assert rewrite_file(path, repairs_for(path)) == 3
+
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    assert '\n' not in text
+    assert text.startswith('{"districts":[{"id":"区1","name":"区1"')
+    assert json.loads(text) == repaired_document(EXPECTED)
+
+
+def test_room_without_exits_field_and_crlf_newlines(tmp_path):
+    document = repaired_document({})
+    rooms = document['districts'][0]['locations'][0]['rooms']
+    del rooms[1]['exits']
+    path = tmp_path / 'maps.json'
+    path.write_bytes(json.dumps(document, ensure_ascii=False, indent=4).replace('\n', '\r\n').encode('utf-8'))
+
+    assert rewrite_file(str(path), [Repair('b', 'west', 'a', '西面是房间a', str(path))]) == 1
+
+    rooms[1]['exits'] = [{'direction': 'west', 'targetRoomId': 'a', 'description': '西面是房间a'}]
+    assert path.read_bytes().decode('utf-8') == \
+        json.dumps(document, ensure_ascii=False, indent=4).replace('\n', '\r\n')
+
+
+def test_dry_run_leaves_the_file_untouched(tmp_path):
+    path = write_document(tmp_path, indent=2)
+    with open(path, 'rb') as f:
+        before = f.read()
+
+    assert rewrite_file(path, repairs_for(path), dry_run=True) == 3
+
+    with open(path, 'rb') as f:
+        assert f.read() == before
+
+
+def test_apply_is_idempotent(tmp_path, write_map, capsys):
+    path = write_map('maps.json', [room('a', exits=[('east', 'b')]), room('b'),
+                                   room('c', exits=[('north', 'd')]), room('d', exits=[('up', 'e')]), room('e')])
+
+    assert main([str(tmp_path), '--apply']) == 0
+    assert f"[OK] {path}: 添加 3 个出口" in capsys.readouterr().out
+    with open(path, 'rb') as f:
+        repaired = f.read()
+
+    assert main([str(tmp_path), '--apply']) == 0
+    output = capsys.readouterr().out
+    assert "可修复的缺失反向出口: 0，冲突: 0" in output
+    assert "[OK]" not in output
+    with open(path, 'rb') as f:
+        assert f.read() == repaired
+    rooms = json.loads(repaired)['districts'][0]['locations'][0]['rooms']
+    assert [(exit_info['direction'], exit_info['targetRoomId']) for exit_info in rooms[4]['exits']] == [('down', 'd')]
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from map_graph import RoomGraph
+from map_rules import (DirectionMismatchRule, DuplicateDirectionRule, ExitStatistics, MissingTargetRule, NoReverseRule,
+                       RoomCountRule, RuleEngine, SelfLoopRule, default_rules, issues_by_rule,
+                       missing_reverse_connections)
+
+# a 与 b 互通；a 有一个指向不存在房间的出口；c 单向通往 a，并且有自环与两个 east 出口
+EXITS = {
+    'a': [('east', 'b', '东边是b'), ('north', 'ghost', '')],
+    'b': [('west', 'a', '西边是a')],
+    'c': [('south', 'a', '南边是a'), ('east', 'c', ''), ('east', 'b', '')],
+}
+POINTS = [(0, 0, 0), (10, 0, 0), (0, -10, 0)]
+
+
+def graph():
+    return RoomGraph.from_edges((room_id, [(target, direction) for direction, target, _ in exits])
+                                for room_id, exits in EXITS.items())
+
+
+def run(*rules, **options):
+    return [(issue.rule, issue.severity, issue.room, issue.target, issue.direction, issue.detail)
+            for issue in RuleEngine(rules).run(graph(), exits_of=EXITS.get, **options)]
+
+
+def test_room_count():
+    assert run(RoomCountRule(3)) == []
+    assert run(RoomCountRule(140)) == [('room_count', 'error', None, None, None, {'actual': 3, 'expected': 140})]
+
+
+def test_missing_target():
+    assert run(MissingTargetRule()) == [('missing_target', 'error', 'a', 'ghost', 'north', {})]
+
+
+def test_no_reverse():
+    # c 的自环有返回出口；c -> b 与 c -> a 都没有
+    assert run(NoReverseRule()) == [
+        ('no_reverse', 'warning', 'c', 'a', 'south', {'description': '南边是a'}),
+        ('no_reverse', 'warning', 'c', 'b', 'east', {'description': ''}),
+    ]
+
+
+def test_direction_mismatch():
+    # c 在 a 的正南方，向 south 走到 a 与坐标不符；c -> b 向东北偏移，east 仍算一致；没有坐标时跳过
+    assert run(DirectionMismatchRule(), points=POINTS) == [
+        ('direction_mismatch', 'warning', 'c', 'a', 'south', {'delta': (0, 10, 0)})]
+    assert run(DirectionMismatchRule()) == []
+
+
+def test_self_loop():
+    assert run(SelfLoopRule()) == [('self_loop', 'warning', 'c', 'c', 'east', {})]
+
+
+def test_duplicate_direction():
+    # 按原始出口顺序报告第一个之后的同向出口，与 CSR 行内的排列无关
+    assert run(DuplicateDirectionRule()) == [('duplicate_direction', 'error', 'c', 'b', 'east', {})]
+    issues = RuleEngine([DuplicateDirectionRule()]).run(graph())
+    assert [(issue.room, issue.direction) for issue in issues] == [('c', 'east')]
+
+
+def test_exit_statistics():
+    statistics = ExitStatistics()
+
+    assert run(statistics) == []
+    assert statistics.room_connections == {'a': 2, 'b': 1, 'c': 3}
+    assert statistics.direction_stats == {'north': 1, 'south': 1, 'east': 3, 'west': 1}
+
+
+def test_default_rules_share_one_pass_and_stream_to_a_sink():
+    streamed = []
+    engine = RuleEngine(default_rules(3))
+
+    kept = engine.run(graph(), exits_of=EXITS.get, points=POINTS, sink=streamed.append, keep=False)
+
+    assert kept == []
+    assert engine.counts == {'missing_target': 1, 'no_reverse': 2, 'direction_mismatch': 1, 'self_loop': 1,
+                             'duplicate_direction': 1}
+    grouped = issues_by_rule(streamed)
+    assert {rule: len(issues) for rule, issues in grouped.items()} == engine.counts
+    assert missing_reverse_connections(streamed) == [
+        {'from': 'a', 'to': 'ghost', 'type': 'missing_target'},
+        {'from': 'c', 'to': 'a', 'type': 'no_reverse', 'from_exit': {'direction': 'south', 'description': '南边是a'}},
+        {'from': 'c', 'to': 'b', 'type': 'no_reverse', 'from_exit': {'direction': 'east', 'description': ''}},
+    ]
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import pytest
+from conftest import room
+
+from map_loader import discover_map_files
+from map_snapshot import compile_maps, load_or_compile
+
+
+@pytest.mark.parametrize('damage', [b'', b'TJMAPSNP', b'not a snapshot at all'])
+def test_damaged_snapshot_is_recompiled(tmp_path, write_map, damage):
+    write_map('a.json', [room('r1', exits=[('east', 'r2')]), room('r2', exits=[('west', 'r1')])])
+    files = discover_map_files(str(tmp_path))
+    snapshot_path = str(tmp_path / 'maps.snapshot')
+    compile_maps(files, snapshot_path)
+    with open(snapshot_path, 'rb') as f:
+        data = f.read()
+    with open(snapshot_path, 'wb') as f:
+        f.write(damage or data[:len(data) // 2])
+
+    with load_or_compile(files, snapshot_path) as snapshot:
+        assert [snapshot.room_id(node) for node in range(snapshot.room_count)] == ['r1', 'r2']
+
+
+def test_graph_outlives_snapshot(tmp_path, write_map):
+    write_map('a.json', [room('r1', exits=[('east', 'r2')]), room('r2', exits=[('west', 'r1')])])
+    files = discover_map_files(str(tmp_path))
+
+    with load_or_compile(files, str(tmp_path / 'maps.snapshot')) as snapshot:
+        graph = snapshot.graph()
+
+    edges = [(graph.ids[target], graph.directions[code]) for target, code in graph.edges(graph.index['r1'])]
+    assert edges == [('r2', 'east')]
+
+
+def test_load_errors_and_conflicts_are_reported_from_a_current_snapshot(tmp_path, write_map, capsys):
+    write_map('a.json', [room('r1'), room('r2')])
+    write_map('b.json', [room('r2', district='区2')])
+    (tmp_path / 'c.json').write_text('{"districts": [', encoding='utf-8')
+    files = discover_map_files(str(tmp_path))
+    snapshot_path = str(tmp_path / 'maps.snapshot')
+    compile_maps(files, snapshot_path)
+
+    # 快照已是最新，不会重新编译，问题仍然来自快照头部记录
+    with load_or_compile(files, snapshot_path) as snapshot:
+        assert [error[0] for error in snapshot.errors()] == [str(tmp_path / 'c.json')]
+        assert snapshot.conflicts() == [('r2', str(tmp_path / 'a.json'), str(tmp_path / 'b.json'))]
+
+    output = capsys.readouterr().out
+    assert f"错误：无法加载文件 {tmp_path / 'c.json'}" in output
+    assert f"警告：房间ID冲突 r2，保留 {tmp_path / 'a.json'}，忽略 {tmp_path / 'b.json'}" in output
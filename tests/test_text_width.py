@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import unicodedata
+
+import pytest
+
+from text_width import code_width, find_misaligned, string_width
+
+BOX_DRAWING_NARROW = [0x2500, 0x2501, 0x2503, 0x250F, 0x2513, 0x2517, 0x251B,
+                      0x2523, 0x252B, 0x253B, 0x254B, 0x2550, 0x2551, 0x2554,
+                      0x2557, 0x255A, 0x255D, 0x2560, 0x2563, 0x2566, 0x2569,
+                      0x256C, 0x250C, 0x2510, 0x2514, 0x2518, 0x251C, 0x2524,
+                      0x252C, 0x2534, 0x253C]
+
+
+def baseline_char_width(char):
+    """fix-alignment.py 原来的逐字符规则"""
+    ea = unicodedata.east_asian_width(char)
+    if ea in ('F', 'W'):
+        return 2
+    if ea == 'A':
+        return 1 if ord(char) in BOX_DRAWING_NARROW else 2
+    return 1
+
+
+def test_every_bmp_code_point_matches_the_baseline_rule():
+    mismatched = [code for code in range(0x10000) if code_width(code) != baseline_char_width(chr(code))]
+    assert mismatched == []
+
+
+@pytest.mark.parametrize('start, end', [
+    (0x1F000, 0x1FAFF),   # 麻将牌、表情符号
+    (0x20000, 0x20400),   # CJK 扩展 B
+    (0x2FFF0, 0x30010),   # 宽字符区间的边界
+    (0xE0000, 0xE01EF),   # 标签与变体选择符
+    (0x10FFF0, 0x10FFFF),
+])
+def test_astral_code_points_match_the_baseline_rule(start, end):
+    assert [code for code in range(start, end + 1) if code_width(code) != baseline_char_width(chr(code))] == []
+
+
+@pytest.mark.parametrize('text', [
+    '',
+    'plain ascii',
+    '天京城 Tianjing',
+    '全角ＡＢＣ，半角ｱｲｳ',
+    '表情😀🐉🀄 与 ZWJ 👨‍👩‍👧',
+    'é 组合符号 ạ̈',
+    '╔══════╗║欢迎║╚══════╝',
+    '①②③ ±×÷ …',
+])
+def test_string_width_matches_the_baseline_sum(text):
+    assert string_width(text) == sum(baseline_char_width(char) for char in text)
+
+
+def test_misaligned_banner_line_is_reported():
+    lines = [
+        "const banner = [",
+        "  '╔════════╗',",
+        "  '<cyan>║ 欢迎 ║</cyan>',",
+        "  `║ ${name} ║`,",
+        "  '║ 天京城 ║\\n' +",
+        "  '╚════════╝',",
+        "];",
+    ]
+
+    misaligned = find_misaligned(lines, 'banner.ts')
+
+    # 插值行不参与比较；"║ 欢迎 ║" 宽 8，其余三行宽 10
+    assert [(item.line, item.width, item.expected) for item in misaligned] == [(3, 8, 10)]
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+import pytest
+from conftest import map_document, room
+
+from map_analysis_cache import IncrementalAnalyzer
+from map_loader import discover_map_files
+from watch_map_connectivity import InotifyWatcher, issue_keys
+
+
+def test_issue_keys_cover_every_rule(tmp_path, write_map):
+    write_map('a.json', [room('r1', exits=[('east', 'r2')], x=10), room('r2', exits=[('west', 'r1')], x=20)])
+    analyzer = IncrementalAnalyzer()
+    before = issue_keys(analyzer.update(discover_map_files(str(tmp_path)))[0])
+
+    write_map('a.json', [room('r1', exits=[('east', 'r2'), ('east', 'r1')], x=10),
+                         room('r2', exits=[('west', 'r1')], x=20)])
+    after = issue_keys(analyzer.update(discover_map_files(str(tmp_path)))[0])
+
+    new_rules = {key[0] for key in after.keys() - before.keys()}
+    assert {'self_loop', 'duplicate_direction'} <= new_rules
+
+
+def test_directory_moved_in_reports_its_existing_files(tmp_path):
+    root = tmp_path / 'maps'
+    root.mkdir()
+    try:
+        watcher = InotifyWatcher(str(root))
+    except OSError as e:
+        pytest.skip(f"inotify 不可用: {e}")
+    try:
+        outside = tmp_path / 'district' / 'inner'
+        outside.mkdir(parents=True)
+        (outside / 'a.json').write_text(json.dumps(map_document([room('r1')])), encoding='utf-8')
+        os.rename(tmp_path / 'district', root / 'district')
+
+        changed = watcher.wait(1.0)
+    finally:
+        watcher.close()
+
+    assert changed == {str(root / 'district' / 'inner' / 'a.json')}
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+等宽终端字符显示宽度计算
+按 East Asian Width 规则预先生成码位宽度表：BMP 用 64K 字节查找表，其余平面用宽字符区间表二分查找，
+整串宽度由宽度表编译出的宽字符正则一次计数。
+批量模式扫描客户端与服务端源码中的横幅/边框字符串，报告宽度不齐的行
+"""
+
+import argparse
+import io
+import os
+import re
+import sys
+import unicodedata
+from bisect import bisect_right
+from collections import Counter
+from functools import lru_cache
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# East Asian Width 为 Ambiguous 但在等宽字体中只占 1 格的边框字符
+NARROW_BOX_DRAWING = frozenset([
+    0x2500, 0x2501, 0x2503, 0x250F, 0x2513, 0x2517, 0x251B,
+    0x2523, 0x252B, 0x253B, 0x254B, 0x2550, 0x2551, 0x2554,
+    0x2557, 0x255A, 0x255D, 0x2560, 0x2563, 0x2566, 0x2569,
+    0x256C, 0x250C, 0x2510, 0x2514, 0x2518, 0x251C, 0x2524,
+    0x252C, 0x2534, 0x253C
+])
+
+DEFAULT_SCAN_ROOTS = ['packages/client/src', 'packages/server/src']
+SOURCE_EXTENSIONS = ('.ts', '.tsx', '.js', '.jsx')
+
+
+def _classify(code: int) -> int:
+    """单个码位的宽度：F/W 为 2，A 除边框字符外为 2，其余为 1"""
+    ea = unicodedata.east_asian_width(chr(code))
+    if ea in ('F', 'W'):
+        return 2
+    if ea == 'A':
+        return 1 if code in NARROW_BOX_DRAWING else 2
+    return 1
+
+
+_BMP_WIDTHS = bytes(_classify(code) for code in range(0x10000))
+_astral_starts: Optional[List[int]] = None
+_astral_ends: Optional[List[int]] = None
+
+
+def _astral_ranges() -> Tuple[List[int], List[int]]:
+    """BMP 以外宽度为 2 的码位区间 [start, end]，首次使用时生成"""
+    global _astral_starts, _astral_ends
+    if _astral_starts is None:
+        starts, ends = [], []
+        for code in range(0x10000, 0x110000):
+            if _classify(code) == 2:
+                if ends and ends[-1] == code - 1:
+                    ends[-1] = code
+                else:
+                    starts.append(code)
+                    ends.append(code)
+        _astral_starts, _astral_ends = starts, ends
+    return _astral_starts, _astral_ends
+
+
+def code_width(code: int) -> int:
+    """码位的显示宽度"""
+    if code < 0x10000:
+        return _BMP_WIDTHS[code]
+    starts, ends = _astral_ranges()
+    pos = bisect_right(starts, code) - 1
+    return 2 if pos >= 0 and code <= ends[pos] else 1
+
+
+def char_width(char: str) -> int:
+    """字符的显示宽度"""
+    return code_width(ord(char))
+
+
+_wide_chars: Optional['re.Pattern'] = None
+
+
+def _wide_pattern() -> 're.Pattern':
+    """由宽度表生成匹配所有宽字符的正则字符类，计数交给正则引擎在 C 层完成"""
+    global _wide_chars
+    if _wide_chars is None:
+        ranges = []
+        code = 0
+        while code < 0x10000:
+            if _BMP_WIDTHS[code] == 2:
+                start = code
+                while code + 1 < 0x10000 and _BMP_WIDTHS[code + 1] == 2:
+                    code += 1
+                ranges.append((start, code))
+            code += 1
+        ranges.extend(zip(*_astral_ranges()))
+        char_class = ''.join(re.escape(chr(start)) + (f'-{re.escape(chr(end))}' if end > start else '')
+                             for start, end in ranges)
+        _wide_chars = re.compile(f'[{char_class}]')
+    return _wide_chars
+
+
+@lru_cache(maxsize=4096)
+def string_width(s: str) -> int:
+    """字符串的显示宽度：字符数加上宽字符数"""
+    if s.isascii():
+        return len(s)
+    return len(s) + len(_wide_pattern().findall(s))
+
+
+# 横幅/边框行：去掉标记后以边框竖线或角开头、以边框字符结尾
+BOX_LINE_START = '╔╚║╠┃┏┗┣│┌└├'
+BOX_LINE_END = '╗╝║╣┃┓┛┫│┐┘┤'
+_MARKUP = re.compile(r'</?[A-Za-z][^<>]*>')
+_QUOTES = '\'"`,;+ '
+
+
+class BoxLine(NamedTuple):
+    path: str
+    line: int
+    width: int
+    expected: int
+    text: str
+
+
+def _box_segments(lines: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """逐行产出 (行号, 去掉标记与引号后的边框文本)，非边框行产出空字符串作为分隔"""
+    for line_no, line in enumerate(lines, 1):
+        # 模板字符串里常用 \n 把多行边框拼在同一行源码中
+        for part in line.split('\\n'):
+            text = _MARKUP.sub('', part).strip().strip(_QUOTES)
+            if text and text[0] in BOX_LINE_START and text[-1] in BOX_LINE_END:
+                yield line_no, text
+            else:
+                yield line_no, ''
+
+
+def find_misaligned(lines: Iterable[str], path: str = '') -> List[BoxLine]:
+    """找出连续边框行中宽度与该组多数行不一致的行
+
+    至少两行相邻的边框行视为一个边框，期望宽度取组内出现次数最多的宽度（并列时取先出现的）。
+    含 ${...} 插值的行运行时宽度不确定，不参与比较但也不打断边框。
+    """
+    misaligned = []
+    group: List[Tuple[int, str, int]] = []
+
+    def flush():
+        if len(group) > 1:
+            expected = Counter(width for _, _, width in group).most_common(1)[0][0]
+            misaligned.extend(BoxLine(path, line_no, width, expected, text)
+                              for line_no, text, width in group if width != expected)
+        group.clear()
+
+    for line_no, text in _box_segments(lines):
+        if '${' in text:
+            continue
+        if text:
+            group.append((line_no, text, string_width(text)))
+        else:
+            flush()
+    flush()
+    return misaligned
+
+
+def iter_source_files(roots: Iterable[str], extensions: Tuple[str, ...] = SOURCE_EXTENSIONS) -> Iterator[str]:
+    """按路径排序遍历源码文件，跳过 node_modules"""
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if d != 'node_modules')
+            for filename in sorted(filenames):
+                if filename.endswith(extensions):
+                    yield os.path.join(dirpath, filename)
+
+
+def scan_tree(roots: Iterable[str], extensions: Tuple[str, ...] = SOURCE_EXTENSIONS) -> Tuple[int, List[BoxLine]]:
+    """扫描目录下所有源码文件，返回 (扫描的文件数, 不齐的行)"""
+    scanned = 0
+    misaligned = []
+    for path in iter_source_files(roots, extensions):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"[WARNING] 无法读取 {path}: {e}")
+            continue
+        scanned += 1
+        # 快速跳过不含边框字符的文件
+        if not any(char in text for char in BOX_LINE_START):
+            continue
+        misaligned.extend(find_misaligned(text.splitlines(), path))
+    return scanned, misaligned
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='扫描源码中的横幅/边框字符串并报告宽度不齐的行')
+    parser.add_argument('roots', nargs='*', default=DEFAULT_SCAN_ROOTS,
+                        help='要扫描的目录（默认 packages/client/src 与 packages/server/src）')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """主函数，存在不齐的行时返回 1，便于在构建中使用"""
+    args = parse_args(argv)
+    scanned, misaligned = scan_tree(args.roots)
+    print(f"扫描了 {scanned} 个源码文件")
+    if not misaligned:
+        print("[OK] 所有边框行宽度一致")
+        return 0
+    print(f"[ERROR] 发现 {len(misaligned)} 行宽度不齐:")
+    for item in misaligned:
+        print(f"  {item.path}:{item.line}: 宽度 {item.width} (期望 {item.expected}), 差值 {item.width - item.expected}")
+        print(f"    {item.text}")
+    return 1
+
+
+if __name__ == "__main__":
+    # 设置标准输出编码为UTF-8
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.exit(main())
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+地图连通性监视模式
+常驻内存保存已解析的房间图，监听地图目录的文件变化（Linux 下使用 inotify，其他平台轮询），
+每次保存只重新解析变化的文件，并输出新增与已解决的问题
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import io
+import os
+import select
+import struct
+import sys
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from map_analysis_cache import IncrementalAnalyzer
+from map_loader import discover_map_files
+
+# inotify 事件掩码
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """基于 ctypes 的 inotify 目录监听，递归监听 maps_root 下的所有目录"""
+
+    def __init__(self, maps_root: str):
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError("找不到 libc")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError("当前系统不支持 inotify")
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self.maps_root = maps_root
+        self.watches: Dict[int, str] = {}
+        self._watch_tree()
+
+    def _watch_tree(self):
+        for dirpath, _, _ in os.walk(self.maps_root):
+            self._add_watch(dirpath)
+
+    def _add_watch(self, path: str):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self.watches[wd] = path
+
+    def wait(self, timeout: float) -> Optional[Set[str]]:
+        """等待变化，返回发生变化的 JSON 文件路径集合；事件队列溢出丢失了事件时返回 None"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        # 编辑器保存时常连续触发多个事件，稍等片刻合并为一次
+        time.sleep(0.05)
+
+        changed = set()
+        overflowed = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace')
+                offset += length
+                path = os.path.join(self.watches.get(wd, ''), name)
+                if mask & IN_Q_OVERFLOW:
+                    overflowed = True
+                elif mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        # 移入的目录（或创建后迅速写入的目录）里已有的文件不会再产生事件，逐个补上
+                        for dirpath, _, _ in os.walk(path):
+                            self._add_watch(dirpath)
+                        changed.update(discover_map_files(path))
+                elif name.endswith('.json'):
+                    changed.add(path)
+        if overflowed:
+            # 丢失的事件中可能有新建的目录，重新补齐监听
+            self._watch_tree()
+            return None
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """按修改时间与文件大小轮询地图目录"""
+
+    def __init__(self, maps_root: str, interval: float):
+        self.maps_root = maps_root
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for file_path in discover_map_files(self.maps_root):
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            snapshot[file_path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout: float) -> Set[str]:
+        time.sleep(min(timeout, self.interval))
+        current = self._scan()
+        changed = {path for path, stat in current.items() if self.snapshot.get(path) != stat}
+        changed |= set(self.snapshot) - set(current)
+        self.snapshot = current
+        return changed
+
+    def close(self):
+        pass
+
+
+def issue_keys(analysis: Dict) -> Dict[Tuple, str]:
+    """把分析结果中的问题转换为 {问题键: 描述}，用于前后两次结果做差
+
+    逐房间的问题直接取自规则引擎的 Issue 记录，按 (rule, room, target, direction) 区分，
+    与 map_diff 一致，新增规则的问题无需在这里单独处理；孤立房间与陷阱区域是全局结果，单独加入。
+    """
+    issues = {}
+    for issue in analysis['issues']:
+        if issue.room is None:
+            text = f"[{issue.severity}] {issue.rule}: {issue.detail}"
+        else:
+            text = f"[{issue.severity}] {issue.rule}: {issue.room} --{issue.direction}--> {issue.target}"
+        issues[(issue.rule, issue.room, issue.target, issue.direction)] = text
+    for room_id in analysis['isolated_rooms']:
+        issues[('isolated', room_id)] = f"{room_id} 是孤立房间"
+    for trap in analysis['trap_components']:
+        if trap['entered_from_main']:
+            rooms = tuple(sorted(trap['rooms']))
+            issues[('trap',) + rooms] = f"陷阱区域 {', '.join(rooms[:5])}{' ...' if len(rooms) > 5 else ''}"
+    return issues
+
+
+def print_issue_diff(previous: Dict[Tuple, str], current: Dict[Tuple, str]):
+    """打印新增与已解决的问题"""
+    added = [current[key] for key in current if key not in previous]
+    resolved = [previous[key] for key in previous if key not in current]
+    if not added and not resolved:
+        print("  问题列表没有变化")
+    for text in added:
+        print(f"  [NEW] {text}")
+    for text in resolved:
+        print(f"  [FIXED] {text}")
+    print(f"  当前共 {len(current)} 个问题")
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='监视地图目录并在保存后重新校验连通性')
+    parser.add_argument('maps_root', help='地图根目录，如 packages/server/data/maps')
+    parser.add_argument('--cache', help='可选的增量分析缓存文件，退出时保存')
+    parser.add_argument('--poll', action='store_true', help='强制使用轮询而不是 inotify')
+    parser.add_argument('--interval', type=float, default=1.0, help='轮询间隔秒数（默认 1.0）')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+
+    analyzer = IncrementalAnalyzer(args.cache)
+    map_files = discover_map_files(args.maps_root)
+    analysis, _ = analyzer.update(map_files)
+    issues = issue_keys(analysis)
+    print(f"已加载 {analysis['total_rooms']} 个房间，当前共 {len(issues)} 个问题")
+    for text in issues.values():
+        print(f"  {text}")
+
+    watcher = None
+    if not args.poll:
+        try:
+            watcher = InotifyWatcher(args.maps_root)
+            print(f"使用 inotify 监听 {args.maps_root}")
+        except OSError as e:
+            print(f"inotify 不可用（{e}），改为轮询")
+    if watcher is None:
+        watcher = PollingWatcher(args.maps_root, args.interval)
+        print(f"每 {args.interval} 秒轮询 {args.maps_root}")
+
+    try:
+        while True:
+            changed = watcher.wait(args.interval)
+            if changed is not None and not changed:
+                continue
+
+            started = time.perf_counter()
+            map_files = discover_map_files(args.maps_root)
+            if changed is None:
+                # 事件队列溢出：无法得知哪些文件变化，按内容哈希检查全部文件
+                analyzer.refresh(map_files)
+                names = "inotify 事件队列溢出，全部文件"
+            else:
+                analyzer.refresh(map_files, changed=sorted(changed))
+                names = ', '.join(os.path.relpath(path, args.maps_root) for path in sorted(changed))
+            if not (analyzer.reparsed or analyzer.dropped or analyzer.errors):
+                continue
+
+            analysis, _ = analyzer.assemble()
+            current = issue_keys(analysis)
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"\n[{time.strftime('%H:%M:%S')}] {names} 已变化，重新校验耗时 {elapsed:.1f} ms")
+            # 无法解析的文件不参与分析（已缓存的版本随之移除），先说明原因再输出问题变化
+            for file_path, error in analyzer.errors:
+                print(f"  [ERROR] 无法加载文件 {os.path.relpath(file_path, args.maps_root)}: {error}")
+            print_issue_diff(issues, current)
+            issues = current
+    except KeyboardInterrupt:
+        print("\n停止监视")
+    finally:
+        watcher.close()
+        analyzer.save()
+
+
+if __name__ == "__main__":
+    # 设置标准输出编码为UTF-8
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', line_buffering=True)
+    main()